@@ -2,7 +2,15 @@
 # This software is released under the MIT License.
 # https://opensource.org/licenses/MIT
 
+import argparse
+import json
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
 import matplotlib.pyplot as plt
+from print_mean import split_unit
 
 
 class Colors:
@@ -25,16 +33,17 @@ def draw_bars(
     bar_label_color="black",
     title="CPU Usage",
     label="Percentage",
+    labels=None,
 ):
     # Draw horizontal bar chart
     bars = ax.barh(items, metrics, color=color)  # , edgecolor='#929496')
 
     # Add value labels and notes
-    for bar, metric in zip(bars, metrics):
+    for bar, text in zip(bars, labels or [f"{metric:.1f}" for metric in metrics]):
         ax.text(
             max(bar.get_width() / 5, bar.get_x() + bar.get_width() - xlim[1] * 0.092),
             bar.get_y() + bar.get_height() / 2,
-            f"{metric:.1f}",
+            text,
             va="center",
             ha="left",
             horizontalalignment="right",
@@ -50,51 +59,137 @@ def draw_bars(
     ax.grid(axis="x", linestyle="--")
 
 
-machines = ["AIB-MX13-1-A1", "IQ-9075-EVK"]
-
-# cpu_usages = [97.84, 97.78]
-# memory_usages = [31.63, 24.15]
-# network_usages = [1.63, 0.42]  # MB/s
-# frame_rates = [8, 11]  # FPS
-# accelerator_usages = [67, 78]
-
-cpu_usages = [96.99, 99.61]
-memory_usages = [25.70, 14.61]
-network_usages = [0.67, 5.99]  # MB/s
-frame_rates = [8, 25]  # FPS
-accelerator_usages = [51.52, 67.15]
-
-fig, axs = plt.subplots(ncols=2, nrows=3, figsize=(10, 6), layout="constrained")
-
-draw_bars(axs[0][0], machines, cpu_usages, xlim=(0, 100))
-draw_bars(
-    axs[0][1],
-    machines,
-    memory_usages,
-    xlim=(0, 100),
-    title="Memory Usage",
-    label="Percentage, Less is Better",
-)
-draw_bars(
-    axs[1][0], machines, accelerator_usages, xlim=(0, 100), title="Accelerator Usage"
-)
-draw_bars(
-    axs[1][1],
-    machines,
-    network_usages,
-    xlim=(0, 8),
-    title="Network Usage",
-    label="MB/s, Less is Better",
-)
-draw_bars(
-    axs[2][0],
-    machines,
-    frame_rates,
-    xlim=(0, 30),
-    title="FPS",
-    label="Frames per Seconds, More is Better",
-)
-fig.delaxes(axs[2][1])  # hide the last one
-
-fig.suptitle("Performance metrics while running 10 InnoPPE channels", fontsize=19)
-fig.savefig("results.svg", pad_inches=0.1, bbox_inches="tight")
+# Panel title and axis label per metric column, in panel order; other columns follow in the order they are found
+METRIC_STYLES = {
+    "CPU Usage (%)": ("CPU Usage", "Percentage"),
+    "Memory Usage (%)": ("Memory Usage", "Percentage, Less is Better"),
+    "Accelerator Usage (%)": ("Accelerator Usage", "Percentage"),
+    "Network Usage (MB/s)": ("Network Usage", "MB/s, Less is Better"),
+    "Frame Rate (FPS)": ("FPS", "Frames per Seconds, More is Better"),
+}
+
+# Results of the last benchmark round (10 InnoPPE channels), charted when no summary file is given
+DEFAULT_SUMMARY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "summaries.json")
+
+OUTPUT_SVG = "results.svg"
+
+
+def load_summaries(paths):
+    """Summaries from print_mean.py --json files; a file may also hold a single summary or a list of them."""
+    summaries = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            document = json.load(f)
+        if isinstance(document, dict):
+            document = document.get("summaries", [document])
+        summaries.extend(document)
+    return summaries
+
+
+def collect(summaries, stat="mean"):
+    """
+    Groups the summaries by channel count.
+
+    Returns:
+        {channels: {platform: {metric: value}}}; several runs of one platform are averaged, weighted by samples.
+    """
+    sums = {}
+    for summary in summaries:
+        platform = summary.get("platform") or os.path.basename(summary.get("file", "unknown"))
+        weight = summary.get("samples") or 1
+        metrics = sums.setdefault(summary.get("channels"), {}).setdefault(platform, {})
+        for column, metric in summary["metrics"].items():
+            if metric.get(stat) is None:
+                continue
+            total, weights = metrics.get(column, (0.0, 0))
+            metrics[column] = (total + metric[stat] * weight, weights + weight)
+    return {
+        channels: {platform: {column: total / weights for column, (total, weights) in metrics.items()} for platform, metrics in platforms.items()}
+        for channels, platforms in sums.items()
+    }
+
+
+def nice_limit(value):
+    """Smallest 'round' axis limit (1, 1.5, 2, 2.5, 3, 4, 5, 6 or 8 times a power of ten) above value plus 20% headroom."""
+    if value <= 0:
+        return 1
+    value *= 1.2
+    scale = 10 ** math.floor(math.log10(value))
+    return next(step * scale for step in (1, 1.5, 2, 2.5, 3, 4, 5, 6, 8, 10) if step * scale >= value)
+
+
+def panel_order(platforms):
+    columns = list(METRIC_STYLES)
+    for metrics in platforms.values():
+        columns += [column for column in metrics if column not in columns]
+    return [column for column in columns if any(column in metrics for metrics in platforms.values())]
+
+
+def render(channels, platforms, output_path):
+    """One figure: a panel per metric with a bar per platform; platforms missing a metric are marked n/a."""
+    columns = panel_order(platforms)
+    names = list(platforms)
+    nrows = max(1, -(-len(columns) // 2))
+    fig, axs = plt.subplots(ncols=2, nrows=nrows, figsize=(10, 2 * nrows), layout="constrained", squeeze=False)
+
+    for ax, column in zip(axs.flat, columns):
+        name, unit = split_unit(column)
+        title, label = METRIC_STYLES.get(column, (name, unit))
+        values = [platforms[platform].get(column) for platform in names]
+        known = [value for value in values if value is not None]
+        # Percentages keep the full 0-100 scale unless a value exceeds it (e.g. per-core sums)
+        xlim = (0, 100 if unit == "%" and max(known) <= 100 else nice_limit(max(known)))
+        # A platform that did not report the metric keeps its row, marked n/a instead of a 0.0 bar
+        labels = ["n/a" if value is None else f"{value:.1f}" for value in values]
+        draw_bars(ax, names, [value or 0.0 for value in values], xlim=xlim, title=title, label=label, labels=labels)
+    for ax in axs.flat[len(columns) :]:
+        fig.delaxes(ax)  # hide the unused ones
+
+    running = f"{channels} InnoPPE channels" if channels is not None else "InnoPPE"
+    fig.suptitle(f"Performance metrics while running {running}", fontsize=19)
+    fig.savefig(output_path, pad_inches=0.1, bbox_inches="tight")
+    plt.close(fig)
+    return output_path
+
+
+def output_name(output, channels, several):
+    """results.svg stays as is for a single figure, and becomes results_10ch.svg etc. for a channel-count matrix."""
+    if not several:
+        return output
+    root, ext = os.path.splitext(output)
+    return f"{root}_{channels if channels is not None else 'all'}ch{ext}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare platforms from print_mean.py --json summaries")
+    parser.add_argument("summaries", nargs="*", help="summary files (default: the results of the last benchmark round)")
+    parser.add_argument("-o", "--output", default=OUTPUT_SVG, help=f"output file; one per channel count is written when runs differ in channels (default: {OUTPUT_SVG})")
+    parser.add_argument("--stat", default="mean", help="summary statistic charted, e.g. mean, p50 or p95 (default: mean)")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1, help="figures rendered in parallel processes")
+    args = parser.parse_args()
+
+    try:
+        summaries = load_summaries(args.summaries or [DEFAULT_SUMMARY_FILE])
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    groups = collect(summaries, args.stat)
+    if not groups:
+        print("Error: no summaries to chart", file=sys.stderr)
+        return 1
+
+    several = len(groups) > 1
+    jobs = [(channels, platforms, output_name(args.output, channels, several)) for channels, platforms in sorted(groups.items(), key=lambda item: (item[0] is None, item[0] or 0))]
+    workers = max(1, min(args.workers, len(jobs)))
+    if workers == 1:
+        outputs = [render(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            outputs = list(pool.map(render, *zip(*jobs)))
+    for path in outputs:
+        print(f"Saved {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,9 +2,17 @@
 # This software is released under the MIT License.
 # https://opensource.org/licenses/MIT
 
+import argparse
+import hashlib
+import io
+import json
 import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+from recording import is_recording, load
 
 INPUT_CSV = "test.csv"
 
@@ -12,72 +20,253 @@ OUTPUT_FOLDER = "reports/"
 OUTPUT_CPU_SEPARATE_PNG = "system_usage_cpu_separate.png"
 OUTPUT_CPU_COMBINE_PNG = "system_usage_cpu_combine.png"
 
-os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+# Plot width in pixels (10 in at 100 dpi); each series is reduced to one min/max pair per pixel
+WIDTH_PX = 1000
+
+# Cached base buckets are merged pairwise once there are more than this many per pixel
+MAX_BUCKETS_PER_PX = 8
+
+# Below this many points per series, samples are drawn individually with markers as before
+MARKER_LIMIT = 300
+
+CACHE_VERSION = 1
+
+
+def file_signature(path, binary):
+    """Identifies a recording across appends: its inode plus a hash of its schema and first row."""
+    with open(path, "rb") as f:
+        if binary:
+            header_len = int.from_bytes(f.read(12)[8:12], "little")
+            f.seek(24)  # skip the committed row count, which changes on every flush
+            head = f.read(header_len)
+        else:
+            head = f.readline() + f.readline()
+    return {"inode": os.stat(path).st_ino, "head": hashlib.sha1(head).hexdigest()}
+
+
+def read_new_rows(path, cache):
+    """
+    Reads the rows after the cached prefix.
+
+    Returns:
+        (columns, timestamps in seconds, values [rows, columns], position after each row)
+        Positions are byte offsets for CSV files and row counts for binary recordings.
+    """
+    if cache["binary"]:
+        records = load(path)[cache["rows"]:]
+        columns = [name for name in records.dtype.names if name != "Timestamp"]
+        values = np.column_stack([records[name] for name in columns]) if len(records) else np.empty((0, len(columns)))
+        return columns, np.asarray(records["Timestamp"]), values, cache["rows"] + 1 + np.arange(len(records))
+
+    with open(path, "rb") as f:
+        header = f.readline()
+        offset = max(cache["offset"], len(header))
+        f.seek(offset)
+        data = f.read()
+    data = data[: data.rfind(b"\n") + 1]  # a row still being written is left for next time
+    columns = header.decode("utf-8").strip().split(",")[1:]
+    if not data:
+        return columns, np.empty(0), np.empty((0, len(columns))), np.empty(0, dtype=np.int64)
+    df = pd.read_csv(io.BytesIO(data), header=None, names=["Timestamp", *columns], parse_dates=["Timestamp"])
+    # Naive local timestamps are kept as they are; they are turned back into the same datetimes for plotting
+    seconds = df["Timestamp"].to_numpy().astype("datetime64[ns]").astype(np.int64) / 1e9
+    ends = offset + np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord("\n")) + 1
+    return columns, seconds, df[columns].to_numpy(dtype=float, na_value=np.nan), ends
+
+
+def bucket_minmax(times, values, size):
+    """Min/max of every complete group of `size` rows; NaN-aware, all-NaN groups stay NaN."""
+    n = len(times) // size
+    shaped = values[: n * size].reshape(n, size, values.shape[1])
+    return times[: n * size : size], np.fmin.reduce(shaped, axis=1), np.fmax.reduce(shaped, axis=1)
+
+
+def update_cache(path, cache_path, width, use_cache=True):
+    """
+    Folds the rows appended since the last run into the per-file min/max bucket cache and saves it,
+    so only the new tail of a growing recording is read and parsed.
+
+    Returns:
+        (columns, bucket times, bucket mins, bucket maxs, binary), the unfinished last bucket included.
+    """
+    binary = is_recording(path)
+    signature = file_signature(path, binary)
+    cache = None
+    if use_cache:
+        try:
+            with np.load(cache_path, allow_pickle=False) as npz:
+                meta = json.loads(str(npz["meta"]))
+                if meta["version"] == CACHE_VERSION and meta["signature"] == signature and meta["binary"] == binary:
+                    cache = {**meta, "t": npz["t"], "min": npz["min"], "max": npz["max"]}
+        except (OSError, KeyError, ValueError):
+            pass
+    if cache is None:
+        cache = {"version": CACHE_VERSION, "signature": signature, "binary": binary, "rows": 0, "offset": 0, "size": None}
+
+    columns, times, values, ends = read_new_rows(path, cache)
+    if cache["size"] is None:
+        # First pass: a base bucket size that leaves a few buckets per pixel
+        cache["size"] = max(1, len(times) // (width * MAX_BUCKETS_PER_PX // 2))
+        cache["t"] = np.empty(0)
+        cache["min"] = cache["max"] = np.empty((0, len(columns)))
+
+    t, mins, maxs = bucket_minmax(times, values, cache["size"])
+    complete = len(t) * cache["size"]
+    if complete:
+        cache["rows" if binary else "offset"] = int(ends[complete - 1])
+    cache["t"] = np.concatenate([cache["t"], t])
+    cache["min"] = np.concatenate([cache["min"], mins])
+    cache["max"] = np.concatenate([cache["max"], maxs])
+
+    # Too many buckets for the plot width: merge neighbours pairwise (an odd last one is kept as is)
+    # and double the bucket size used for future rows. Min/max merge exactly, so nothing is lost.
+    while len(cache["t"]) > width * MAX_BUCKETS_PER_PX:
+        even = len(cache["t"]) // 2 * 2
+        for key, merge in (("min", np.fmin), ("max", np.fmax)):
+            cache[key] = np.concatenate([merge(cache[key][:even:2], cache[key][1:even:2]), cache[key][even:]])
+        cache["t"] = np.concatenate([cache["t"][:even:2], cache["t"][even:]])
+        cache["size"] *= 2
+
+    if use_cache:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        meta = {key: cache[key] for key in ("version", "signature", "binary", "rows", "offset", "size")}
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, meta=json.dumps(meta), t=cache["t"], min=cache["min"], max=cache["max"])
+        os.replace(tmp_path, cache_path)
+
+    t, mins, maxs = cache["t"], cache["min"], cache["max"]
+    if complete < len(times):
+        tail = values[complete:]
+        t = np.append(t, times[complete])
+        mins = np.vstack([mins, np.fmin.reduce(tail, axis=0)])
+        maxs = np.vstack([maxs, np.fmax.reduce(tail, axis=0)])
+    return columns, t, mins, maxs, binary
+
+
+def rebucket(t, mins, maxs, width):
+    """Merges cached buckets down to at most `width` buckets."""
+    group = -(-len(t) // width)
+    if group <= 1:
+        return t, mins, maxs
+    pad = -len(t) % group
+    mins = np.vstack([mins, np.full((pad, mins.shape[1]), np.nan)])
+    maxs = np.vstack([maxs, np.full((pad, maxs.shape[1]), np.nan)])
+    shape = (-1, group, mins.shape[1])
+    return t[::group], np.fmin.reduce(mins.reshape(shape), axis=1), np.fmax.reduce(maxs.reshape(shape), axis=1)
+
+
+def build_series(path, cache_dir, width, use_cache=True):
+    """Returns (datetimes, {column: y}, raw); when not raw, each bucket contributes its min then its max."""
+    cache_path = os.path.join(cache_dir, os.path.basename(path) + ".npz")
+    columns, t, mins, maxs, binary = update_cache(path, cache_path, width, use_cache)
+    t, mins, maxs = rebucket(t, mins, maxs, width)
+    if binary:
+        x = pd.to_datetime(t, unit="s", utc=True).tz_convert(datetime.now().astimezone().tzinfo).tz_localize(None)
+    else:
+        x = pd.to_datetime(t, unit="s")
+    raw = len(t) <= MARKER_LIMIT and np.array_equal(mins, maxs, equal_nan=True)
+    if raw:
+        return x.to_numpy(), {column: mins[:, i] for i, column in enumerate(columns)}, True
+    return np.repeat(x.to_numpy(), 2), {column: np.column_stack([mins[:, i], maxs[:, i]]).ravel() for i, column in enumerate(columns)}, False
+
+
+def plot_series(ax, x, y, raw, label, **style):
+    if raw:
+        ax.plot(x, y, marker=style.pop("marker", "o"), linestyle=style.pop("linestyle", "-"), label=label, **style)
+    else:
+        # Vertical min-max strokes per pixel column keep spikes and envelopes visible
+        style.pop("marker", None)
+        ax.plot(x, y, linewidth=0.8, label=label, **style)
+
+
+def render_separate(x, series, raw, output_path):
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    ####################################################  CPU Separate  ####################################################
+    # Plot five graphs
+    metrics = ["CPU Usage (%)", "CPU Temperature (°C)", "Memory Usage (%)", "Disk Usage (%)", "Network Usage (MB/s)"]
+    fig, axes = plt.subplots(5, 1, figsize=(10, 12))
+
+    for i, metric in enumerate(metrics):
+        plot_series(axes[i], x, series[metric], raw, metric)
+        axes[i].set_xlabel("Time")
+        axes[i].set_ylabel(metric)
+        axes[i].legend()
+        axes[i].grid()
+
+    plt.tight_layout()
+    plt.savefig(output_path)
+    plt.close(fig)
+    return output_path
 
-# Read the CSV file
-df = pd.read_csv(INPUT_CSV, parse_dates=["Timestamp"])
 
-# Set timestamp as index
-df.set_index("Timestamp", inplace=True)
+def render_combine(x, series, raw, output_path):
+    import matplotlib
 
-####################################################  CPU Separate (without temperature)  ####################################################
-# Plot four graphs
-# metrics = ["CPU Usage (%)", "Memory Usage (%)", "Disk Usage (%)", "Network Usage (MB/s)"]
-# fig, axes = plt.subplots(4, 1, figsize=(10, 12))
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
 
-# for i, metric in enumerate(metrics):
-#     axes[i].plot(df.index, df[metric], marker="o", linestyle="-", label=metric)
-#     axes[i].set_xlabel("Time")
-#     axes[i].set_ylabel(metric)
-#     axes[i].legend()
-#     axes[i].grid()
+    ####################################################  CPU Combine  ####################################################
+    fig, axes = plt.subplots(4, 1, figsize=(10, 12))
 
-# plt.tight_layout()
-# plt.savefig(OUTPUT_FOLDER + OUTPUT_CPU_SEPARATE_PNG)
+    # CPU Usage and Temperature in one plot
+    ax1 = axes[0]
+    ax2 = ax1.twinx()  # Create a secondary y-axis
 
-####################################################  CPU Separate  ####################################################
-# Plot four graphs
-metrics = ["CPU Usage (%)", "CPU Temperature (°C)", "Memory Usage (%)", "Disk Usage (%)", "Network Usage (MB/s)"]
-fig, axes = plt.subplots(5, 1, figsize=(10, 12))
+    plot_series(ax1, x, series["CPU Usage (%)"], raw, "CPU Usage (%)", color="b")
+    plot_series(ax2, x, series["CPU Temperature (°C)"], raw, "CPU Temp (°C)", marker="s", linestyle="--", color="r")
 
-for i, metric in enumerate(metrics):
-    axes[i].plot(df.index, df[metric], marker="o", linestyle="-", label=metric)
-    axes[i].set_xlabel("Time")
-    axes[i].set_ylabel(metric)
-    axes[i].legend()
-    axes[i].grid()
+    ax1.set_xlabel("Time")
+    ax1.set_ylabel("CPU Usage (%)", color="b")
+    ax2.set_ylabel("CPU Temperature (°C)", color="r")
 
-plt.tight_layout()
-plt.savefig(OUTPUT_FOLDER + OUTPUT_CPU_SEPARATE_PNG)
+    ax1.legend(loc="upper left")
+    ax2.legend(loc="upper right")
+    ax1.grid()
 
+    # Other metrics
+    metrics = ["Memory Usage (%)", "Disk Usage (%)", "Network Usage (MB/s)"]
+    for i, metric in enumerate(metrics):
+        plot_series(axes[i + 1], x, series[metric], raw, metric)
+        axes[i + 1].set_xlabel("Time")
+        axes[i + 1].set_ylabel(metric)
+        axes[i + 1].legend()
+        axes[i + 1].grid()
 
-####################################################  CPU Combine  ####################################################
-# Plot graphs
-fig, axes = plt.subplots(4, 1, figsize=(10, 12))
+    plt.tight_layout()
+    plt.savefig(output_path)
+    plt.close(fig)
+    return output_path
 
-# CPU Usage and Temperature in one plot
-ax1 = axes[0]
-ax2 = ax1.twinx()  # Create a secondary y-axis
 
-ax1.plot(df.index, df["CPU Usage (%)"], marker="o", linestyle="-", color="b", label="CPU Usage (%)")
-ax2.plot(df.index, df["CPU Temperature (°C)"], marker="s", linestyle="--", color="r", label="CPU Temp (°C)")
+def main():
+    parser = argparse.ArgumentParser(description="Plot system_monitor.py recordings (CSV or binary)")
+    parser.add_argument("input", nargs="?", default=INPUT_CSV, help=f"recording to plot (default: {INPUT_CSV})")
+    parser.add_argument("-o", "--output", default=OUTPUT_FOLDER, help=f"output folder (default: {OUTPUT_FOLDER})")
+    parser.add_argument("--width", type=int, default=WIDTH_PX, help=f"plot width in pixels the series are reduced to (default: {WIDTH_PX})")
+    parser.add_argument("--no-cache", action="store_true", help="ignore and do not write the downsampling cache")
+    parser.add_argument("-j", "--workers", type=int, default=2, help="figures rendered in parallel processes (default: 2)")
+    args = parser.parse_args()
 
-ax1.set_xlabel("Time")
-ax1.set_ylabel("CPU Usage (%)", color="b")
-ax2.set_ylabel("CPU Temperature (°C)", color="r")
+    os.makedirs(args.output, exist_ok=True)
+    x, series, raw = build_series(args.input, os.path.join(args.output, ".cache"), args.width, not args.no_cache)
 
-ax1.legend(loc="upper left")
-ax2.legend(loc="upper right")
-ax1.grid()
+    jobs = [
+        (render_separate, os.path.join(args.output, OUTPUT_CPU_SEPARATE_PNG)),
+        (render_combine, os.path.join(args.output, OUTPUT_CPU_COMBINE_PNG)),
+    ]
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(jobs))) as pool:
+            futures = [pool.submit(render, x, series, raw, path) for render, path in jobs]
+            outputs = [future.result() for future in futures]
+    else:
+        outputs = [render(x, series, raw, path) for render, path in jobs]
+    for path in outputs:
+        print(f"Saved {path}")
 
-# Other metrics
-metrics = ["Memory Usage (%)", "Disk Usage (%)", "Network Usage (MB/s)"]
-for i, metric in enumerate(metrics):
-    axes[i + 1].plot(df.index, df[metric], marker="o", linestyle="-", label=metric)
-    axes[i + 1].set_xlabel("Time")
-    axes[i + 1].set_ylabel(metric)
-    axes[i + 1].legend()
-    axes[i + 1].grid()
 
-plt.tight_layout()
-plt.savefig(OUTPUT_FOLDER + OUTPUT_CPU_COMBINE_PNG)
+if __name__ == "__main__":
+    main()
@@ -2,32 +2,161 @@
 # This software is released under the MIT License.
 # https://opensource.org/licenses/MIT
 
-import csv
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
 
-csv_file = "test.csv"
+import numpy as np
+from recording import read_table
 
-cpu_usage, cpu_temp, mem_usage, disk_usage, net_usage = [], [], [], [], []
+CSV_FILE = "test.csv"
+
+PERCENTILES = (25, 50, 75, 95)
+
+# Time above these values is reported; override with --threshold "NAME=VALUE"
+THRESHOLDS = {
+    "CPU Usage (%)": 90.0,
+    "CPU Temperature (°C)": 80.0,
+    "Memory Usage (%)": 90.0,
+}
+
+SUMMARY_VERSION = 1
+
+
+def split_unit(column):
+    """'CPU Usage (%)' -> ('CPU Usage', '%')"""
+    match = re.match(r"^(.*?)\s*\(([^()]*)\)$", column)
+    return (match.group(1), match.group(2)) if match else (column, "")
+
+
+def sample_durations(timestamps):
+    """Seconds each sample stands for: the gap to the next one, the median gap for the last."""
+    if len(timestamps) < 2:
+        return np.ones(len(timestamps))
+    seconds = timestamps.astype("datetime64[ns]").astype(np.int64) / 1e9
+    gaps = np.diff(seconds)
+    return np.append(gaps, np.median(gaps))
+
+
+def summarize_column(values, durations, threshold=None):
+    valid = ~np.isnan(values)
+    count = int(valid.sum())
+    summary = {"count": count, "missing": int(len(values) - count)}
+    if count == 0:
+        return summary
+    data = values[valid]
+    summary["mean"] = float(data.mean())
+    summary["std"] = float(data.std(ddof=1)) if count > 1 else 0.0
+    summary["min"] = float(data.min())
+    for q, value in zip(PERCENTILES, np.percentile(data, PERCENTILES)):
+        summary[f"p{q}"] = float(value)
+    summary["max"] = float(data.max())
+    if threshold is not None:
+        above = valid & (np.nan_to_num(values, nan=-np.inf) > threshold)
+        seconds = float(durations[above].sum())
+        total = float(durations[valid].sum())
+        # Samples with identical timestamps carry no duration; count them instead
+        fraction = seconds / total if total > 0 else float(above.sum()) / count
+        summary["above_threshold"] = {
+            "threshold": threshold,
+            "seconds": seconds,
+            "fraction": fraction,
+        }
+    return summary
+
+
+def summarize_file(path, thresholds):
+    """Summarizes every numeric column of one recording (CSV or binary)."""
+    df = read_table(path)
+    timestamps = df["Timestamp"].to_numpy()
+    durations = sample_durations(timestamps)
+    metrics = {}
+    for column in df.columns:
+        if column == "Timestamp":
+            continue
+        # Empty cells (e.g. no temperature sensor) become NaN instead of a biased 0.0
+        values = df[column].to_numpy(dtype=float, na_value=np.nan)
+        metrics[column] = {"unit": split_unit(column)[1], **summarize_column(values, durations, thresholds.get(column))}
+    return {
+        "file": os.path.abspath(path),
+        "samples": len(df),
+        "start": str(timestamps[0]) if len(df) else None,
+        "duration_s": float(durations.sum()) if len(df) else 0.0,
+        "metrics": metrics,
+    }
+
+
+def print_summary(summary):
+    print(f"== {summary['file']} ({summary['samples']} samples, {summary['duration_s']:.0f} s)")
+    for column, metric in summary["metrics"].items():
+        name, unit = split_unit(column)
+        sep = " " if unit and unit[0].isalpha() else ""
+        if "mean" not in metric:
+            print(f"{name} Average: n/a (no samples)")
+            continue
+        print(f"{name} Average: {metric['mean']:.2f}{sep}{unit}")
+    print(f"{'Metric':<28} {'mean':>8} {'std':>8} {'min':>8} " + " ".join(f"{'p' + str(q):>8}" for q in PERCENTILES) + f" {'max':>8} {'missing':>8}  above")
+    for column, metric in summary["metrics"].items():
+        if "mean" not in metric:
+            continue
+        above = metric.get("above_threshold")
+        above_text = f"{above['fraction'] * 100:.1f}% > {above['threshold']:g}" if above else "-"
+        print(f"{column:<28} {metric['mean']:>8.2f} {metric['std']:>8.2f} {metric['min']:>8.2f} "
+              + " ".join(f"{metric[f'p{q}']:>8.2f}" for q in PERCENTILES)
+              + f" {metric['max']:>8.2f} {metric['missing']:>8}  {above_text}")
+
+
+def parse_thresholds(values):
+    thresholds = dict(THRESHOLDS)
+    for value in values:
+        name, sep, limit = value.rpartition("=")
+        if not sep:
+            raise ValueError(f"Invalid threshold '{value}', expected NAME=VALUE")
+        thresholds[name] = float(limit)
+    return thresholds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize system_monitor.py recordings (CSV or binary)")
+    parser.add_argument("files", nargs="*", default=[CSV_FILE], help=f"recordings to summarize (default: {CSV_FILE})")
+    parser.add_argument("--json", default=None, help="write the machine-readable summary to this file ('-' for stdout)")
+    parser.add_argument("--platform", default=platform.node(), help="platform label stored in the JSON summary (default: host name)")
+    parser.add_argument("--channels", type=int, default=None, help="number of channels of the run, stored in the JSON summary")
+    parser.add_argument("--threshold", action="append", default=[], help='report time above a value, e.g. "CPU Usage (%%)=95" (repeatable)')
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1, help="files summarized in parallel")
+    args = parser.parse_args()
 
-def float_or_default(number,default=0.0):
     try:
-        return float(number)
-    except ValueError:
-        return default
-
-with open(csv_file, 'r') as file:
-    reader = csv.DictReader(file)
-    for row in reader:
-        cpu_usage.append(float(row['CPU Usage (%)']))
-        cpu_temp.append(float_or_default(row['CPU Temperature (°C)']))
-        mem_usage.append(float(row['Memory Usage (%)']))
-        disk_usage.append(float(row['Disk Usage (%)']))
-        net_usage.append(float(row['Network Usage (MB/s)']))
-
-def calculate_average(data):
-    return sum(data) / len(data) if data else 0
-
-print(f"CPU Usage Average: {calculate_average(cpu_usage):.2f}%")
-print(f"CPU Temperature Average: {calculate_average(cpu_temp):.2f}°C")
-print(f"Memory Usage Average: {calculate_average(mem_usage):.2f}%")
-print(f"Disk Usage Average: {calculate_average(disk_usage):.2f}%")
-print(f"Network Usage Average: {calculate_average(net_usage):.2f} MB/s")
+        thresholds = parse_thresholds(args.threshold)
+    except ValueError as e:
+        parser.error(str(e))
+
+    workers = max(1, min(args.workers, len(args.files)))
+    if workers == 1:
+        summaries = [summarize_file(path, thresholds) for path in args.files]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            summaries = list(pool.map(summarize_file, args.files, [thresholds] * len(args.files)))
+
+    for summary in summaries:
+        summary["platform"] = args.platform
+        summary["channels"] = args.channels
+        if args.json != "-":
+            print_summary(summary)
+
+    if args.json:
+        document = json.dumps({"version": SUMMARY_VERSION, "summaries": summaries}, indent=2, ensure_ascii=False)
+        if args.json == "-":
+            print(document)
+        else:
+            with open(args.json, "w", encoding="utf-8") as f:
+                f.write(document + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
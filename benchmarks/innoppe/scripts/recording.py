@@ -0,0 +1,182 @@
+# Copyright (c) 2025 Innodisk Corp.
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+"""
+Binary recording format for system_monitor.py.
+
+Layout (little endian):
+    0   8 bytes   magic b"IQSREC\\x00\\x01"
+    8   uint32    length of the JSON header
+    12  uint32    reserved
+    16  uint64    committed row count
+    24  JSON      {"version": 1, "fields": [...], "created": ...}
+        padding to a 64-byte boundary, then fixed-size float64 records, one per row
+
+Rows are appended in chunks. Each chunk is flushed and fsync'ed before the committed row count
+is updated, so a crash or power loss loses at most the last chunk and never leaves a torn row
+visible. The data region is one contiguous array of records, so readers memory-map the file
+and get every column as a zero-copy (strided) numpy view. NaN stands for a missing value;
+the Timestamp column holds seconds since the epoch.
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import struct
+import sys
+import time
+from datetime import datetime
+
+MAGIC = b"IQSREC\x00\x01"
+VERSION = 1
+PREFIX = struct.Struct("<8sIIQ")
+COUNT_OFFSET = 16
+ALIGNMENT = 64
+FLUSH_INTERVAL = 10
+
+
+class RecordingWriter:
+    """Appends rows of floats (None for missing) to a new recording, committing a chunk every `flush_interval` seconds."""
+
+    def __init__(self, path, fields, flush_interval=FLUSH_INTERVAL):
+        self.fields = list(fields)
+        self.row = struct.Struct(f"<{len(self.fields)}d")
+        header = json.dumps({"version": VERSION, "fields": self.fields, "created": time.time()}).encode()
+        self.data_offset = -(-(PREFIX.size + len(header)) // ALIGNMENT) * ALIGNMENT
+
+        self.file = open(path, "wb")
+        self.file.write(PREFIX.pack(MAGIC, len(header), 0, 0) + header)
+        self.file.write(b"\0" * (self.data_offset - PREFIX.size - len(header)))
+        self.pending = []
+        self.committed = 0
+        self.flush_interval = flush_interval
+        self.last_flush = time.monotonic()
+        self.flush()
+
+    def write(self, row):
+        self.pending.append(self.row.pack(*(math.nan if value is None else value for value in row)))
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Writes the pending chunk, makes it durable, then commits its rows."""
+        self.file.seek(0, os.SEEK_END)
+        self.file.write(b"".join(self.pending))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.committed += len(self.pending)
+        self.pending.clear()
+        self.file.seek(COUNT_OFFSET)
+        self.file.write(struct.pack("<Q", self.committed))
+        self.file.flush()
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def read_header(path):
+    """Returns (header dict, data offset, committed rows, rows physically present)."""
+    with open(path, "rb") as f:
+        magic, header_len, _, committed = PREFIX.unpack(f.read(PREFIX.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a recording file")
+        header = json.loads(f.read(header_len))
+    if header.get("version") != VERSION:
+        raise ValueError(f"{path}: unsupported recording version {header.get('version')}")
+    data_offset = -(-(PREFIX.size + header_len) // ALIGNMENT) * ALIGNMENT
+    present = max(0, os.path.getsize(path) - data_offset) // (8 * len(header["fields"]))
+    return header, data_offset, committed, present
+
+
+def load(path, salvage=False):
+    """
+    Memory-maps a recording as a numpy structured array; `array[field]` is a zero-copy column view.
+
+    Only committed rows are returned, unless `salvage` is set: then every complete row on disk is,
+    which recovers the last chunk of a monitor that was killed before it could commit it.
+    """
+    import numpy as np
+
+    header, data_offset, committed, present = read_header(path)
+    rows = present if salvage else min(committed, present)
+    dtype = np.dtype([(name, "<f8") for name in header["fields"]])
+    if rows == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=data_offset, shape=(rows,))
+
+
+def load_dataframe(path, salvage=False):
+    """Same data as pandas.read_csv(..., parse_dates=["Timestamp"]) on the CSV export."""
+    import pandas as pd
+
+    records = load(path, salvage)
+    df = pd.DataFrame({name: records[name] for name in records.dtype.names}, copy=False)
+    local_tz = datetime.now().astimezone().tzinfo
+    df["Timestamp"] = pd.to_datetime(df["Timestamp"], unit="s", utc=True).dt.tz_convert(local_tz).dt.tz_localize(None)
+    return df
+
+
+def is_recording(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def read_table(path):
+    """DataFrame from either a binary recording or a system_monitor.py CSV file, detected by content."""
+    if is_recording(path):
+        return load_dataframe(path)
+    import pandas as pd
+
+    return pd.read_csv(path, parse_dates=["Timestamp"])
+
+
+def export_csv(path, output, salvage=False):
+    """Writes the recording in the CSV layout system_monitor.py produces with --format csv."""
+    header, data_offset, committed, present = read_header(path)
+    rows = present if salvage else min(committed, present)
+    row = struct.Struct(f"<{len(header['fields'])}d")
+    with open(path, "rb") as f, open(output, "w", newline="") as out:
+        writer = csv.writer(out)
+        writer.writerow(header["fields"])
+        f.seek(data_offset)
+        for _ in range(rows):
+            values = row.unpack(f.read(row.size))
+            timestamp = datetime.fromtimestamp(values[0]).strftime("%Y-%m-%d %H:%M:%S")
+            writer.writerow([timestamp] + ["" if math.isnan(v) else v for v in values[1:]])
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or convert system_monitor.py recordings")
+    sub = parser.add_subparsers(dest="command", required=True)
+    info = sub.add_parser("info", help="print the schema and row counts")
+    info.add_argument("recording")
+    export = sub.add_parser("export", help="convert to CSV")
+    export.add_argument("recording")
+    export.add_argument("-o", "--output", default="test.csv", help="CSV file to write (default: test.csv)")
+    for command in (info, export):
+        command.add_argument("--salvage", action="store_true", help="include complete rows that were never committed")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "info":
+            header, _, committed, present = read_header(args.recording)
+            print(f"Created: {datetime.fromtimestamp(header['created']):%Y-%m-%d %H:%M:%S}")
+            print(f"Rows: {committed} committed, {present} on disk")
+            print("Fields:", ", ".join(header["fields"]))
+        else:
+            rows = export_csv(args.recording, args.output, args.salvage)
+            print(f"Exported {rows} rows to {args.output}")
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,62 +2,179 @@
 # This software is released under the MIT License.
 # https://opensource.org/licenses/MIT
 
-import psutil
-import time
+import argparse
 import csv
+import glob
+import os
+import signal
+import time
 from datetime import datetime
 
+import psutil
+from recording import RecordingWriter
+
 PERIOD = 1
 
-# CSV file name
+# Buffered rows are written to disk at least this often (seconds)
+FLUSH_INTERVAL = 10
+
+# Output file name
 CSV_FILE = "test.csv"
+BIN_FILE = "test.bin"
 
-# CSV column names
+# CSV column names; one column per thermal zone is appended after these
 FIELDS = ["Timestamp", "CPU Usage (%)", "CPU Temperature (°C)", "Memory Usage (%)", "Disk Usage (%)", "Network Usage (MB/s)"]
 
-# Create or overwrite the CSV file and write the header
-with open(CSV_FILE, mode="w", newline="") as file:
-    writer = csv.writer(file)
-    writer.writerow(FIELDS)  # Write the header
-
-print(f"Created new file: {CSV_FILE}")
-
-# Start logging system metrics
-while True:
-    # Get current timestamp
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    # Get CPU usage
-    cpu_usage = psutil.cpu_percent(interval=1)
-
-    # Get CPU temperature
-    temps = psutil.sensors_temperatures()
-    cpu_temp = None
-
-    if 'coretemp' in temps:  
-        for sensor in temps['coretemp']:  
-            if sensor.label == 'Package id 0':  
-                cpu_temp = sensor.current
-                break
-
-    # Get memory usage
-    memory_usage = psutil.virtual_memory().percent
-    
-    # Calculate network usage (difference over 1 second)
-    net1 = psutil.net_io_counters()
-    time.sleep(1)
-    net2 = psutil.net_io_counters()
-    net_usage = round(((net2.bytes_sent + net2.bytes_recv) - (net1.bytes_sent + net1.bytes_recv)) / (1024 * 1024) * 100) / 100  # MB/s
-    
-    # Get disk free space percentage
-    disk_free = round((psutil.disk_usage("/").total-psutil.disk_usage("/").free) / psutil.disk_usage("/").total * 100 * 100) / 100  # Percentage
-
-    # Append data to the CSV file
-    with open(CSV_FILE, mode="a", newline="") as file:
-        writer = csv.writer(file)
-        writer.writerow([timestamp, cpu_usage, cpu_temp, memory_usage, disk_free, net_usage])
-    
-    # print(f"Logged: {timestamp}, CPU: {cpu_usage}%, Memory: {memory_usage}%, Disk Free: {disk_free:.2f}%, Network: {net_usage:.2f}MB/s")
-    
-    # Wait for 4 more seconds to maintain a 5-second interval
-    time.sleep(PERIOD)
+
+class ThermalZones:
+    """Reads every /sys/class/thermal zone; the files stay open and are re-read from offset 0."""
+
+    def __init__(self):
+        self.zones = []
+        paths = glob.glob("/sys/class/thermal/thermal_zone*")
+        for path in sorted(paths, key=lambda p: int(p.rsplit("thermal_zone", 1)[1])):
+            try:
+                with open(os.path.join(path, "type")) as f:
+                    zone_type = f.read().strip()
+                self.zones.append((f"{os.path.basename(path)} {zone_type} (°C)", open(os.path.join(path, "temp"), "rb", buffering=0)))
+            except OSError:
+                continue
+
+    @property
+    def fields(self):
+        return [name for name, _ in self.zones]
+
+    def read(self):
+        temps = []
+        for _, f in self.zones:
+            try:
+                f.seek(0)
+                temps.append(int(f.read()) / 1000)
+            except (OSError, ValueError):
+                temps.append(None)  # some zones (e.g. powered-down sensors) fail to read
+        return temps
+
+    def close(self):
+        for _, f in self.zones:
+            f.close()
+
+
+def package_temperature():
+    """The x86 'coretemp' package sensor, if present."""
+    for sensor in psutil.sensors_temperatures().get("coretemp", []):
+        if sensor.label == "Package id 0":
+            return sensor.current
+    return None
+
+
+class Sampler:
+    """
+    Takes every metric in one tick. CPU and network usage are deltas against the previous tick,
+    so a tick never blocks and the sampling period is set by the caller alone.
+    """
+
+    def __init__(self):
+        self.thermal = ThermalZones()
+        self.has_coretemp = package_temperature() is not None
+        psutil.cpu_percent(interval=None)  # prime the CPU counters
+        self.prev_net = self._net_bytes()
+        self.prev_time = time.monotonic()
+
+    @staticmethod
+    def _net_bytes():
+        net = psutil.net_io_counters()
+        return net.bytes_sent + net.bytes_recv
+
+    @property
+    def fields(self):
+        return FIELDS + self.thermal.fields
+
+    def tick(self):
+        now = time.monotonic()
+        elapsed = now - self.prev_time
+        net = self._net_bytes()
+        net_usage = round((net - self.prev_net) / elapsed / (1024 * 1024) * 100) / 100 if elapsed > 0 else 0.0  # MB/s
+        self.prev_net, self.prev_time = net, now
+
+        cpu_usage = psutil.cpu_percent(interval=None)
+        zone_temps = self.thermal.read()
+        # Keep the x86 package sensor where it exists; elsewhere (e.g. ARM) report the hottest zone.
+        valid_temps = [t for t in zone_temps if t is not None]
+        cpu_temp = package_temperature() if self.has_coretemp else (max(valid_temps) if valid_temps else None)
+        memory_usage = psutil.virtual_memory().percent
+        disk = psutil.disk_usage("/")
+        disk_usage = round((disk.total - disk.free) / disk.total * 100 * 100) / 100  # Percentage
+
+        return [datetime.now(), cpu_usage, cpu_temp, memory_usage, disk_usage, net_usage] + zone_temps
+
+    def close(self):
+        self.thermal.close()
+
+
+class CsvSink:
+    """Appends rows through one open, buffered file, flushed every `flush_interval` seconds."""
+
+    def __init__(self, path, fields, flush_interval=FLUSH_INTERVAL):
+        self.file = open(path, mode="w", newline="", buffering=1 << 16)
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(fields)  # Write the header
+        self.flush_interval = flush_interval
+        self.last_flush = time.monotonic()
+
+    def write(self, row):
+        self.writer.writerow([row[0].strftime("%Y-%m-%d %H:%M:%S")] + row[1:])
+        now = time.monotonic()
+        if now - self.last_flush >= self.flush_interval:
+            self.file.flush()
+            self.last_flush = now
+
+    def close(self):
+        self.file.close()
+
+
+class BinarySink(RecordingWriter):
+    """Same rows in the binary recording format (see recording.py); the timestamp is stored as epoch seconds."""
+
+    def write(self, row):
+        super().write([row[0].timestamp()] + row[1:])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Log CPU, temperature, memory, disk and network usage")
+    parser.add_argument("-o", "--output", default=None, help=f"output file (default: {CSV_FILE} or {BIN_FILE})")
+    parser.add_argument("--format", choices=("csv", "bin"), default="csv", help="CSV text, or the binary recording format read by recording.py (default: csv)")
+    parser.add_argument("--period", type=float, default=PERIOD, help=f"sampling period in seconds (default: {PERIOD})")
+    parser.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL, help=f"seconds between disk flushes (default: {FLUSH_INTERVAL})")
+    args = parser.parse_args()
+
+    # SIGTERM stops the loop like Ctrl + C, so buffered rows are not lost
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    if args.output is None:
+        args.output = BIN_FILE if args.format == "bin" else CSV_FILE
+
+    sampler = Sampler()
+    sink_class = BinarySink if args.format == "bin" else CsvSink
+    sink = sink_class(args.output, sampler.fields, args.flush_interval)
+    print(f"Created new file: {args.output}")
+
+    # Start logging system metrics; deadlines are absolute so the period does not drift
+    next_tick = time.monotonic() + args.period
+    try:
+        while True:
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+            sink.write(sampler.tick())
+            next_tick += args.period
+            now = time.monotonic()
+            if next_tick < now:  # fell behind (e.g. suspended); skip the missed ticks
+                next_tick += (int((now - next_tick) / args.period) + 1) * args.period
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sink.close()
+        sampler.close()
+    print(f"Saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
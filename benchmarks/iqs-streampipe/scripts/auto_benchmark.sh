@@ -102,8 +102,26 @@ echo "[INFO] Warming up for ${WARMUP_TIME}s..."
 sleep "${WARMUP_TIME}"
 
 if kill -0 $BENCH_PID 2>/dev/null; then
+    # Track the benchmark's process tree, and its container's cgroup when cgroup v2 is available.
+    # BENCH_PID is the `timeout` wrapper: on nv its tree contains the app, but on qcom it only holds
+    # timeout, iqs-launcher and the docker CLI, so there only the container's cgroup measures the app.
+    MONITOR_ARGS=(--pid "$BENCH_PID")
+    SCOPE_NOTE=""
+    if [[ -f /sys/fs/cgroup/cgroup.controllers ]] && command -v docker &> /dev/null; then
+        CONTAINER_ID=$(docker ps --format '{{.ID}} {{.Image}}' | awk '$2 ~ /iqs-streampipe/ {print $1; exit}')
+        [[ -n "$CONTAINER_ID" ]] && MONITOR_ARGS+=(--cgroup "$CONTAINER_ID")
+    fi
+    if [[ "$TARGET_PLATFORM" == "qcom" && -z "$CONTAINER_ID" ]]; then
+        # No cgroup v2, no docker CLI, or the container is not up yet: fall back to the whole system.
+        echo "[WARNING] Could not find the cgroup v2 of the iqs-streampipe container; reporting system-wide CPU/MEM only." >&2
+        MONITOR_ARGS=()
+        SCOPE_NOTE="[INFO] Monitor scope: system-wide (iqs-streampipe container not found)"
+    fi
     echo "[INFO] Start monitoring for ${MONITOR_DURATION}s..."
-    timeout "${MONITOR_DURATION}" ./venv/bin/python3 ./scripts/system_monitor.py 1> >(tee "$OUTPUTPATH")
+    {
+        [[ -n "$SCOPE_NOTE" ]] && echo "$SCOPE_NOTE"
+        timeout "${MONITOR_DURATION}" ./venv/bin/python3 ./scripts/system_monitor.py "${MONITOR_ARGS[@]}"
+    } 1> >(tee "$OUTPUTPATH")
 else
     echo "[ERROR] Benchmark process failed to start or crashed during warmup." 2>&1
     exit 1
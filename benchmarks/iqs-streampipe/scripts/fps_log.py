@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+Summarizes per-channel E2E FPS from streampipe benchmark logs (e.g. logs/qcom_ch9.txt).
+
+Understood lines, anywhere in the log:
+    channel:3 frame=1234 ts=1712345678.123456     one output frame; ts in seconds (lower case)
+    [2025-08-01 10:00:00] channel:3 fps=29.8      a live FPS report; "ch 3 ... 29.8 FPS" works too
+    Channel ID  avg (FPS) p95 p75 p50 p25         the app's final FPS table, reported as is
+
+Frame lines give an instantaneous FPS per frame (1 / gap to the channel's previous frame).
+The log is split into byte ranges scanned in parallel, each with one regex pass per line kind;
+the numbers are binned with numpy into constant-size histograms (stream_stats.StreamStats) that
+are merged in log order, so memory does not grow with the log. Counts, min/max and percentiles do
+not depend on -j or the range size; means and standard deviations may differ in the last digits,
+as the floating-point sums are added up in a different order.
+"""
+import argparse
+import itertools
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from stream_stats import PERCENTILES, StreamStats, dump_state
+
+# Live per-channel FPS lines, e.g. "channel:3 fps=29.8" or "[ch 3] 29.8 FPS"; the final table rows
+# ("channel:3  28.88  67.38 ...") carry no FPS unit and do not match.
+LIVE_FPS_PATTERN = r"\b(?:channel|ch)\s*[:#]?\s*(?P<channel>\d+)[^\d\n]*?(?:fps\s*[=:]\s*(?P<fps>\d+(?:\.\d+)?)|(?P<fps2>\d+(?:\.\d+)?)\s*fps)"
+
+FRAME_RE = re.compile(rb"\bch(?:annel)?[:# ]*(\d+)[^\n]*?\bts=(\d+(?:\.\d+)?)")  # case-sensitive: much faster
+_FPS = re.sub(r"\?P<\w+>", "", LIVE_FPS_PATTERN).encode()
+STAMP = rb"\[?(\d{4}-\d\d-\d\d[ T]\d\d:\d\d:\d\d(?:\.\d+)?)\]?"
+# Anchored at line start: unanchored, the lazy [^\n]*? is retried from every byte of every line
+FPS_RE = re.compile(rb"^(?:" + STAMP + rb")?[^\n]*?" + _FPS, re.IGNORECASE | re.MULTILINE)
+STAMPED_FPS_RE = re.compile(rb"^" + STAMP + rb"[^\n]*?" + _FPS, re.IGNORECASE | re.MULTILINE)
+FPS_LINE_DENSITY = 64  # below one "fps" per this many bytes, the matching lines are picked out first
+TABLE_START = b"Channel ID"
+
+FPS_RANGE = (0.0, 240.0, 2400)  # StreamStats layout for FPS: 0.1 FPS resolution
+TABLE_COLUMNS = ("avg", "p95", "p75", "p50", "p25")
+CHUNK_SIZE = 32 << 20
+MAX_TABLE = 1 << 20
+WARMUP = 180
+STALL_GAP = 1.0
+STALL_FPS = 1.0
+
+class FpsTableParser:
+    """
+    Picks the "FPS" table out of the app's output, line by line:
+
+        Channel ID  avg (FPS) p95    p75    p50    p25
+        channel:0   28.88     67.38  38.80  29.57  23.97
+        ...
+        ALL         28.90     64.68  38.54  29.70  23.94
+
+    The "Inference_time" table has the same layout with "avg (ms)" and is skipped.
+    """
+    def __init__(self):
+        self.rows = None
+        self.table = None  # last complete table: {"channels": {id: {avg, p95, ...}}, "all": {...}}
+
+    def feed(self, line):
+        """Returns True when the line completed a table."""
+        fields = line.split()
+        if not fields:
+            return False
+        if line.lstrip().startswith("Channel ID"):
+            self.rows = {} if "(FPS)" in line else None
+            return False
+        if self.rows is None:
+            return False
+        try:
+            values = dict(zip(TABLE_COLUMNS, map(float, fields[1:6])))
+        except ValueError:
+            return False
+        if len(values) < len(TABLE_COLUMNS):
+            return False
+        if fields[0] == "ALL":
+            self.table = {"channels": self.rows, "all": values}
+            self.rows = None
+            return True
+        if fields[0].startswith("channel:"):
+            self.rows[int(fields[0].split(":", 1)[1])] = values
+        return False
+
+def stats_from_array(values, layout=FPS_RANGE):
+    """A StreamStats holding `values`, built in one vectorized pass instead of one add() per value."""
+    import numpy as np
+
+    stats = StreamStats(*layout)
+    if not len(values):
+        return stats
+    stats.n = len(values)
+    stats.mean = float(values.mean())
+    stats.m2 = float(((values - stats.mean) ** 2).sum())
+    stats.min, stats.max = float(values.min()), float(values.max())
+    # Same bucket rule as StreamStats.add: underflow, [lo, hi) in `buckets` steps, overflow
+    index = np.clip(((values - stats.lo) / stats.width).astype(np.int64) + 1, 0, stats.buckets + 1)
+    index[values < stats.lo] = 0
+    stats.counts = np.bincount(index, minlength=stats.buckets + 2).tolist()
+    return stats
+
+def to_array(matches, columns):
+    """findall() tuples -> float array [matches, columns]; empty groups become NaN."""
+    import numpy as np
+
+    # One C-level parse of the joined text is much faster than converting each match
+    text = b" ".join(group or b"nan" for group in itertools.chain.from_iterable(matches))
+    return np.fromstring(text, sep=" ").reshape(-1, columns)
+
+class Stalls:
+    """Count, total and longest stall of a channel; a stall is a frame gap or a low-FPS report."""
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.longest = 0.0
+        self.at = None  # seconds into the log of the longest stall
+
+    def add(self, gaps, times=None):
+        if not len(gaps):
+            return
+        self.count += len(gaps)
+        self.seconds += float(sum(gaps))
+        i = max(range(len(gaps)), key=lambda i: gaps[i])
+        if gaps[i] > self.longest:
+            self.longest = float(gaps[i])
+            self.at = None if times is None or times[i] != times[i] else float(times[i])  # NaN: untimed report
+
+    def merge(self, other):
+        self.count += other.count
+        self.seconds += other.seconds
+        if other.longest > self.longest:
+            self.longest, self.at = other.longest, other.at
+
+    def to_dict(self):
+        return {"count": self.count, "seconds": round(self.seconds, 3), "longest": round(self.longest, 3), "at": self.at}
+
+class Channel:
+    """One channel's results, for a byte range of the log or, merged in order, for the whole log."""
+    def __init__(self):
+        self.warmup = StreamStats(*FPS_RANGE)
+        self.steady = StreamStats(*FPS_RANGE)
+        self.stalls = Stalls()
+        self.first_ts = None  # first and last frame timestamps, to bridge the gap between ranges
+        self.last_ts = None
+        self.head = []  # the range's first untimed FPS reports (up to warmup_samples), split when merged
+        self.reports = 0  # untimed FPS reports
+
+class Settings:
+    def __init__(self, warmup=WARMUP, warmup_samples=0, stall_gap=STALL_GAP, stall_fps=STALL_FPS):
+        self.warmup = warmup
+        self.warmup_samples = warmup_samples
+        self.stall_gap = stall_gap
+        self.stall_fps = stall_fps
+        # First frame timestamp and first FPS line timestamp of the log; the two may use different clocks
+        self.start = {"frame": None, "line": None}
+
+def has_fps_lines(data):
+    """Cheap pre-check for "fps=", "fps:" or "29.8 fps"; the FPS regex is the slowest pass."""
+    lower = data.lower()
+    return b"fps=" in lower or b"fps:" in lower or b" fps" in lower
+
+def fps_lines(data):
+    """
+    The part of `data` worth running FPS_RE on. In app logs with a few FPS reports among other
+    output, only the lines mentioning "fps" are kept, joined, so the regex skips the rest.
+    """
+    lower = data.lower()
+    hits = lower.count(b"fps")
+    if not hits or hits * FPS_LINE_DENSITY >= len(data):
+        return data if hits else b""
+    lines = []
+    pos = lower.find(b"fps")
+    while pos >= 0:
+        start = data.rfind(b"\n", 0, pos) + 1
+        end = data.find(b"\n", pos)
+        end = len(data) if end < 0 else end
+        lines.append(data[start:end])
+        pos = lower.find(b"fps", end)
+    return b"\n".join(lines)
+
+def find_start(path, settings, chunk_size=CHUNK_SIZE):
+    """Sets settings.start from the first frame and the first timestamped FPS line of the log."""
+    import numpy as np
+
+    start = settings.start
+    with open(path, "rb") as f:
+        while start["frame"] is None or start["line"] is None:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            data += f.readline()
+            if start["frame"] is None and b"ts=" in data:
+                match = FRAME_RE.search(data)
+                if match:
+                    start["frame"] = float(match.group(2))
+            if start["line"] is None and has_fps_lines(data):
+                match = STAMPED_FPS_RE.search(data)
+                if match:
+                    start["line"] = np.datetime64(match.group(1).decode(), "ms").astype(np.int64) / 1000.0
+    return settings
+
+def split_ranges(path, chunk_size=CHUNK_SIZE):
+    """Byte ranges of about chunk_size that start and end on line boundaries."""
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, "rb") as f:
+        start = 0
+        while start < size:
+            f.seek(min(start + chunk_size, size))
+            f.readline()
+            end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+def add_fps(channel, fps, steady):
+    channel.warmup.merge(stats_from_array(fps[~steady]))
+    channel.steady.merge(stats_from_array(fps[steady]))
+
+def scan_frames(channels, data, settings):
+    import numpy as np
+
+    values = to_array(FRAME_RE.findall(data), 2)
+    if not len(values):
+        return
+    ids, ts = values[:, 0].astype(np.int64), values[:, 1]
+    start = settings.start["frame"]
+    for channel_id in np.unique(ids):
+        channel = channels.setdefault(int(channel_id), Channel())
+        times = ts[ids == channel_id]
+        channel.first_ts, channel.last_ts = float(times[0]), float(times[-1])
+        gaps, times = np.diff(times), times[1:]  # the gap before the range's first frame is bridged when merging
+        valid = gaps > 0
+        add_fps(channel, 1.0 / gaps[valid], times[valid] >= start + settings.warmup)
+        stalled = gaps > settings.stall_gap
+        channel.stalls.add(gaps[stalled].tolist(), (times[stalled] - start).tolist())
+
+def scan_reports(channels, data, settings):
+    import numpy as np
+
+    matches = FPS_RE.findall(fps_lines(data))
+    if not matches:
+        return
+    values = to_array([m[1:] for m in matches], 3)
+    ids = values[:, 0].astype(np.int64)
+    fps = np.where(np.isnan(values[:, 1]), values[:, 2], values[:, 1])
+    times = np.full(len(matches), np.nan)
+    timed = np.array([bool(m[0]) for m in matches])
+    if timed.any():
+        stamps = np.array([m[0] for m in matches if m[0]], dtype="S32").astype("datetime64[ms]")
+        times[timed] = stamps.astype(np.int64) / 1000.0
+    start = settings.start["line"] or 0.0
+    steady_all = times >= start + settings.warmup  # NaN (untimed) compares False
+    for channel_id in np.unique(ids):
+        mask = ids == channel_id
+        channel = channels.setdefault(int(channel_id), Channel())
+        reports, steady, untimed = fps[mask], steady_all[mask], ~timed[mask]
+        # Untimed reports are warm-up by position: only the range's first warmup_samples can be,
+        # depending on the ranges before; they are kept aside and split when merging.
+        order = np.cumsum(untimed) - 1
+        head = untimed & (order < settings.warmup_samples)
+        channel.head.extend(reports[head].tolist())
+        channel.reports += int(untimed.sum())
+        steady[untimed] = True
+        add_fps(channel, reports[~head], steady[~head])
+        low = reports <= settings.stall_fps
+        # A report covers about one second, so a low-FPS report counts as one stalled second
+        channel.stalls.add([1.0] * int(low.sum()), (times[mask][low] - start).tolist())
+
+def scan_tables(data):
+    table = None
+    start = data.find(TABLE_START)
+    while start >= 0:
+        parser = FpsTableParser()
+        for line in data[start : start + MAX_TABLE].split(b"\n"):
+            if parser.feed(line.decode("utf-8", "replace")):
+                table = parser.table
+                break
+            if parser.rows is None and not line.lstrip().startswith(TABLE_START):
+                break  # the "Inference_time" table, or not a table at all
+        start = data.find(TABLE_START, start + 1)
+    return table
+
+def scan_range(path, start, end, settings):
+    """Scans one byte range; tables starting in it may run past its end."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+        tail = f.read(MAX_TABLE) if TABLE_START in data else b""
+    channels = {}
+    if b"ts=" in data:
+        scan_frames(channels, data, settings)
+    scan_reports(channels, data, settings)
+    table = scan_tables(data + tail) if TABLE_START in data else None
+    return channels, table
+
+class LogSummary:
+    """
+    Per-channel warm-up and steady-state FPS histograms of a log.
+
+    The warm-up is the first `warmup` seconds after the first timestamp of the log (frame
+    timestamps and line timestamps are timed separately, they may use different clocks);
+    FPS reports without a timestamp use the first `warmup_samples` reports of each channel instead.
+    """
+    def __init__(self, settings):
+        self.settings = settings
+        self.channels = {}
+        self.last_frame = None
+        self.table = None
+
+    def merge(self, channels, table):
+        """Adds the results of the next byte range, in log order."""
+        settings = self.settings
+        for channel_id, part in channels.items():
+            total = self.channels.setdefault(channel_id, Channel())
+            if part.first_ts is not None:
+                if total.last_ts is not None and part.first_ts > total.last_ts:
+                    gap = part.first_ts - total.last_ts
+                    steady = part.first_ts >= settings.start["frame"] + settings.warmup
+                    (total.steady if steady else total.warmup).add(1.0 / gap)
+                    if gap > settings.stall_gap:
+                        total.stalls.add([gap], [part.first_ts - settings.start["frame"]])
+                if total.first_ts is None:
+                    total.first_ts = part.first_ts
+                total.last_ts = part.last_ts
+                self.last_frame = max(self.last_frame or part.last_ts, part.last_ts)
+            for i, fps in enumerate(part.head):
+                (total.warmup if total.reports + i < settings.warmup_samples else total.steady).add(fps)
+            total.reports += part.reports
+            total.warmup.merge(part.warmup)
+            total.steady.merge(part.steady)
+            total.stalls.merge(part.stalls)
+        if table:
+            self.table = table
+
+    def read(self, path, workers=1, chunk_size=CHUNK_SIZE):
+        find_start(path, self.settings, chunk_size)
+        ranges = split_ranges(path, chunk_size)
+        args = ([path] * len(ranges), [r[0] for r in ranges], [r[1] for r in ranges], [self.settings] * len(ranges))
+        if workers > 1 and len(ranges) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+                for channels, table in pool.map(scan_range, *args):
+                    self.merge(channels, table)
+        else:
+            for channels, table in map(scan_range, *args):
+                self.merge(channels, table)
+        return self
+
+    def aggregate(self, phase="steady"):
+        merged = StreamStats(*FPS_RANGE)
+        for channel in self.channels.values():
+            merged.merge(getattr(channel, phase))
+        return merged
+
+    def to_dict(self):
+        start = self.settings.start["frame"]
+        duration = None if start is None else self.last_frame - start
+        return {
+            "warmup_s": self.settings.warmup,
+            "duration_s": duration,
+            "channels": {
+                str(channel_id): {"steady": channel.steady.summary(), "warmup": channel.warmup.summary(), "stalls": channel.stalls.to_dict()}
+                for channel_id, channel in sorted(self.channels.items())
+            },
+            "all": {"steady": self.aggregate().summary(), "warmup": self.aggregate("warmup").summary()},
+            "app_table": self.table,
+        }
+
+def format_row(name, stats, stalls=None):
+    if not stats.n:
+        return f"{name:<12} {'no samples':>9}"
+    s = stats.summary()
+    row = f"{name:<12} {s['mean']:9.2f} " + " ".join(f"{s[f'p{q}']:7.2f}" for q in reversed(PERCENTILES)) + f" {s['min']:7.2f} {s['n']:>9}"
+    if stalls is not None:
+        row += f" {stalls.count:>7} {stalls.longest:8.2f}"
+    return row
+
+def print_summary(path, summary):
+    print(f"== {path}")
+    warmup = summary.aggregate("warmup")
+    print(f"Warm-up: first {summary.settings.warmup:g}s ({warmup.n} samples, avg {warmup.mean:.2f} FPS)" if warmup.n
+          else f"Warm-up: first {summary.settings.warmup:g}s (no samples)")
+    print(f"{'Channel ID':<12} {'avg (FPS)':>9} " + " ".join(f"{'p' + str(q):>7}" for q in reversed(PERCENTILES))
+          + f" {'min':>7} {'samples':>9} {'stalls':>7} {'longest':>8}")
+    print("-" * 96)
+    for channel_id, channel in sorted(summary.channels.items()):
+        print(format_row(f"channel:{channel_id}", channel.steady, channel.stalls))
+    print("-" * 96)
+    print(format_row("ALL", summary.aggregate()))
+    if summary.table:
+        row = summary.table["all"]
+        print("App table ALL: " + " ".join(f"{column}={row[column]:.2f}" for column in TABLE_COLUMNS))
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-channel E2E FPS percentiles, stalls and warm-up split from streampipe logs")
+    parser.add_argument("logs", nargs="+", help="Benchmark logs, e.g. logs/qcom_ch9.txt")
+    parser.add_argument("-w", "--warmup", type=float, default=WARMUP, help=f"Seconds of warm-up excluded from the steady state, default={WARMUP}")
+    parser.add_argument("--warmup-samples", type=int, default=0, help="Warm-up reports per channel for FPS lines without a timestamp, default=0")
+    parser.add_argument("--stall-gap", type=float, default=STALL_GAP, help=f"Frame gap in seconds counted as a stall, default={STALL_GAP}")
+    parser.add_argument("--stall-fps", type=float, default=STALL_FPS, help=f"FPS report at or below this counted as a stall, default={STALL_FPS}")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1, help="Processes scanning the log in parallel, default=CPU count")
+    parser.add_argument("--json", default=None, help="Write all summaries as JSON to this file ('-' for stdout)")
+    parser.add_argument("--state-out", default=None, help="Save mergeable steady-state FPS statistics (one log only); see stream_stats.py")
+    args = parser.parse_args()
+    if args.state_out and len(args.logs) > 1:
+        parser.error("--state-out takes a single log")
+
+    results = {}
+    for path in args.logs:
+        settings = Settings(args.warmup, args.warmup_samples, args.stall_gap, args.stall_fps)
+        try:
+            summary = LogSummary(settings).read(path, args.workers)
+        except OSError as e:
+            print(f"[ERROR] {e}", file=sys.stderr)
+            return 1
+        results[path] = summary.to_dict()
+        if args.json != "-":
+            print_summary(path, summary)
+        if args.state_out:
+            metrics = {"fps": summary.aggregate(), **{f"fps_ch{i}": c.steady for i, c in summary.channels.items()}}
+            dump_state(args.state_out, metrics)
+    if args.json:
+        document = json.dumps({"version": 1, "logs": {os.path.abspath(p): r for p, r in results.items()}}, indent=2)
+        if args.json == "-":
+            print(document)
+        else:
+            with open(args.json, "w") as f:
+                f.write(document + "\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import math
+import socket
+import sys
+
+STATE_VERSION = 1
+PERCENTILES = (25, 50, 75, 95)
+
+class StreamStats:
+    """
+    Constant-memory summary of a series: online mean/variance (Welford), min/max, and a
+    fixed-bucket histogram over [lo, hi) for percentiles. Values outside the range land in
+    an underflow/overflow bucket and are still counted exactly in mean, min and max.
+    Instances with the same bucket layout can be merged, e.g. runs from several devices.
+    """
+    def __init__(self, lo=0.0, hi=100.0, buckets=1000):
+        self.lo = float(lo)
+        self.hi = float(hi)
+        self.buckets = buckets
+        self.width = (self.hi - self.lo) / buckets
+        self.counts = [0] * (buckets + 2)  # underflow, buckets..., overflow
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+        if self.min is None or x < self.min:
+            self.min = x
+        if self.max is None or x > self.max:
+            self.max = x
+        if x < self.lo:
+            self.counts[0] += 1
+        elif x >= self.hi:
+            self.counts[-1] += 1
+        else:
+            self.counts[1 + int((x - self.lo) / self.width)] += 1
+
+    def merge(self, other):
+        """Adds another instance's samples to this one (Chan et al. parallel variance)."""
+        if (self.lo, self.hi, self.buckets) != (other.lo, other.hi, other.buckets):
+            raise ValueError("Cannot merge histograms with different bucket layouts")
+        if not other.n:
+            return self
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.n = n
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        return self
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+
+    def percentile(self, q):
+        """Interpolates within the bucket holding the q-th percentile; exact to one bucket width."""
+        if not self.n:
+            return None
+        rank = q / 100.0 * self.n
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                if i == 0:
+                    lower, upper = self.min, self.lo
+                elif i == len(self.counts) - 1:
+                    lower, upper = self.hi, self.max
+                else:
+                    lower = self.lo + (i - 1) * self.width
+                    upper = lower + self.width
+                value = lower + (rank - seen) / count * (upper - lower)
+                return min(max(value, self.min), self.max)
+            seen += count
+        return self.max
+
+    def summary(self):
+        result = {"n": self.n, "mean": self.mean if self.n else None, "std": self.std, "min": self.min}
+        for q in PERCENTILES:
+            result[f"p{q}"] = self.percentile(q)
+        result["max"] = self.max
+        return result
+
+    def to_dict(self):
+        return {
+            "lo": self.lo, "hi": self.hi, "buckets": self.buckets,
+            "n": self.n, "mean": self.mean, "m2": self.m2, "min": self.min, "max": self.max,
+            # Sparse: most buckets of a benchmark run are empty.
+            "counts": {str(i): count for i, count in enumerate(self.counts) if count},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls(data["lo"], data["hi"], data["buckets"])
+        stats.n, stats.mean, stats.m2 = data["n"], data["mean"], data["m2"]
+        stats.min, stats.max = data["min"], data["max"]
+        for i, count in data["counts"].items():
+            stats.counts[int(i)] = count
+        return stats
+
+def format_summary(stats, unit="%"):
+    if not stats.n:
+        return "no samples"
+    s = stats.summary()
+    return (f"avg={s['mean']:.1f}{unit} std={s['std']:.1f} min={s['min']:.1f} "
+            + " ".join(f"p{q}={s[f'p{q}']:.1f}" for q in PERCENTILES)
+            + f" max={s['max']:.1f} n={s['n']}")
+
+def dump_state(path, metrics, hosts=None):
+    """Writes {name: StreamStats} as mergeable JSON state."""
+    state = {"version": STATE_VERSION, "hosts": hosts or [socket.gethostname()],
+             "metrics": {name: stats.to_dict() for name, stats in metrics.items()}}
+    with open(path, "w") as f:
+        json.dump(state, f)
+
+def load_state(path):
+    with open(path) as f:
+        state = json.load(f)
+    if state.get("version") != STATE_VERSION:
+        raise ValueError(f"{path}: unsupported state version {state.get('version')}")
+    return state.get("hosts", []), {name: StreamStats.from_dict(data) for name, data in state["metrics"].items()}
+
+def merge_files(paths):
+    """Merges state files metric by metric; a metric missing from some files is merged from the others."""
+    hosts, merged = [], {}
+    for path in paths:
+        file_hosts, metrics = load_state(path)
+        hosts.extend(file_hosts)
+        for name, stats in metrics.items():
+            if name in merged:
+                merged[name].merge(stats)
+            else:
+                merged[name] = stats
+    return hosts, merged
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and merge system_monitor.py statistics state files")
+    sub = parser.add_subparsers(dest="command", required=True)
+    show = sub.add_parser("show", help="Print the summary of one or more state files (merged)")
+    show.add_argument("files", nargs="+")
+    merge = sub.add_parser("merge", help="Merge state files, e.g. from several devices")
+    merge.add_argument("files", nargs="+")
+    merge.add_argument("-o", "--output", required=True, help="Merged state file to write")
+    args = parser.parse_args()
+
+    try:
+        hosts, metrics = merge_files(args.files)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        return 1
+    if args.command == "merge":
+        dump_state(args.output, metrics, hosts)
+    print(f"Hosts: {', '.join(hosts)}")
+    for name, stats in metrics.items():
+        print(f"{name:<10} {format_summary(stats)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+import argparse
+import csv
+import json
+import os
+import queue
+import re
+import shlex
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+from fps_log import FPS_RANGE, LIVE_FPS_PATTERN, TABLE_COLUMNS, FpsTableParser
+from stream_stats import StreamStats, load_state
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+MONITOR = os.path.join(SCRIPT_DIR, "system_monitor.py")
+
+# App command per platform, run from benchmarks/iqs-streampipe like auto_benchmark.sh
+COMMANDS = {
+    "qcom": 'iqs-launcher --autotag iqs-streampipe --other " -c {config} -b --warmup_time {warmup}"',
+    "nv": "./nvidia/streampipe_nv -c {config} -b --warmup_time {warmup}",
+    # Stand-in for trying the sweep and the saturation search without a device
+    "synthetic": f"{sys.executable} {os.path.join(SCRIPT_DIR, 'synthetic_workload.py')} -c {{config}} -b --warmup_time {{warmup}}",
+}
+CONFIGS = {"qcom": "config.json", "nv": "config_nv.json", "synthetic": "config.json"}
+
+STOP_GRACE = 15
+
+# On qcom the app runs in a docker container; it is measured through the container's cgroup v2
+CONTAINER_IMAGE = "iqs-streampipe"
+CGROUP_CONTROLLERS = "/sys/fs/cgroup/cgroup.controllers"
+CONTAINER_LOOKUP_TIMEOUT = 30
+
+def detect_platform():
+    return "nv" if shutil.which("nvidia-smi") else "qcom"
+
+def load_pool(config_path, sources=None, model=None, input_size=None):
+    """Distinct (model, source, input size) entries of a config file, or built from --sources."""
+    pool = []
+    if os.path.isfile(config_path):
+        with open(config_path) as f:
+            for stream in json.load(f).get("streams", []):
+                entry = {key: value for key, value in stream.items() if key != "id"}
+                if entry not in pool:
+                    pool.append(entry)
+    if sources:
+        template = pool[0] if pool else {}
+        pool = [{"model_path": model or template.get("model_path"),
+                 "source_path": source,
+                 "input_size": input_size or template.get("input_size", 640)} for source in sources]
+    elif model or input_size:
+        pool = [{**entry, **({"model_path": model} if model else {}), **({"input_size": input_size} if input_size else {})} for entry in pool]
+    if not pool or any(not entry.get("model_path") or not entry.get("source_path") for entry in pool):
+        raise ValueError(f"No usable streams in {config_path}; pass --sources and --model")
+    return pool
+
+def make_config(pool, channels):
+    """The `streams` array for a channel count, cycling through the pool."""
+    return {"streams": [{"id": i, **pool[i % len(pool)]} for i in range(channels)]}
+
+def write_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=4)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+def spread(values):
+    """Relative spread (max - min) / mean of a few values."""
+    mean = sum(values) / len(values)
+    return (max(values) - min(values)) / mean if mean > 0 else float("inf")
+
+class AppRun:
+    """
+    One app process. Its output is teed to a log file by a reader thread, which parses the
+    final FPS table and live per-channel FPS values into the current collection window.
+    """
+    def __init__(self, command, log_path, live_pattern, env=None):
+        self.log = open(log_path, "w")
+        self.live = re.compile(live_pattern, re.IGNORECASE)
+        self.table = FpsTableParser()
+        self.lock = threading.Lock()
+        self.reports = queue.Queue()  # complete FPS tables, as they appear
+        self.window = {}
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                                        bufsize=1, errors="replace", env=env, start_new_session=True)
+        self.reader = threading.Thread(target=self._read, daemon=True)
+        self.reader.start()
+
+    def _read(self):
+        for line in self.process.stdout:
+            self.log.write(line)
+            if self.table.feed(line):
+                self.reports.put(self.table.table)
+                continue
+            match = self.live.search(line)
+            if match:
+                fps = float(match.group("fps") or match.group("fps2"))
+                with self.lock:
+                    self.window.setdefault(int(match.group("channel")), StreamStats(*FPS_RANGE)).add(fps)
+        self.log.flush()
+
+    def take_window(self):
+        """Live FPS stats per channel since the last call."""
+        with self.lock:
+            window, self.window = self.window, {}
+        return window
+
+    def running(self):
+        return self.process.poll() is None
+
+    def stop(self, grace=STOP_GRACE):
+        """SIGTERM to the process group, like `timeout`, then SIGKILL; returns the exit code."""
+        for sig in (signal.SIGTERM, signal.SIGKILL):
+            if not self.running():
+                break
+            try:
+                os.killpg(self.process.pid, sig)
+            except ProcessLookupError:
+                break
+            try:
+                self.process.wait(grace)
+            except subprocess.TimeoutExpired:
+                continue
+        self.process.wait()
+        self.reader.join(grace)
+        self.log.close()
+        return self.process.returncode
+
+def find_container(timeout=CONTAINER_LOOKUP_TIMEOUT):
+    """
+    ID of the running iqs-streampipe container, like auto_benchmark.sh, or None without cgroup v2
+    or docker. The container may still be starting, so the lookup is retried for `timeout` seconds.
+    """
+    if not os.path.isfile(CGROUP_CONTROLLERS) or not shutil.which("docker"):
+        return None
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            result = subprocess.run(["docker", "ps", "--format", "{{.ID}} {{.Image}}"],
+                                    capture_output=True, text=True, timeout=STOP_GRACE)
+            for line in result.stdout.splitlines():
+                container, _, image = line.partition(" ")
+                if CONTAINER_IMAGE in image:
+                    return container
+        except (OSError, subprocess.SubprocessError):
+            pass
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(1)
+
+def start_monitor(pid, state_path, log_path, cgroup=None):
+    """Runs system_monitor.py on the app; with neither `pid` nor `cgroup` it only samples the whole system."""
+    log = open(log_path, "w")
+    command = [sys.executable, MONITOR, "-p", "0", "--state-out", state_path]
+    if pid:
+        command += ["--pid", str(pid)]
+    if cgroup:
+        command += ["--cgroup", cgroup]
+    process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+    return process, log
+
+def stop_monitor(monitor):
+    """SIGINT makes the monitor print its totals and write the state file; returns {metric: StreamStats}."""
+    process, log = monitor
+    if process.poll() is None:
+        process.send_signal(signal.SIGINT)
+    try:
+        process.wait(STOP_GRACE)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+    log.close()
+    state_path = process.args[process.args.index("--state-out") + 1]
+    try:
+        return load_state(state_path)[1]
+    except (OSError, ValueError, KeyError):
+        return {}
+
+def merge_window(totals, window):
+    for channel, stats in window.items():
+        if channel in totals:
+            totals[channel].merge(stats)
+        else:
+            totals[channel] = stats
+
+def aggregate(per_channel):
+    merged = StreamStats(*FPS_RANGE)
+    for stats in per_channel.values():
+        merged.merge(stats)
+    return merged
+
+def table_from_stats(per_channel):
+    """Same shape as FpsTableParser.table, from live FPS values."""
+    def row(stats):
+        return {"avg": stats.mean, **{f"p{q}": stats.percentile(q) for q in (95, 75, 50, 25)}}
+    return {"channels": {channel: row(stats) for channel, stats in sorted(per_channel.items()) if stats.n},
+            "all": row(aggregate(per_channel))}
+
+def run_point(args, channels, command, env):
+    """Warm-up and test phases for one channel count; returns the result row and the per-channel FPS table."""
+    name = f"{args.platform}_ch{channels}"
+    print(f"[INFO] {channels} channel(s): starting {command[0]}", flush=True)
+    app = AppRun(command, os.path.join(args.output_dir, f"{name}.txt"), args.live_pattern, env)
+
+    monitor = None
+    try:
+        # Warm-up: until --warmup-time, or earlier once the windowed FPS percentiles of the last
+        # --stable-windows windows agree within --tolerance (needs live per-channel FPS output).
+        start = time.monotonic()
+        history = []
+        stable = False
+        while app.running() and time.monotonic() - start < args.warmup_time:
+            time.sleep(min(args.window, max(0.0, args.warmup_time - (time.monotonic() - start))))
+            window = aggregate(app.take_window())
+            if not window.n:
+                continue
+            history.append((window.percentile(25), window.percentile(50)))
+            recent = history[-args.stable_windows:]
+            if (time.monotonic() - start >= args.min_warmup and len(recent) == args.stable_windows
+                    and all(spread(values) <= args.tolerance for values in zip(*recent))):
+                stable = True
+                break
+        warmup = time.monotonic() - start
+        app.take_window()  # drop warm-up values
+        print(f"[INFO] Warm-up {'stable' if stable else 'done'} after {warmup:.0f}s", flush=True)
+
+        live = {}
+        metrics = {}
+        if app.running():
+            # The process group only holds iqs-launcher and the docker CLI on qcom; the app is in the container.
+            container = None
+            if args.platform != "synthetic":
+                container = find_container(CONTAINER_LOOKUP_TIMEOUT if args.platform == "qcom" else 0)
+            pid = app.process.pid
+            if args.platform == "qcom" and not container:
+                print(f"[WARNING] Could not find the cgroup v2 of the {CONTAINER_IMAGE} container; "
+                      "this point reports system-wide CPU only", flush=True)
+                pid = None
+            monitor = start_monitor(pid, os.path.join(args.output_dir, f"{name}_monitor.json"),
+                                    os.path.join(args.output_dir, f"{name}_monitor.txt"), container)
+            test_start = time.monotonic()
+            while app.running() and time.monotonic() - test_start < args.test_time:
+                time.sleep(min(1.0, args.test_time - (time.monotonic() - test_start)))
+                merge_window(live, app.take_window())
+            merge_window(live, app.take_window())
+            metrics = stop_monitor(monitor)
+        else:
+            print(f"[ERROR] App exited during warm-up (code {app.process.returncode})", flush=True)
+    except KeyboardInterrupt:
+        if monitor and monitor[0].poll() is None:
+            stop_monitor(monitor)
+        app.stop()
+        raise
+    exit_code = app.stop()
+    merge_window(live, app.take_window())
+
+    # The app's own table only covers the run after its --warmup_time; prefer live values when there are any.
+    table, source = None, None
+    if aggregate(live).n:
+        table, source = table_from_stats(live), "live"
+    else:
+        while not app.reports.empty():
+            table, source = app.reports.get(), "table"
+
+    cpu, mem, cgroup_cpu = metrics.get("cpu"), metrics.get("mem"), metrics.get("cgroup_cpu")
+    row = {
+        "channels": channels,
+        "warmup_s": round(warmup, 1),
+        "stable": stable,
+        "fps_source": source or "none",
+        "exit_code": exit_code,
+    }
+    for column in TABLE_COLUMNS:
+        row[f"fps_{column}"] = round(table["all"][column], 2) if table else None
+    row["fps_min_channel_avg"] = round(min(r["avg"] for r in table["channels"].values()), 2) if table and table["channels"] else None
+    row["cpu_avg"] = round(cpu.mean, 1) if cpu and cpu.n else None
+    row["cpu_p95"] = round(cpu.percentile(95), 1) if cpu and cpu.n else None
+    row["cgroup_cpu_avg"] = round(cgroup_cpu.mean, 1) if cgroup_cpu and cgroup_cpu.n else None
+    # What the CPU check of the point is based on: the app's container, or the whole system
+    row["cpu_scope"] = "system" if row["cgroup_cpu_avg"] is None else "container"
+    row["mem_avg"] = round(mem.mean, 1) if mem and mem.n else None
+    row["mem_max"] = round(mem.max, 1) if mem and mem.n else None
+    return row, table
+
+def print_results(rows):
+    columns = ["channels", "warmup_s", "fps_avg", "fps_p95", "fps_p75", "fps_p50", "fps_p25", "cpu_avg", "mem_avg"]
+    if any(row["cgroup_cpu_avg"] is not None for row in rows):
+        columns.insert(columns.index("cpu_avg") + 1, "cgroup_cpu_avg")
+    columns.insert(columns.index("mem_avg"), "cpu_scope")
+    if "pass" in rows[0]:
+        columns.append("pass")
+    print("| " + " | ".join(columns) + " |")
+    print("|" + "|".join(":---:" for _ in columns) + "|")
+    for row in rows:
+        print("| " + " | ".join("-" if row[c] is None else str(row[c]) for c in columns) + " |")
+
+def write_results(path, rows, tables):
+    """One row per channel count, plus <path>_channels.csv with the per-channel FPS rows."""
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    root, ext = os.path.splitext(path)
+    with open(f"{root}_channels{ext}", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["channels", "channel_id", *(f"fps_{c}" for c in TABLE_COLUMNS)])
+        for row, table in zip(rows, tables):
+            for channel, values in sorted((table or {"channels": {}})["channels"].items()):
+                writer.writerow([row["channels"], channel, *(round(values[c], 2) for c in TABLE_COLUMNS)])
+
+def app_cpu(row):
+    """The app's CPU usage (% of the machine): its container's when one was measured, else the system's."""
+    return row["cpu_avg"] if row["cgroup_cpu_avg"] is None else row["cgroup_cpu_avg"]
+
+def passes(row, args):
+    """A probe passes when every channel keeps up: P25 FPS at the target, CPU at or below the ceiling."""
+    if row["fps_p25"] is None or row["fps_p25"] < args.target_fps:
+        return False
+    cpu = app_cpu(row)
+    return cpu is None or cpu <= args.cpu_ceiling
+
+def search(measure, start, limit):
+    """
+    Largest channel count in [1, limit] for which measure(channels) passes, or 0.
+
+    Gallops up from `start` (doubling) until a probe fails, then bisects between the last pass and the
+    first fail. Assumes the result is monotonic in the channel count, so it needs about 2 * log2(N) probes.
+    """
+    lo, hi = 0, limit + 1  # largest known pass, smallest known fail
+    channels = min(max(1, start), limit)
+    while channels < hi:
+        if measure(channels):
+            lo = channels
+            channels = min(channels * 2, hi)
+        else:
+            hi = channels
+            if lo == 0 and channels > 1:
+                channels = (channels + 1) // 2 if channels > 2 else 1
+                continue
+            break
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if measure(mid):
+            lo = mid
+        else:
+            hi = mid
+    return lo
+
+def parse_channels(value):
+    channels = [int(c) for c in value.split(",") if c.strip()]
+    if not channels or min(channels) < 1:
+        raise argparse.ArgumentTypeError("expected positive channel counts, e.g. 1,4,9,16")
+    return channels
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the streampipe benchmark for several channel counts")
+    parser.add_argument("--channels", type=parse_channels, default=[1, 4, 9, 16], help="Channel counts to run, default=1,4,9,16")
+    parser.add_argument("--platform", choices=("auto", "nv", "qcom", "synthetic"), default="auto", help="Platform, default=auto")
+    parser.add_argument("--config", default=None, help="Config file the app reads; rewritten per point and restored at the end (default: config.json, config_nv.json on nv)")
+    parser.add_argument("--sources", nargs="+", default=None, help="Video sources cycled through the streams (default: those in the config file)")
+    parser.add_argument("--model", default=None, help="Model for every stream (default: the config file's)")
+    parser.add_argument("--input-size", type=int, default=None, help="Model input size (default: the config file's)")
+    parser.add_argument("--warmup-time", type=float, default=180, help="Maximum warm-up per point in seconds, default=180")
+    parser.add_argument("--min-warmup", type=float, default=30, help="Warm-up always lasts at least this long, default=30")
+    parser.add_argument("--test-time", type=float, default=120, help="Measurement per point in seconds, default=120")
+    parser.add_argument("--window", type=float, default=10, help="Seconds per FPS window for the stability check, default=10")
+    parser.add_argument("--stable-windows", type=int, default=3, help="Consecutive windows whose P25/P50 FPS must agree, default=3")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="Allowed relative spread of those percentiles, default=0.05")
+    parser.add_argument("--live-pattern", default=LIVE_FPS_PATTERN, help="Regex with 'channel' and 'fps' groups for live FPS lines")
+    parser.add_argument("--command", default=None, help="App command template with {config}, {warmup} and {channels} (default: per platform)")
+    parser.add_argument("--output-dir", default="logs/sweep", help="Logs and results, default=logs/sweep")
+    search_group = parser.add_argument_group("saturation search", "find the most channels that still run in real time instead of sweeping --channels")
+    search_group.add_argument("--search", action="store_true", help="Gallop and bisect over the channel count")
+    search_group.add_argument("--target-fps", type=float, default=29, help="P25 FPS over all channels a probe needs to pass, default=29")
+    search_group.add_argument("--cpu-ceiling", type=float, default=100, help="Highest average CPU usage (%%) a probe may use; the container's when it is measured, default=100")
+    search_group.add_argument("--start", type=int, default=1, help="First channel count probed, default=1")
+    search_group.add_argument("--max-channels", type=int, default=64, help="Largest channel count probed, default=64")
+    args = parser.parse_args()
+    if args.stable_windows < 1 or args.window <= 0:
+        parser.error("--stable-windows and --window must be positive")
+    if args.search and (args.start < 1 or args.max_channels < 1):
+        parser.error("--start and --max-channels must be positive")
+
+    if args.platform == "auto":
+        args.platform = detect_platform()
+    config = args.config or CONFIGS[args.platform]
+    try:
+        pool = load_pool(config, args.sources, args.model, args.input_size)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    os.makedirs(args.output_dir, exist_ok=True)
+    env = dict(os.environ, DISPLAY=os.environ.get("DISPLAY", ":1")) if args.platform == "nv" else None
+    print(f"Target Platform: {args.platform}")
+
+    # SIGTERM unwinds like Ctrl + C, so the running point is stopped and config.json restored
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    original = None
+    if os.path.isfile(config):
+        with open(config) as f:
+            original = f.read()
+    rows, tables = [], []
+    done = {}
+
+    def measure(channels):
+        if channels in done:
+            return done[channels]["pass"]
+        streams = make_config(pool, channels)
+        write_json(config, streams)
+        write_json(os.path.join(args.output_dir, f"{args.platform}_ch{channels}_config.json"), streams)
+        template = args.command or COMMANDS[args.platform]
+        command = shlex.split(template.format(config=config, warmup=int(args.warmup_time), channels=channels))
+        row, table = run_point(args, channels, command, env)
+        if args.search:
+            row["pass"] = passes(row, args)
+            print(f"[INFO] {channels} channel(s): P25 {row['fps_p25']} FPS, CPU {app_cpu(row)}% ({row['cpu_scope']}) -> "
+                  f"{'pass' if row['pass'] else 'fail'}", flush=True)
+        done[channels] = row
+        rows.append(row)
+        tables.append(table)
+        return row.get("pass")
+
+    best = None
+    try:
+        if args.search:
+            best = search(measure, args.start, args.max_channels)
+        else:
+            for channels in args.channels:
+                measure(channels)
+    except KeyboardInterrupt:
+        print("\n[INFO] Interrupted, writing the points finished so far")
+    finally:
+        if original is not None:
+            with open(config, "w") as f:
+                f.write(original)
+
+    if not rows:
+        return 1
+    results = os.path.join(args.output_dir, "results.csv")
+    write_results(results, rows, tables)
+    print_results(rows)
+    print(f"[SUCCESS] Results saved to {results}")
+    if args.search and best is not None:
+        print(f"Probes: {', '.join(str(row['channels']) for row in rows)}")
+        if best:
+            row = done[best]
+            print(f"Saturation point: {best} channels (P25 {row['fps_p25']} FPS, CPU {app_cpu(row)}%, {row['cpu_scope']})")
+        else:
+            print(f"Saturation point: none, {min(done)} channel(s) already misses {args.target_fps} FPS")
+        if best == args.max_channels:
+            print("[INFO] Reached --max-channels; the platform may handle more")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
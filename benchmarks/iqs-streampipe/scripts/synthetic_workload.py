@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Synthetic stand-in for the streampipe app, for trying out sweep.py without a device or container.
+
+Takes the app's arguments (-c config.json -b --warmup_time N) and runs one simulated channel per
+entry of `streams`. The platform delivers at most --capacity frames per second in total, so each
+channel gets min(--source-fps, capacity / channels) FPS, with jitter. It prints a live FPS line per
+channel every --report-interval seconds (or one line per frame with --frame-lines), and on
+SIGINT/SIGTERM the app's final Inference_time and FPS tables over the run after the warm-up.
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import signal
+import sys
+import threading
+import time
+from stream_stats import StreamStats
+
+exit_event = threading.Event()
+
+def signal_handler(signum, frame):
+    exit_event.set()
+
+def burn(duty, period=0.1):
+    """Keeps one core `duty` (0-1) busy."""
+    while True:
+        end = time.monotonic() + duty * period
+        while time.monotonic() < end:
+            pass
+        time.sleep((1.0 - duty) * period)
+
+def start_burners(cores):
+    """Processes together using `cores` CPUs, e.g. 2.5 -> two full cores and one at 50%."""
+    burners = []
+    while cores > 1e-3 and len(burners) < (os.cpu_count() or 1):
+        duty = min(1.0, cores)
+        process = multiprocessing.Process(target=burn, args=(duty,), daemon=True)
+        process.start()
+        burners.append(process)
+        cores -= duty
+    return burners
+
+def print_table(title, unit, stats):
+    print(title)
+    print()
+    print(f"{'Channel ID':<12}{'avg (' + unit + ')':<10}{'p95':<10}{'p75':<10}{'p50':<10}{'p25':<10}")
+    print("-" * 62)
+    merged = StreamStats(stats[0].lo, stats[0].hi, stats[0].buckets)
+    for channel, channel_stats in enumerate(stats):
+        merged.merge(channel_stats)
+        print(format_row(f"channel:{channel}", channel_stats))
+    print("-" * 62)
+    print(format_row("ALL", merged))
+    print()
+
+def format_row(name, stats):
+    if not stats.n:
+        return f"{name:<12}" + "".join(f"{0.0:<10.2f}" for _ in range(5))
+    return f"{name:<12}{stats.mean:<10.2f}" + "".join(f"{stats.percentile(q):<10.2f}" for q in (95, 75, 50, 25))
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic multi-channel inference workload with streampipe-like output")
+    parser.add_argument("-c", "--config", required=True, help="Config file with a `streams` array, one channel per entry")
+    parser.add_argument("-b", action="store_true", help="Benchmark mode (accepted for compatibility; always on)")
+    parser.add_argument("--warmup_time", type=float, default=0, help="Seconds excluded from the final tables, default=0")
+    parser.add_argument("--capacity", type=float, default=270.0, help="Frames per second the platform delivers over all channels, default=270")
+    parser.add_argument("--source-fps", type=float, default=30.0, help="Frame rate of every source, default=30")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Relative standard deviation of the FPS, default=0.02")
+    parser.add_argument("--ramp", type=float, default=5.0, help="Seconds the FPS takes to ramp up from half speed, default=5")
+    parser.add_argument("--report-interval", type=float, default=1.0, help="Seconds between live FPS lines, default=1")
+    parser.add_argument("--frame-lines", action="store_true", help="Print one timestamped line per frame instead of FPS lines")
+    parser.add_argument("--cpu-per-channel", type=float, default=0.0, help="Percent of one core actually burnt per channel, default=0")
+    parser.add_argument("--duration", type=float, default=0, help="Stop after this many seconds (0: run until signalled), default=0")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed")
+    args = parser.parse_args()
+
+    try:
+        with open(args.config) as f:
+            channels = len(json.load(f)["streams"])
+    except (OSError, ValueError, KeyError) as e:
+        parser.error(f"Cannot read streams from {args.config}: {e}")
+    if channels < 1:
+        parser.error("No streams configured")
+    rng = random.Random(args.seed)
+    signal.signal(signal.SIGTERM, signal_handler)
+    signal.signal(signal.SIGINT, signal_handler)
+
+    burners = start_burners(channels * args.cpu_per_channel / 100.0)
+    fps_stats = [StreamStats(0.0, 240.0, 2400) for _ in range(channels)]
+    latency_stats = [StreamStats(0.0, 1000.0, 10000) for _ in range(channels)]
+    target = min(args.source_fps, args.capacity / channels)
+    print(f"Running {channels} synthetic channel(s) at up to {target:.2f} FPS each", flush=True)
+
+    start = time.monotonic()
+    wall_offset = time.time() - start
+    next_frame = [start + rng.random() / target for _ in range(channels)]
+    next_report = start + args.report_interval
+    frames = [0] * channels
+    window = [[0.0, 0] for _ in range(channels)]  # sum of per-frame FPS and frames since the last report
+    while not exit_event.is_set():
+        now = time.monotonic()
+        elapsed = now - start
+        if args.duration and elapsed >= args.duration:
+            break
+        speed = 0.5 + 0.5 * min(1.0, elapsed / args.ramp) if args.ramp > 0 else 1.0
+        steady = elapsed >= args.warmup_time
+        for channel in range(channels):
+            while next_frame[channel] <= now:
+                fps = max(0.1, target * speed * rng.gauss(1.0, args.jitter))
+                frames[channel] += 1
+                window[channel][0] += fps
+                window[channel][1] += 1
+                if steady:
+                    # Inference time grows with the load the channels put on the shared accelerator
+                    latency_stats[channel].add(1000.0 * channels / args.capacity * rng.uniform(0.6, 1.4))
+                if args.frame_lines:
+                    if steady:
+                        fps_stats[channel].add(fps)
+                    print(f"channel:{channel} frame={frames[channel]} ts={wall_offset + next_frame[channel]:.6f}")
+                next_frame[channel] += 1.0 / fps
+        if not args.frame_lines and now >= next_report:
+            for channel in range(channels):
+                total, count = window[channel]
+                fps = total / count if count else 0.0
+                window[channel] = [0.0, 0]
+                if steady:
+                    fps_stats[channel].add(fps)
+                print(f"channel:{channel} fps={fps:.2f}")
+            next_report = now + args.report_interval
+        sys.stdout.flush()
+        exit_event.wait(max(0.0, min(min(next_frame), next_report if not args.frame_lines else math.inf) - time.monotonic()))
+
+    for process in burners:
+        process.terminate()
+    print()
+    print_table("Inference_time", "ms", latency_stats)
+    print_table("FPS", "FPS", fps_stats)
+    sys.stdout.flush()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
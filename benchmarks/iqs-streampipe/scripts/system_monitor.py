@@ -1,62 +1,275 @@
 #!/usr/bin/env python3
 import argparse
-import subprocess
+import glob
 import time
 import os
 import threading
-import queue
-import shutil
 import signal
-import sys
+from stream_stats import StreamStats, format_summary, dump_state
 
 exit_event = threading.Event()
 
-def get_system_mem_usage():
-    try:
-        meminfo = {}
-        with open("/proc/meminfo", "r") as f:
-            for line in f:
-                key, val = line.split(":", 1)
-                meminfo[key] = int(val.strip().split()[0])  # kB
-
-        total = meminfo.get("MemTotal")
-        available = meminfo.get("MemAvailable")
-        if total and available:
-            return (total - available) / total * 100.0
-    except Exception:
-        pass
-    return None
-
-def get_cpu_usage(interval=0.1):
-    def read_cpu():
-        with open("/proc/stat", "r") as f:
-            line = f.readline()
-        parts = line.split()
-        if parts[0] != "cpu":
-            return None
-        return list(map(int, parts[1:]))
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+CGROUP_ROOT = "/sys/fs/cgroup"
+MB = 1024 * 1024
 
-    cpu1 = read_cpu()
-    time.sleep(interval)
-    cpu2 = read_cpu()
-    
-    if not cpu1 or not cpu2:
-        return None
+class ProcFile:
+    """Keeps a procfs file open and re-reads it from offset 0 into a preallocated buffer."""
+    def __init__(self, path, size=16384):
+        self.f = open(path, "rb", buffering=0)
+        self.buf = bytearray(size)
 
-    idle1 = cpu1[3] + cpu1[4]  # idle + iowait
-    idle2 = cpu2[3] + cpu2[4]
+    def read(self):
+        """Refreshes the buffer and returns the number of valid bytes in it."""
+        self.f.seek(0)
+        n = 0
+        while True:
+            if n == len(self.buf):
+                self.buf.extend(bytes(len(self.buf)))
+            got = self.f.readinto(memoryview(self.buf)[n:])
+            if not got:
+                break
+            n += got
+        return n
 
-    total1 = sum(cpu1)
-    total2 = sum(cpu2)
+    def close(self):
+        self.f.close()
 
-    total_diff = total2 - total1
-    idle_diff = idle2 - idle1
+def parse_cpu_times(line):
+    """Returns (busy, total) jiffies from a /proc/stat 'cpu' line."""
+    fields = list(map(int, line.split()[1:]))
+    idle = fields[3] + fields[4]  # idle + iowait
+    total = sum(fields[:8])  # guest time is already counted in user/nice
+    return total - idle, total
 
-    if total_diff == 0:
+def parse_task_stat(buf, n):
+    """Returns (comm, utime + stime ticks, rss pages) from a /proc/<pid>/task/<tid>/stat buffer."""
+    start = buf.index(b"(", 0, n)
+    end = buf.rindex(b")", 0, n)
+    fields = buf[end + 2:n].split()  # fields[0] is the state, field 3 in proc(5)
+    return bytes(buf[start + 1:end]).decode(errors="replace"), int(fields[11]) + int(fields[12]), int(fields[21])
+
+def meminfo_kb(buf, n, key):
+    pos = buf.find(key, 0, n)
+    if pos < 0:
         return None
+    return int(buf[pos + len(key):buf.index(b"\n", pos, n)].split()[0])
+
+def find_cgroup(spec):
+    """Resolves a cgroup v2 directory, a path relative to /sys/fs/cgroup, or a docker container ID (prefix)."""
+    for path in (spec, os.path.join(CGROUP_ROOT, spec.lstrip("/"))):
+        if os.path.isfile(os.path.join(path, "cpu.stat")):
+            return path
+    matches = set()
+    for pattern in ("system.slice/docker-{}*.scope", "docker/{}*", "*/docker-{}*.scope"):
+        matches.update(glob.glob(os.path.join(CGROUP_ROOT, pattern.format(glob.escape(spec)))))
+    matches = [m for m in matches if os.path.isfile(os.path.join(m, "cpu.stat"))]
+    if len(matches) != 1:
+        raise ValueError(f"{'No' if not matches else 'Ambiguous'} cgroup v2 directory for '{spec}'")
+    return matches[0]
+
+class Rate:
+    """Turns a monotonically increasing counter into a per-second rate between consecutive ticks."""
+    def __init__(self):
+        self.prev = None
+
+    def update(self, value, now):
+        prev, self.prev = self.prev, (value, now)
+        if prev is None or now <= prev[1]:
+            return None
+        return (value - prev[0]) / (now - prev[1])
+
+class ProcessTree:
+    """
+    Per-process and per-thread CPU (% of one core) and RSS for a process and its descendants.
+    Thread stat files stay open between ticks; the tree is re-discovered every `rescan` seconds.
+    """
+    def __init__(self, root_pid, rescan=2.0):
+        self.root_pid = root_pid
+        self.rescan = rescan
+        self.last_scan = None
+        self.tasks = {}  # (pid, tid) -> [ProcFile, Rate]
+        self.has_children_file = os.path.exists(f"/proc/{os.getpid()}/task/{os.getpid()}/children")
+
+    def _descendants(self):
+        pids = [self.root_pid]
+        if self.has_children_file:
+            for pid in pids:
+                for task_dir in glob.glob(f"/proc/{pid}/task/*/children"):
+                    try:
+                        with open(task_dir) as f:
+                            pids.extend(int(child) for child in f.read().split())
+                    except OSError:
+                        pass
+            return pids
+        parents = {}
+        for entry in os.listdir("/proc"):
+            if entry.isdigit():
+                try:
+                    with open(f"/proc/{entry}/stat", "rb") as f:
+                        data = f.read()
+                    parents.setdefault(int(data[data.rindex(b")") + 2:].split()[1]), []).append(int(entry))
+                except (OSError, ValueError, IndexError):
+                    pass
+        for pid in pids:
+            pids.extend(parents.get(pid, []))
+        return pids
+
+    def _scan(self):
+        live = set()
+        for pid in self._descendants():
+            try:
+                tids = [int(tid) for tid in os.listdir(f"/proc/{pid}/task")]
+            except OSError:
+                continue
+            for tid in tids:
+                key = (pid, tid)
+                live.add(key)
+                if key not in self.tasks:
+                    try:
+                        self.tasks[key] = [ProcFile(f"/proc/{pid}/task/{tid}/stat", 1024), Rate()]
+                    except OSError:
+                        live.discard(key)
+        for key in set(self.tasks) - live:
+            self.tasks.pop(key)[0].close()
+
+    def tick(self, now):
+        """Returns ({pid: (comm, cpu, rss_bytes)}, {(pid, tid): (comm, cpu)}); cpu is None on a task's first tick."""
+        if self.last_scan is None or now - self.last_scan >= self.rescan:
+            self._scan()
+            self.last_scan = now
+        threads, cpu_by_pid, rss_by_pid = {}, {}, {}
+        for key, (stat, rate) in list(self.tasks.items()):
+            try:
+                comm, ticks, rss = parse_task_stat(stat.buf, stat.read())
+            except (OSError, ValueError, IndexError):
+                self.tasks.pop(key)[0].close()
+                continue
+            cpu = rate.update(ticks, now)
+            if cpu is not None:
+                cpu = cpu / CLK_TCK * 100.0
+                cpu_by_pid[key[0]] = cpu_by_pid.get(key[0], 0.0) + cpu
+            threads[key] = (comm, cpu)
+            if key[0] == key[1]:
+                rss_by_pid[key[0]] = (comm, rss * PAGE_SIZE)
+        processes = {pid: (comm, cpu_by_pid.get(pid), rss) for pid, (comm, rss) in rss_by_pid.items()}
+        return processes, threads
+
+    def close(self):
+        for stat, _ in self.tasks.values():
+            stat.close()
+        self.tasks.clear()
+
+class CgroupStats:
+    """CPU (% of one core, throttling) and memory of a cgroup v2 directory, e.g. a docker container."""
+    def __init__(self, path):
+        self.path = path
+        self.cpu_stat = ProcFile(os.path.join(path, "cpu.stat"), 1024)
+        self.memory = ProcFile(os.path.join(path, "memory.current"), 64)
+        self.usage = Rate()
+        self.throttled = Rate()
+        try:
+            with open(os.path.join(path, "memory.max")) as f:
+                limit = f.read().strip()
+            self.memory_max = None if limit == "max" else int(limit)
+        except OSError:
+            self.memory_max = None
 
-    usage = (total_diff - idle_diff) / total_diff * 100.0
-    return usage
+    def tick(self, now):
+        """Returns (cpu %, throttled %, memory bytes); rates are None on the first tick."""
+        n = self.cpu_stat.read()
+        stats = dict(line.split() for line in bytes(self.cpu_stat.buf[:n]).decode().splitlines() if line)
+        usage = self.usage.update(int(stats["usage_usec"]), now)
+        throttled = self.throttled.update(int(stats.get("throttled_usec", 0)), now)
+        memory = int(self.memory.buf[:self.memory.read()])
+        return (None if usage is None else usage / 1e4,
+                None if throttled is None else throttled / 1e4,
+                memory)
+
+    def close(self):
+        self.cpu_stat.close()
+        self.memory.close()
+
+class Stat:
+    """Running average and maximum of a series, in constant memory."""
+    __slots__ = ("total", "count", "max")
+
+    def __init__(self):
+        self.total = 0.0
+        self.count = 0
+        self.max = None
+
+    def add(self, value):
+        if value is None:
+            return
+        self.total += value
+        self.count += 1
+        self.max = value if self.max is None else max(self.max, value)
+
+    @property
+    def avg(self):
+        return self.total / self.count if self.count else None
+
+class Sampler:
+    """
+    Takes one sample of everything per tick: system and per-core CPU from a single /proc/stat read,
+    memory from /proc/meminfo, and optionally a process tree and a cgroup. CPU usage is the delta
+    against the previous tick, so no sleep is needed inside a sample.
+    """
+    def __init__(self, pid=None, cgroup=None):
+        self.stat = ProcFile("/proc/stat")
+        self.meminfo = ProcFile("/proc/meminfo")
+        self.mem_total = meminfo_kb(self.meminfo.buf, self.meminfo.read(), b"MemTotal:")
+        self.prev_cpu = {}
+        self.tree = ProcessTree(pid) if pid else None
+        self.cgroup = CgroupStats(cgroup) if cgroup else None
+        self.tick()
+
+    def tick(self):
+        """
+        Returns a dict with 'cpu' (None on the first tick), 'cores' ({name: %}), 'mem',
+        and 'processes'/'threads'/'cgroup' when those sources are enabled.
+        """
+        now = time.monotonic()
+        sample = {"cpu": None, "cores": {}}
+        n = self.stat.read()
+        for line in self.stat.buf[:n].split(b"\n"):
+            if not line.startswith(b"cpu"):
+                break
+            name = line[:line.index(b" ")].decode()
+            busy, total = parse_cpu_times(line)
+            prev = self.prev_cpu.get(name)
+            self.prev_cpu[name] = (busy, total)
+            if prev is None or total <= prev[1]:
+                continue
+            usage = (busy - prev[0]) / (total - prev[1]) * 100.0
+            if name == "cpu":
+                sample["cpu"] = usage
+            else:
+                sample["cores"][name] = usage
+
+        sample["mem"] = None
+        available = meminfo_kb(self.meminfo.buf, self.meminfo.read(), b"MemAvailable:")
+        if self.mem_total and available is not None:
+            sample["mem"] = (self.mem_total - available) / self.mem_total * 100.0
+
+        if self.tree:
+            sample["processes"], sample["threads"] = self.tree.tick(now)
+        if self.cgroup:
+            try:
+                sample["cgroup"] = self.cgroup.tick(now)
+            except (OSError, ValueError, KeyError):
+                sample["cgroup"] = None  # the container stopped
+        return sample
+
+    def close(self):
+        self.stat.close()
+        self.meminfo.close()
+        if self.tree:
+            self.tree.close()
+        if self.cgroup:
+            self.cgroup.close()
 
 def signal_handler(signum, frame):
     if signum == 2:
@@ -66,50 +279,170 @@ def signal_handler(signum, frame):
     print(f"Received signal {sign}, exiting gracefully...")
     exit_event.set()
 
-def monitor_loop(profile_time):
+def print_details(cores, processes, threads, cgroup, top_threads):
+    if cores:
+        print("Per-core CPU Usage (avg/p95/max):")
+        for name in sorted(cores, key=lambda name: int(name[3:])):
+            core = cores[name]
+            print(f"  {name:<6} {core.mean:5.1f}% / {core.percentile(95):5.1f}% / {core.max:5.1f}%")
+    if processes:
+        print("Process CPU (% of one core, avg/max) and RSS (MB, avg/max):")
+        for pid, (comm, cpu, rss) in sorted(processes.items(), key=lambda item: -(item[1][1].avg or 0.0)):
+            if cpu.count:
+                print(f"  {pid:>7} {comm:<16} {cpu.avg:6.1f}% / {cpu.max:6.1f}%   {rss.avg / MB:8.1f} / {rss.max / MB:8.1f}")
+    if threads:
+        busiest = sorted((item for item in threads.items() if item[1][1].count), key=lambda item: -item[1][1].avg)
+        print(f"Top {min(top_threads, len(busiest))} threads by CPU (% of one core, avg/max):")
+        for (pid, tid), (comm, cpu) in busiest[:top_threads]:
+            print(f"  {pid:>7}/{tid:<7} {comm:<16} {cpu.avg:6.1f}% / {cpu.max:6.1f}%")
+    if cgroup:
+        path, cpu, throttled, memory, memory_max = cgroup
+        limit = f" (limit {memory_max / MB:.0f} MB)" if memory_max else ""
+        print(f"Cgroup {path}:")
+        if cpu.count:
+            print(f"  CPU {cpu.avg:.1f}% / {cpu.max:.1f}% of one core (avg/max), throttled {throttled.avg:.1f}% avg")
+        if memory.count:
+            print(f"  Memory {memory.avg / MB:.1f} / {memory.max / MB:.1f} MB (avg/max){limit}")
+
+def print_window(window):
+    parts = []
+    for name in ("cpu", "mem"):
+        stats = window[name]
+        if stats.n:
+            parts.append(f"{name.upper()}={stats.mean:.1f}% (p50 {stats.percentile(50):.1f}, p95 {stats.percentile(95):.1f}, max {stats.max:.1f})")
+    if parts:
+        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {' | '.join(parts)}", flush=True)
+
+def retire_exited(entries, retired, live, keep):
+    """
+    Moves the entries of tasks that are gone from the latest sample into `retired`, which only keeps
+    the `keep` busiest of them (by average CPU), so memory stays bounded however many tasks come and go.
+    """
+    for key in [key for key in entries if key not in live]:
+        retired[key] = entries.pop(key)
+    if len(retired) > keep:
+        busiest = sorted(retired, key=lambda key: -(retired[key][1].avg or 0.0))[:keep]
+        for key in set(retired) - set(busiest):
+            del retired[key]
 
-    # cpu_history = []
-    # mem_history = []
-    cpu_total = []
-    mem_total = []
+def monitor_loop(rate, profile_time=5, pid=None, cgroup=None, top_threads=10, state_out=None):
+    period = 1.0 / rate
+    sampler = Sampler(pid=pid, cgroup=cgroup)
+    missed = 0
+    # Samples go into the current window; each window is merged into the totals when it closes,
+    # so memory stays constant however long the run is.
+    totals = {"cpu": StreamStats(), "mem": StreamStats()}
+    if cgroup:
+        # The container's CPU as a share of the whole machine, on the same scale as "cpu"
+        totals["cgroup_cpu"] = StreamStats()
+    window = {name: StreamStats() for name in totals}
+    ncpu = os.cpu_count() or 1
+    cores = {}
+    processes = {}  # pid -> (comm, Stat cpu, Stat rss), live processes
+    threads = {}  # (pid, tid) -> (comm, Stat cpu), live threads
+    exited_processes, exited_threads = {}, {}  # the busiest tasks that are gone, for the final report
+    cg_cpu, cg_throttled, cg_memory = Stat(), Stat(), Stat()
 
-    while not exit_event.is_set():
-        cpu_results = get_cpu_usage()
-        mem_results = get_system_mem_usage()
+    def close_window():
+        for name, stats in window.items():
+            totals[name].merge(stats)
+            window[name] = StreamStats()
 
-        if cpu_results is not None:
-            # cpu_history.append(cpu_results)
-            cpu_total.append(cpu_results)
-        if mem_results is not None:
-            # mem_history.append(mem_results)
-            mem_total.append(mem_results)
+    wall_start = time.monotonic()
+    self_cpu_start = time.process_time()
+    next_tick = wall_start + period
+    next_window = wall_start + profile_time
 
-        # if len(cpu_history) * 0.5 >= profile_time:
-        #     avg_cpu = sum(cpu_history) / len(cpu_history)
-        #     avg_mem = sum(mem_history) / len(mem_history)
+    # Fixed-rate pacing: sleep until the next deadline, skipping ticks if we fall behind.
+    while not exit_event.wait(max(0.0, next_tick - time.monotonic())):
+        sample = sampler.tick()
+        for name, usage in sample["cores"].items():
+            cores.setdefault(name, StreamStats()).add(usage)
+        if "threads" in sample:
+            for proc_id, (comm, cpu, rss) in sample["processes"].items():
+                if proc_id not in processes:
+                    processes[proc_id] = exited_processes.pop(proc_id, None) or (comm, Stat(), Stat())
+                processes[proc_id][1].add(cpu)
+                processes[proc_id][2].add(rss)
+            for key, (comm, cpu) in sample["threads"].items():
+                if key not in threads:
+                    threads[key] = exited_threads.pop(key, None) or (comm, Stat())
+                threads[key][1].add(cpu)
+            retire_exited(processes, exited_processes, sample["processes"], top_threads)
+            retire_exited(threads, exited_threads, sample["threads"], top_threads)
+        if sample.get("cgroup"):
+            cg_cpu.add(sample["cgroup"][0])
+            cg_throttled.add(sample["cgroup"][1])
+            cg_memory.add(sample["cgroup"][2])
+            if sample["cgroup"][0] is not None:
+                window["cgroup_cpu"].add(sample["cgroup"][0] / ncpu)
+        if sample["cpu"] is not None:
+            window["cpu"].add(sample["cpu"])
+        if sample["mem"] is not None:
+            window["mem"].add(sample["mem"])
 
-        #     cpu_str = f"CPU={avg_cpu:.1f}%"
-        #     mem_str = f"MEM={avg_mem:.1f}%"
-        #     print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {cpu_str} | {mem_str}")
+        next_tick += period
+        now = time.monotonic()
+        if next_tick < now:
+            skipped = int((now - next_tick) / period) + 1
+            missed += skipped
+            next_tick += skipped * period
+        if profile_time > 0 and now >= next_window:
+            print_window(window)
+            close_window()
+            next_window += profile_time * (int((now - next_window) / profile_time) + 1)
 
-        #     cpu_history.clear()
-        #     mem_history.clear()
+    close_window()
+    wall = time.monotonic() - wall_start
+    self_cpu = time.process_time() - self_cpu_start
+    sampler.close()
 
-        # time.sleep(0.5)
-    
-    if cpu_total and mem_total:
-        print("Final Average CPU Usage:", f"{sum(cpu_total)/len(cpu_total):.1f}%")
-        print("Final Average MEM Usage:", f"{sum(mem_total)/len(mem_total):.1f}%")
+    cpu, mem = totals["cpu"], totals["mem"]
+    if cpu.n and mem.n:
+        print("Final Average CPU Usage:", f"{cpu.mean:.1f}%")
+        print("Final Average MEM Usage:", f"{mem.mean:.1f}%")
+        print("Final CPU Usage Stats:", format_summary(cpu))
+        print("Final MEM Usage Stats:", format_summary(mem))
+    print_details(cores, {**exited_processes, **processes}, {**exited_threads, **threads},
+                  (cgroup, cg_cpu, cg_throttled, cg_memory, sampler.cgroup.memory_max) if cgroup else None,
+                  top_threads)
+    if wall > 0:
+        # Share of one core, and of the whole machine (comparable to the CPU usage above).
+        overhead = self_cpu / wall * 100.0
+        print("Monitor CPU Overhead:", f"{overhead:.2f}% of one core, {overhead / (os.cpu_count() or 1):.3f}% of total CPU")
+        print("Monitor Samples:", f"{cpu.n} at {rate:g} Hz, {missed} missed")
+    if state_out:
+        try:
+            dump_state(state_out, {**totals, **cores})
+            print(f"Statistics state saved to {state_out}")
+        except OSError as e:
+            print(f"[ERROR] Could not write {state_out}: {e}")
 
 def main():
-    parser = argparse.ArgumentParser(description="System monitor for CPU, MEM")
-    parser.add_argument("-p", "--profile-time", type=int, default=5, help="Profile time for qprof averaging in seconds, default=5")
+    parser = argparse.ArgumentParser(description="System monitor for CPU, MEM, per-core, per-process and per-container usage")
+    parser.add_argument("-p", "--profile-time", type=int, default=5, help="Print a windowed summary every N seconds (0 disables), default=5")
+    parser.add_argument("-r", "--rate", type=float, default=10.0, help="Sampling rate in Hz, default=10")
+    parser.add_argument("--pid", type=int, default=None, help="Also track CPU and RSS of this process, its threads and its descendants")
+    parser.add_argument("--cgroup", type=str, default=None, help="Also track a cgroup v2 directory or a docker container ID")
+    parser.add_argument("--state-out", type=str, default=None, help="Save mergeable statistics state (JSON) at exit; combine runs with stream_stats.py merge")
+    parser.add_argument("--top-threads", type=int, default=10, help="Number of busiest threads to report, default=10")
     args = parser.parse_args()
+    if args.rate <= 0:
+        parser.error("--rate must be positive")
+    if args.pid is not None and not os.path.isdir(f"/proc/{args.pid}"):
+        parser.error(f"No process with PID {args.pid}")
+    cgroup = None
+    if args.cgroup:
+        try:
+            cgroup = find_cgroup(args.cgroup)
+        except ValueError as e:
+            parser.error(str(e))
 
     signal.signal(signal.SIGTERM, signal_handler)
     signal.signal(signal.SIGINT, signal_handler)
 
-    monitor_loop(profile_time=args.profile_time)
+    monitor_loop(rate=args.rate, profile_time=args.profile_time, pid=args.pid, cgroup=cgroup,
+                 top_threads=args.top_threads, state_out=args.state_out)
 
 if __name__ == "__main__":
     main()
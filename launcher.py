@@ -4,54 +4,187 @@
 # This software is released under the MIT License.
 # https://opensource.org/licenses/MIT
 
+import time
+_START = time.perf_counter()
+
 import argparse
 import logging
 import os
-from mod.autotag import AUTOTAG
-from mod.ipk import IPK
-from mod.run import RUN
-from mod.utils import get_system_bsp_version, split_autotag
+import sys
+from mod.utils import PHASE_TIMER, get_system_bsp_version, parse_ipk_list, split_autotag
+
+def prefetch(args, project_root, run, timer):
+    """Resolves the image of every app in tutorials/metadata.json and reports which ones are warm."""
+    with timer.phase('imports'):
+        from mod.autotag import resolve_images
+    app_images = {app_name: entry['image'] for app_name, entry in run.app_links.items()}
+    logging.info(f"--- Prefetch images for {len(app_images)} app(s): {', '.join(app_images)} ---")
+    with timer.phase('image resolution'):
+        # Apps sharing an image resolve it once.
+        results = resolve_images(args, project_root, app_images.values(), workers=args.prefetch_workers,
+                                 io_budget=args.io_budget, defer_pull=False)
+
+    logging.info("--- Prefetch report ---")
+    logging.info(f"{'App':<24} {'Status':<6} {'Time (s)':>8}  Image")
+    for app_name, image_name in app_images.items():
+        image, elapsed = results[image_name]
+        logging.info(f"{app_name:<24} {'warm' if image else 'COLD':<6} {elapsed:>8.1f}  {image or '-'}")
+    cold = [app_name for app_name, image_name in app_images.items() if not results[image_name][0]]
+    logging.info(f"{len(app_images) - len(cold)}/{len(app_images)} app(s) warm.")
+    timer.report()
+    return 1 if cold else 0
+
+def check_app(run, app_name, system_bsp):
+    """Returns the compiled index entry of an app, or None if it is unknown or does not support this BSP."""
+    app = run.get_app(app_name)
+    if app is None:
+        logging.error(f"Component '{app_name}' not found in metadata.json")
+    elif not run.app_index.supports_bsp(app_name, system_bsp):
+        logging.error(f"{app_name} does not support BSP {system_bsp} (supported: {', '.join(app['bsp'])})")
+        return None
+    return app
+
+def install_prerequisites(args, project_root, timer, system_bsp, ipk_names):
+    """Installs the IPKs apps declare in metadata.json; returns False if any could not be installed."""
+    ipk_names = list(dict.fromkeys(ipk_names))
+    if not ipk_names:
+        return True
+    with timer.phase('imports'):
+        from mod.ipk import IPK
+    missing = set(ipk_names) - set(IPK(args, project_root, bsp_version=system_bsp).install_packages(ipk_names))
+    if missing:
+        logging.error(f"Required IPK(s) could not be installed: {', '.join(sorted(missing))}")
+        return False
+    return True
+
+def run_apps(args, project_root, run, timer, system_bsp, refs):
+    """Multi-app mode: resolves the images of all apps in one shared pass, then runs them side by side."""
+    apps = {}
+    for app_name, image_tag in refs:
+        app = check_app(run, app_name, system_bsp)
+        if app is None:
+            return 1
+        apps[app_name] = f"{app['image']}:{image_tag}"
+    logging.info(f"--- Multi-app flow for {', '.join(apps)} ---")
+
+    with timer.phase('imports'):
+        from mod.autotag import resolve_images
+    with timer.phase('image resolution'):
+        # One pass for every app, so concurrent launches no longer race on docker load.
+        images = resolve_images(args, project_root, apps.values(),
+                                workers=args.prefetch_workers, io_budget=args.io_budget)
+    cold = [app_name for app_name, ref in apps.items() if not images[ref][0]]
+    if cold:
+        logging.error(f"No image available for {', '.join(cold)}; not starting any app.")
+        return 1
+    if not install_prerequisites(args, project_root, timer, system_bsp,
+                                 [ipk for app_name in apps for ipk in run.get_app(app_name)['ipks']]):
+        return 1
+    return run.execute_many([(app_name, (images[ref][0],)) for app_name, ref in apps.items()])
+
+def build_index(project_root):
+    """Rebuilds the compiled app index from tutorials/metadata.json and reports invalid entries."""
+    from mod.app_index import APP_INDEX
+    index = APP_INDEX(project_root)
+    try:
+        errors = index.build()
+    except (OSError, ValueError) as e:
+        logging.error(f"Could not load or parse metadata.json: {e}")
+        return 1
+    logging.info(f"App index written to {index.index_path}: "
+                 f"{len(index.apps)} app(s), {len(errors)} invalid entr{'y' if len(errors) == 1 else 'ies'}.")
+    return 1 if errors else 0
 
 def main():
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    timer = PHASE_TIMER(start=_START)
+    timer.add('imports', time.perf_counter() - _START)
     
     project_root = os.path.dirname(os.path.realpath(__file__))
 
-    # Get system BSP version once
-    try:
-        system_bsp = get_system_bsp_version()
-    except (FileNotFoundError, ValueError) as e:
-        logging.critical(f"Could not determine system BSP version: {e}")
-        logging.critical("Cannot proceed without BSP version. Exiting.")
-        return
-
     ap = argparse.ArgumentParser()
-    ap.add_argument("--autotag", type=str, default=None, help="choose iq-container docker image")
-    ap.add_argument("--ipk",  type=str, default=None, help="install ipk file")
+    ap.add_argument("--autotag", type=str, default=None, help="choose iq-container docker image; a comma-separated list runs several apps side by side")
+    ap.add_argument("--registry-mirror", type=str, default=None, help="registry to pull images from instead of Docker Hub, e.g. 192.168.1.10:5000 (default: $IQS_REGISTRY_MIRROR); layer concurrency is dockerd's max-concurrent-downloads")
+    ap.add_argument("--ipk",  type=str, default=None, help="install ipk packages: a name, a comma-separated list, or @manifest with one name per line")
+    ap.add_argument("--ipk-workers", type=int, default=min(4, os.cpu_count() or 1), help="number of threads used to scan new or changed ipk files")
+    ap.add_argument("--ipk-match", choices=("best", "first"), default="best", help="pick the highest compatible ipk version (best) or the first compatible file by name (first)")
+    ap.add_argument("--prefetch", action="store_true", help="resolve, load or pull the images of all apps in tutorials/metadata.json, then exit")
+    ap.add_argument("--prefetch-workers", type=int, default=4, help="number of apps resolved concurrently by --prefetch and multi-app --autotag")
+    ap.add_argument("--io-budget", type=int, default=1, help="number of image loads/pulls allowed to run at the same time")
+    ap.add_argument("--build-index", action="store_true", help="validate tutorials/metadata.json and rebuild the compiled app index, then exit")
+    ap.add_argument("--handoff", action="store_true", help="replace the launcher process with the last app script (exec) instead of waiting for it")
+    ap.add_argument("--timings", action="store_true", help="print a per-phase startup breakdown before the app script starts")
     ap.add_argument("--other",  type=str, default=None, help="entry for other commands")
     args = ap.parse_args()
-    
-    autotag = AUTOTAG(args, project_root)
-    run = RUN(args, project_root)
-    ipk = IPK(args, project_root, bsp_version=system_bsp)
+    timer.enabled = args.timings
+
+    # Get system BSP version once
+    with timer.phase('BSP detection'):
+        try:
+            system_bsp = get_system_bsp_version()
+        except (FileNotFoundError, ValueError) as e:
+            logging.critical(f"Could not determine system BSP version: {e}")
+            logging.critical("Cannot proceed without BSP version. Exiting.")
+            return 1
+
+    # Subsystems are imported and built only for the flags that need them.
+    with timer.phase('imports'):
+        from mod.run import RUN
+    run = RUN(args, project_root, timer=timer)
+
+    if args.build_index:
+        return build_index(project_root)
 
-    if args.autotag is not None:
-        app_name, image_tag = split_autotag(args.autotag)
+    if args.prefetch:
+        return prefetch(args, project_root, run, timer)
+
+    refs = [split_autotag(ref.strip()) for ref in (args.autotag or '').split(',') if ref.strip()]
+    if len(refs) > 1:
+        code = run_apps(args, project_root, run, timer, system_bsp, refs)
+        if code or args.ipk is None:
+            return code
+    elif refs:
+        app_name, image_tag = refs[0]
         logging.info(f"--- Autotag flow for {app_name} (tag={image_tag}) ---")
 
-        autotag = AUTOTAG(args, project_root, image_tag=image_tag, app_name=app_name)
+        app = check_app(run, app_name, system_bsp)
+        if app is None:
+            return 1
+
+        with timer.phase('imports'):
+            from mod.autotag import AUTOTAG
+        autotag = AUTOTAG(args, project_root, image_tag=image_tag, app_name=app['image'])
+
+        with timer.phase('image resolution'):
+            compatible_image = autotag.ensure_compatible_image_exists()
+        if not compatible_image:
+            return 1
+        if not install_prerequisites(args, project_root, timer, system_bsp, app['ipks']):
+            return 1
+        # A chained IPK flow still needs the launcher afterwards, so hand off only when nothing follows.
+        code = run.execute_script(app_name, compatible_image, handoff=args.handoff and args.ipk is None)
+        if code or args.ipk is None:
+            return code
+
+    if args.ipk is not None:
+        try:
+            ipk_names = parse_ipk_list(args.ipk)
+        except OSError as e:
+            logging.error(f"Could not read IPK manifest: {e}")
+            return 1
+        logging.info(f"--- IPK installation process for {', '.join(ipk_names)} ---")
+
+        with timer.phase('imports'):
+            from mod.ipk import IPK
+        ipk = IPK(args, project_root, bsp_version=system_bsp)
 
-        if (compatible_image := autotag.ensure_compatible_image_exists()):
-            run.execute_script(app_name, compatible_image)
-        
-        if args.ipk is not None:
-            logging.info(f"--- IPK installation process for {args.ipk} ---")
-            if ipk.is_installed():
-                run.execute_script(args.ipk)
-            else:
-                compatible_ipk_path = ipk.find_compatible_path()
-                if compatible_ipk_path and ipk.install(compatible_ipk_path):
-                    run.execute_script(args.ipk)
+        ready = [ipk_name for ipk_name in ipk.install_packages(ipk_names)
+                 if len(ipk_names) == 1 or run.has_component(ipk_name)]
+        code = 0
+        for i, ipk_name in enumerate(ready):
+            result = run.execute_script(ipk_name, handoff=args.handoff and i == len(ready) - 1)
+            code = code or result
+        return code
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,196 @@
+# Copyright (c) 2025 Innodisk Corp.
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+import os
+import re
+import json
+import stat
+import logging
+
+INDEX_FORMAT = 2
+INDEX_FILENAME = '.metadata-index.json'
+NAME_PATTERN = re.compile(r'^[a-z0-9]+(?:[._-][a-z0-9]+)*$')
+
+
+def _normalize_entry(name, raw):
+    """
+    Accepts both metadata.json forms and returns a dict with every field:
+      "app": "path/to/run.sh"
+      "app": {"script": "path/to/run.sh", "image": "...", "ipks": [...], "bsp": [...]}
+    'image' defaults to the app name, 'ipks' to none and 'bsp' (supported BSP versions) to any.
+    """
+    if isinstance(raw, str):
+        raw = {'script': raw}
+    if not isinstance(raw, dict):
+        raise ValueError("entry must be a script path or an object")
+    unknown = set(raw) - {'script', 'image', 'ipks', 'bsp'}
+    if unknown:
+        raise ValueError(f"unknown field(s): {', '.join(sorted(unknown))}")
+    return {
+        'script': raw.get('script'),
+        'image': raw.get('image', name),
+        'ipks': raw.get('ipks', []),
+        'bsp': raw.get('bsp', []),
+    }
+
+
+def _script_signature(script_path):
+    """mtime, size and mode of a script, or None if it is gone; a change means the entry must be re-validated."""
+    try:
+        st = os.stat(script_path)
+    except OSError:
+        return None
+    return {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'mode': st.st_mode}
+
+
+def _validate_entry(root_path, name, raw):
+    """
+    Validates one metadata.json entry and returns its compiled form.
+
+    Raises:
+        ValueError: With a message describing the first problem found.
+    """
+    if not NAME_PATTERN.match(name):
+        raise ValueError("app name must be lowercase letters, digits and . _ - separators")
+    entry = _normalize_entry(name, raw)
+
+    if not isinstance(entry['script'], str) or not entry['script']:
+        raise ValueError("'script' must be a non-empty path")
+    script_path = os.path.normpath(os.path.join(root_path, entry['script']))
+    if os.path.commonpath([script_path, os.path.normpath(root_path)]) != os.path.normpath(root_path):
+        raise ValueError(f"script {entry['script']} is outside the repository")
+    if not os.path.isfile(script_path):
+        raise ValueError(f"script not found: {script_path}")
+
+    image = entry['image']
+    if not isinstance(image, str) or not NAME_PATTERN.match(image):
+        raise ValueError(f"invalid image name (expected the name under innodiskorg/): {image!r}")
+    for field in ('ipks', 'bsp'):
+        if not isinstance(entry[field], list) or not all(isinstance(v, str) and v for v in entry[field]):
+            raise ValueError(f"'{field}' must be a list of non-empty strings")
+
+    # Fix the execute bit once here instead of on every launch.
+    st = os.stat(script_path)
+    if not (st.st_mode & stat.S_IEXEC):
+        logging.info(f"Script at {script_path} is not executable. Adding execute permission.")
+        os.chmod(script_path, st.st_mode | stat.S_IEXEC)
+
+    return {
+        'script': script_path,
+        'stat': _script_signature(script_path),
+        'image': image,
+        'ipks': entry['ipks'],
+        'bsp': entry['bsp'],
+    }
+
+
+class APP_INDEX:
+    """
+    Compiled, validated form of tutorials/metadata.json.
+
+    The build step validates every entry and records its script path, required image,
+    required IPKs, BSP constraints and the script's stat signature in one cached file.
+    A launch costs one stat() of metadata.json, one read of the index and one stat() of the
+    script it runs; the index is rebuilt automatically when metadata.json or that script changes.
+    """
+    def __init__(self, root_path, index_path=None):
+        self.root_path = root_path
+        self.metadata_path = os.path.join(root_path, 'tutorials', 'metadata.json')
+        self.index_path = index_path or os.path.join(root_path, 'tutorials', INDEX_FILENAME)
+        self.apps = {}
+        self.errors = {}
+
+    def _source_signature(self):
+        # The root is part of the key because script paths are stored absolute.
+        st = os.stat(self.metadata_path)
+        return {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'root': os.path.realpath(self.root_path)}
+
+    def build(self):
+        """
+        Validates metadata.json and writes the index.
+
+        Raises:
+            OSError: If metadata.json cannot be read.
+            ValueError: If metadata.json is not a JSON object.
+
+        Returns:
+            dict: {app name: error message} for the entries that were rejected.
+        """
+        signature = self._source_signature()
+        with open(self.metadata_path, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+        if not isinstance(metadata, dict):
+            raise ValueError("metadata.json must contain a JSON object")
+
+        self.apps, self.errors = {}, {}
+        for name, raw in metadata.items():
+            try:
+                self.apps[name] = _validate_entry(self.root_path, name, raw)
+            except (OSError, ValueError) as e:
+                self.errors[name] = str(e)
+                logging.error(f"metadata.json: invalid entry '{name}': {e}")
+
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'format': INDEX_FORMAT, 'source': signature, 'apps': self.apps, 'errors': self.errors},
+                          f, separators=(',', ':'), sort_keys=True)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            logging.warning(f"Could not write app index {self.index_path}: {e}")
+        return self.errors
+
+    def load(self):
+        """
+        Loads the cached index, rebuilding it first if metadata.json changed since it was written.
+
+        Raises:
+            OSError: If metadata.json cannot be read.
+            ValueError: If metadata.json is not valid.
+        """
+        signature = self._source_signature()
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('format') == INDEX_FORMAT and data.get('source') == signature:
+                self.apps, self.errors = data['apps'], data.get('errors', {})
+                for name, message in self.errors.items():
+                    logging.error(f"metadata.json: invalid entry '{name}': {message}")
+                return self
+        except (OSError, ValueError, AttributeError, KeyError):
+            pass
+        logging.info("metadata.json changed, rebuilding the app index...")
+        self.build()
+        return self
+
+    def get(self, name):
+        return self.apps.get(name)
+
+    def script_path(self, name):
+        """
+        Returns the validated script path of an app. If the script was edited, deleted or lost its
+        execute bit since the index was built, or the entry was invalid, the index is rebuilt first,
+        which re-validates the entry and fixes the execute bit again.
+
+        Raises:
+            FileNotFoundError: If the app is unknown or its entry is no longer valid.
+        """
+        entry = self.apps.get(name)
+        # An entry rejected earlier (e.g. script missing) is re-validated too, in case it was fixed.
+        if (entry and _script_signature(entry['script']) != entry.get('stat')) or (not entry and name in self.errors):
+            logging.info(f"Script of '{name}' changed since the app index was built, rebuilding it...")
+            try:
+                self.build()
+            except (OSError, ValueError) as e:
+                raise FileNotFoundError(f"Could not rebuild the app index: {e}") from e
+            entry = self.apps.get(name)
+        if not entry:
+            reason = self.errors.get(name, 'not found in metadata.json')
+            raise FileNotFoundError(f"Component '{name}': {reason}")
+        return entry['script']
+
+    def supports_bsp(self, name, bsp_version):
+        """An app without BSP constraints, or a system whose BSP version is unknown, is always accepted."""
+        allowed = self.apps[name]['bsp']
+        return not allowed or not bsp_version or bsp_version in allowed
@@ -3,12 +3,16 @@
 # https://opensource.org/licenses/MIT
 
 import os
+import time
 import subprocess
+import contextlib
 import json
 import logging
+from mod.image_cache import IMAGE_CACHE
+from mod.utils import log_prefix
 
 class AUTOTAG:
-    def __init__(self, args, root_path, image_tag=None, app_name=None):
+    def __init__(self, args, root_path, image_tag=None, app_name=None, image_cache=None, io_slots=None, defer_pull=True):
         #
         self.args = args
         raw = app_name or self.args.autotag  # e.g. "iqs-ogenie" or "iqs-ogenie:0.0.3"
@@ -20,16 +24,76 @@ class AUTOTAG:
             self.image_tag = image_tag or 'latest'
 
         self.docker_image_dir = os.path.normpath(os.path.join(root_path, 'binaries', 'docker-images'))
+        self._engine = None
+        self.image_cache = image_cache or IMAGE_CACHE()
+        # Bounds heavy IO (archive loads, pulls) when several images are resolved at once.
+        self.shared_io = io_slots is not None
+        self.io_slots = io_slots or contextlib.nullcontext()
+        # If our own pull fails, hand the image name on anyway and let 'docker run' try to pull it.
+        self.defer_pull = defer_pull
+
+    @property
+    def engine(self):
+        # Imported on first use: flows that never reach the image steps do not load it.
+        if self._engine is None:
+            from mod.docker_engine import DOCKER_ENGINE
+            self._engine = DOCKER_ENGINE()
+        return self._engine
+
+    @property
+    def target(self):
+        return f"innodiskorg/{self.image_name}:{self.image_tag}"
+
+    def _inspect_image_id(self, ref):
+        """
+        Returns the local image ID for a reference, or None if it does not exist.
+        Uses the Docker Engine API over the unix socket, falling back to 'docker image inspect'.
+        """
+        if self.engine.available():
+            try:
+                info = self.engine.inspect_image(ref)
+                return info['Id'] if info else None
+            except OSError as e:
+                logging.debug(f"Docker Engine API unavailable, falling back to the docker CLI: {e}")
+
+        result = subprocess.run(
+            ['docker', 'image', 'inspect', '--format', '{{.Id}}', ref],
+            check=False, capture_output=True, text=True
+        )
+        if result.returncode == 0:
+            return result.stdout.strip()
+        if 'No such image' in result.stderr or 'No such object' in result.stderr:
+            return None
+        raise subprocess.CalledProcessError(result.returncode, result.args, result.stdout, result.stderr)
+
+    def _cached_image_exists(self, target, image_id):
+        """
+        Confirms a cache hit with one Engine API lookup, so an image removed with 'docker rmi'
+        is not reported as present until the entry expires. Without the Engine API the cache
+        is trusted, as a 'docker image inspect' call would cost what the cache saves.
+        """
+        if not self.engine.available():
+            return True
+        try:
+            info = self.engine.inspect_image(target)
+        except OSError as e:
+            logging.debug(f"Could not confirm cached image {target}: {e}")
+            return True
+        return bool(info) and info['Id'] == image_id
+
     def _check_local_image(self):
         logging.info("Step 1: Check if your local Docker image exists...")
+        target = self.target
+        if (image_id := self.image_cache.get(target)):
+            if self._cached_image_exists(target, image_id):
+                logging.info(f"Success: Found local image {target} (cached: {image_id[:19]})")
+                return target
+            logging.info(f"Cached image {image_id[:19]} for {target} is gone, looking it up again")
+            self.image_cache.drop(target)
         try:
-            target = f"innodiskorg/{self.image_name}:{self.image_tag}"
-            result = subprocess.run(
-                ['docker', 'images', '--format', '{{.Repository}}:{{.Tag}}'],
-                check=True, capture_output=True, text=True
-            )
-            images = result.stdout.strip().splitlines()
-            if target in images:
+            image_id = self._inspect_image_id(target)
+            if image_id:
+                self.image_cache.put(target, image_id)
                 logging.info(f"Success: Found local image {target}")
                 return target
             logging.info(f"No local image named {target}")
@@ -38,40 +102,144 @@ class AUTOTAG:
             logging.error(f"Error checking local image: {e}")
             return None
 
+    def _tag_image(self, image_id, target):
+        """Tags an image ID as `target`, via the Engine API or 'docker tag'."""
+        repo, _, tag = target.rpartition(':')
+        if self.engine.available():
+            try:
+                self.engine.tag_image(image_id, repo, tag)
+                return
+            except OSError as e:
+                logging.debug(f"Docker Engine API unavailable, falling back to the docker CLI: {e}")
+        subprocess.run(['docker', 'tag', image_id, target], check=True, capture_output=True, text=True)
+
+    def _adopt_image(self, image_id, target):
+        """Makes sure `target` points at `image_id`, re-tagging if needed, and records it in the cache."""
+        if self._inspect_image_id(target) != image_id:
+            logging.info(f"Tagging {image_id[:19]} as {target}")
+            self._tag_image(image_id, target)
+        self.image_cache.put(target, image_id)
+        return target
+
     def _check_tar_archive(self):
         logging.info("Step 2: Check the .tar archive...")
-        tar_path = os.path.join(self.docker_image_dir, f'{self.image_name}.tar')
-        if not os.path.isfile(tar_path):
-            logging.info(f"Could not find .tar archive at {tar_path}.")
+        from mod.image_archive import (ARCHIVE_SUFFIXES, ManifestTap, cached_archive_manifest, find_archive,
+                                       is_compressed, pick_image, store_archive_manifest)
+        from mod.image_loader import load_archive
+        tar_path = find_archive(self.docker_image_dir, self.image_name)
+        if not tar_path:
+            logging.info(f"Could not find an image archive for {self.image_name} "
+                         f"({', '.join(ARCHIVE_SUFFIXES)}) in {self.docker_image_dir}.")
             return None
 
-        logging.info(f"Found .tar archive: {tar_path}, loading with docker...")
+        target = self.target
+        image = None
+        # docker save writes manifest.json last, so reading it from a compressed archive costs a full
+        # decompression. Unless it is cached, it is picked out of the stream during the load instead.
         try:
-            subprocess.run(['docker', 'load', '-i', tar_path], check=True)
-            
-            loaded_image = f"innodiskorg/{self.image_name}:{self.image_tag}"
-            logging.info(f"Loaded image, assuming name: {loaded_image}")
-            return loaded_image
-        except (subprocess.CalledProcessError, FileNotFoundError) as e:
-            logging.error(f"Error loading .tar archive: {e}")
+            images = cached_archive_manifest(tar_path, scan=not is_compressed(tar_path))
+            image = pick_image(images, target) if images else None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not read the manifest of {tar_path}, loading it blindly: {e}")
+        tap = None if image else ManifestTap()
+
+        try:
+            # The archive's config digest is the image ID; if it is already local, a tag is all we need.
+            if image and image['id'] and self._inspect_image_id(image['id']):
+                logging.info(f"Image {image['id'][:19]} from {os.path.basename(tar_path)} is already loaded, skipping docker load.")
+                return self._adopt_image(image['id'], target)
+
+            logging.info(f"Found image archive: {tar_path}, streaming it into docker...")
+            loaded = load_archive(tar_path, self.engine, tap=tap)
+            if tap:
+                try:
+                    images = tap.images(tar_path)
+                    store_archive_manifest(tar_path, images)
+                    image = pick_image(images, target)
+                except ValueError as e:
+                    logging.debug(f"No manifest captured from {tar_path}: {e}")
+
+            if image and image['id']:
+                return self._adopt_image(image['id'], target)
+            if (image_id := self._inspect_image_id(target)):
+                self.image_cache.put(target, image_id)
+                logging.info(f"Loaded image {target}")
+                return target
+            if len(loaded) == 1 and (image_id := self._inspect_image_id(loaded[0])):
+                return self._adopt_image(image_id, target)
+            logging.error(f"Loaded {tar_path}, but it does not provide {target} (loaded: {', '.join(loaded) or 'nothing'})")
+            return None
+        except (subprocess.CalledProcessError, FileNotFoundError, OSError, ValueError) as e:
+            logging.error(f"Error loading image archive: {e}")
             return None
 
     def _pull_from_hub(self):
         logging.info("Step 3: Try downloading from Docker Hub...")
-        image_to_pull = f"innodiskorg/{self.image_name}:{self.image_tag}"
+        from mod.registry import REGISTRY
+        image_to_pull = self.target
         logging.info(f"PULL: {image_to_pull}")
-        ...
-        return image_to_pull
+        repo, _, tag = image_to_pull.rpartition(':')
+        registry = REGISTRY(self.engine, mirror=getattr(self.args, 'registry_mirror', None))
+        try:
+            pulled = registry.pull(repo, tag)
+            image_id = self._inspect_image_id(pulled)
+            if not image_id:
+                raise ValueError(f"{pulled} is not present after the pull")
+            return self._adopt_image(image_id, image_to_pull)
+        except (subprocess.CalledProcessError, FileNotFoundError, OSError, ValueError) as e:
+            logging.error(f"Error pulling {image_to_pull}: {e}")
+            if self.defer_pull:
+                # As before the pull step existed: 'docker run' pulls the image itself.
+                logging.warning(f"Leaving the pull of {image_to_pull} to docker run.")
+                return image_to_pull
+            return None
 
     def ensure_compatible_image_exists(self):
         if (found_image := self._check_local_image()):
             return found_image
 
-        if (found_image := self._check_tar_archive()):
-            return found_image
+        with self.io_slots:
+            # Another image sharing these layers may have landed while we waited for a slot.
+            if self.shared_io and (found_image := self._check_local_image()):
+                return found_image
 
-        if (found_image := self._pull_from_hub()):
-            return found_image
+            if (found_image := self._check_tar_archive()):
+                return found_image
+
+            if (found_image := self._pull_from_hub()):
+                return found_image
 
         logging.info("--- All methods failed ---")
-        return None
\ No newline at end of file
+        return None
+
+
+def resolve_images(args, root_path, app_refs, workers=4, io_budget=1, defer_pull=True):
+    """
+    Resolves the images of several apps concurrently through the AUTOTAG chain.
+
+    Local checks run on up to `workers` threads; archive loads and pulls are limited to
+    `io_budget` at a time so they do not fight over flash and network bandwidth. With
+    defer_pull=False an image that could not be pulled is reported as None.
+
+    Returns:
+        dict: {app_ref: (image or None, seconds)} in the order of `app_refs`.
+    """
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    image_cache = IMAGE_CACHE()
+    io_slots = threading.BoundedSemaphore(max(1, io_budget))
+
+    app_refs = list(dict.fromkeys(app_refs))
+    width = max((len(app_ref) for app_ref in app_refs), default=0)
+
+    def resolve(app_ref):
+        start = time.monotonic()
+        # Tag every log line of this thread, as execute_many does for app output.
+        with log_prefix(f"[{app_ref:<{width}}] "):
+            autotag = AUTOTAG(args, root_path, app_name=app_ref, image_cache=image_cache, io_slots=io_slots,
+                              defer_pull=defer_pull)
+            return autotag.ensure_compatible_image_exists(), time.monotonic() - start
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return dict(zip(app_refs, pool.map(resolve, app_refs)))
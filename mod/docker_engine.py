@@ -0,0 +1,172 @@
+# Copyright (c) 2025 Innodisk Corp.
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+import os
+import json
+import socket
+import http.client
+from urllib.parse import quote
+
+DEFAULT_SOCKET = '/var/run/docker.sock'
+API_TIMEOUT = 30
+
+
+def find_docker_socket():
+    """
+    Returns the Docker Engine unix socket from DOCKER_HOST or the default path.
+
+    Returns None if DOCKER_HOST points somewhere else (tcp://, ssh://, ...): the docker CLI
+    talks to that daemon, so the Engine API must not silently use the local socket instead.
+    """
+    host = os.environ.get('DOCKER_HOST', '')
+    if host.startswith('unix://'):
+        return host[len('unix://'):]
+    if host:
+        return None
+    return DEFAULT_SOCKET
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+class DOCKER_ENGINE:
+    """
+    Minimal Docker Engine API client speaking HTTP over the daemon's unix socket.
+
+    Connection problems raise OSError (ConnectionError for protocol errors), so callers
+    can fall back to the docker CLI the same way they handle a missing binary.
+    """
+    def __init__(self, socket_path=None, timeout=API_TIMEOUT):
+        self.socket_path = socket_path or find_docker_socket()
+        self.timeout = timeout
+
+    def available(self):
+        """True if the socket exists and we are allowed to talk to it; False for a non-unix DOCKER_HOST."""
+        if not self.socket_path:
+            return False
+        return os.path.exists(self.socket_path) and os.access(self.socket_path, os.R_OK | os.W_OK)
+
+    def request(self, method, path, body=None, headers=None):
+        """
+        Sends one request and returns (status, body bytes).
+
+        Raises:
+            OSError: If the daemon cannot be reached.
+        """
+        conn = _UnixHTTPConnection(self.socket_path, self.timeout)
+        try:
+            conn.request(method, path, body=body, headers=headers or {})
+            response = conn.getresponse()
+            return response.status, response.read()
+        except http.client.HTTPException as e:
+            raise ConnectionError(f"Docker Engine API error: {e}") from e
+        finally:
+            conn.close()
+
+    def inspect_image(self, ref):
+        """
+        Returns the image inspect document for a reference or image ID, or None if it does not exist.
+
+        Raises:
+            OSError: If the daemon cannot be reached or answers with an unexpected error.
+        """
+        status, data = self.request('GET', f"/images/{quote(ref, safe='')}/json")
+        if status == 404:
+            return None
+        if status != 200:
+            raise ConnectionError(f"Docker Engine API returned {status} for image {ref}: {data[:200]!r}")
+        return json.loads(data)
+
+    def tag_image(self, image, repo, tag):
+        """
+        Tags an existing image (reference or ID) as repo:tag.
+
+        Raises:
+            OSError: If the daemon cannot be reached or refuses the tag.
+        """
+        status, data = self.request('POST', f"/images/{quote(image, safe='')}/tag?repo={quote(repo, safe='')}&tag={quote(tag, safe='')}")
+        if status not in (200, 201):
+            raise ConnectionError(f"Docker Engine API returned {status} when tagging {image}: {data[:200]!r}")
+
+    def pull_image(self, image, tag, auth=None):
+        """
+        Pulls image:tag through POST /images/create, so the daemon's proxy, mirror and
+        registry settings apply, and yields its progress messages as they arrive.
+
+        Args:
+            auth: Optional base64url-encoded X-Registry-Auth header value.
+
+        Raises:
+            OSError: If the daemon cannot be reached or reports a pull error.
+
+        Yields:
+            dict: Progress messages, e.g. {'id': '...', 'status': 'Downloading', 'progressDetail': {...}}.
+        """
+        conn = _UnixHTTPConnection(self.socket_path, None)
+        try:
+            conn.request('POST', f"/images/create?fromImage={quote(image, safe='')}&tag={quote(tag, safe='')}",
+                         headers={'X-Registry-Auth': auth} if auth else {})
+            response = conn.getresponse()
+            if response.status != 200:
+                raise ConnectionError(f"Docker Engine API returned {response.status} for pulling {image}:{tag}: {response.read()[:200]!r}")
+            for line in response:
+                if not line.strip():
+                    continue
+                message = json.loads(line)
+                if message.get('error'):
+                    raise ConnectionError(f"Pull of {image}:{tag} failed: {message['error']}")
+                yield message
+        except http.client.HTTPException as e:
+            raise ConnectionError(f"Docker Engine API error: {e}") from e
+        finally:
+            conn.close()
+
+    def load_image(self, chunks):
+        """
+        Streams a tar archive into POST /images/load using chunked transfer encoding,
+        so the archive never has to be held in memory.
+
+        Args:
+            chunks: An iterable of bytes making up the (uncompressed) tar archive.
+
+        Raises:
+            OSError: If the daemon cannot be reached or reports a load error.
+
+        Returns:
+            list: The 'stream' messages of the daemon, e.g. 'Loaded image: repo:tag'.
+        """
+        conn = _UnixHTTPConnection(self.socket_path, None)
+        try:
+            conn.request('POST', '/images/load?quiet=1', body=chunks,
+                         headers={'Content-Type': 'application/x-tar'}, encode_chunked=True)
+            response = conn.getresponse()
+            if response.status != 200:
+                raise ConnectionError(f"Docker Engine API returned {response.status} for image load: {response.read()[:200]!r}")
+            messages = []
+            for line in response:
+                if not line.strip():
+                    continue
+                message = json.loads(line)
+                if message.get('error'):
+                    raise ConnectionError(f"Image load failed: {message['error']}")
+                if message.get('stream'):
+                    messages.append(message['stream'].strip())
+            return messages
+        except http.client.HTTPException as e:
+            raise ConnectionError(f"Docker Engine API error: {e}") from e
+        finally:
+            conn.close()
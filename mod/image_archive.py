@@ -0,0 +1,267 @@
+# Copyright (c) 2025 Innodisk Corp.
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+import os
+import gzip
+import contextlib
+import json
+import lzma
+import zlib
+import tarfile
+import logging
+from mod.utils import open_zstd_stream
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_INDEX_FILENAME = '.manifest-index.json'
+# Looked up in this order, so a plain .tar wins over a compressed copy of the same image.
+ARCHIVE_SUFFIXES = ('.tar', '.tar.zst', '.tar.gz', '.tgz', '.tar.xz')
+TAR_BLOCK = 512
+# Member types whose size field is not followed by data (as tarfile treats them).
+_NO_DATA_TYPES = (tarfile.LNKTYPE, tarfile.SYMTYPE, tarfile.CHRTYPE, tarfile.BLKTYPE, tarfile.DIRTYPE, tarfile.FIFOTYPE)
+
+
+def find_archive(archive_dir, image_name):
+    """Returns the path of the first '<image_name><suffix>' archive found, or None."""
+    for suffix in ARCHIVE_SUFFIXES:
+        path = os.path.join(archive_dir, f'{image_name}{suffix}')
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def is_compressed(path):
+    return not path.endswith('.tar')
+
+
+def open_decompressed(path, fileobj):
+    """
+    Wraps the raw archive file object in a streaming decompressor chosen by file suffix.
+
+    Raises:
+        ValueError: If the suffix is unknown or no decompressor is available.
+    """
+    if path.endswith('.tar'):
+        return fileobj
+    if path.endswith('.tar.gz') or path.endswith('.tgz'):
+        return gzip.GzipFile(fileobj=fileobj, mode='rb')
+    if path.endswith('.tar.xz'):
+        return lzma.LZMAFile(fileobj, mode='rb')
+    if path.endswith('.tar.zst'):
+        return open_zstd_stream(fileobj)
+    raise ValueError(f"Unsupported image archive: {path}")
+
+
+def _config_digest(config_path):
+    """
+    Maps the 'Config' entry of a docker-save manifest to an image ID.
+    Both layouts name the config blob after its sha256: '<hex>.json' (legacy) and 'blobs/sha256/<hex>' (OCI).
+    """
+    name = os.path.basename(config_path)
+    if name.endswith('.json'):
+        name = name[:-len('.json')]
+    if len(name) == 64 and all(c in '0123456789abcdef' for c in name):
+        return f"sha256:{name}"
+    return None
+
+
+def parse_manifest(manifest, tar_path):
+    """
+    Turns a parsed docker-save manifest.json into one dict per image.
+
+    Raises:
+        ValueError: If the manifest lists no image.
+    """
+    images = []
+    for entry in manifest if isinstance(manifest, list) else []:
+        images.append({
+            'id': _config_digest(entry.get('Config', '')),
+            'repo_tags': entry.get('RepoTags') or [],
+            'layers': entry.get('Layers') or [],
+        })
+    if not images:
+        raise ValueError(f"Empty {MANIFEST_NAME} in {tar_path}")
+    return images
+
+
+def read_archive_manifest(tar_path):
+    """
+    Reads manifest.json out of a 'docker save' archive without extracting it.
+
+    Members are visited header by header and the first manifest.json found is parsed.
+    Layer data of a plain .tar is seeked over; a compressed archive has to be
+    decompressed up to the manifest, which docker save writes last, but nothing is
+    written to disk. ManifestTap avoids that pass when the archive is loaded anyway.
+
+    Raises:
+        OSError: If the archive cannot be read.
+        ValueError: If the archive has no usable manifest.
+
+    Returns:
+        list: One dict per image: {'id': 'sha256:...', 'repo_tags': [...], 'layers': [...]}.
+    """
+    manifest = None
+    try:
+        with open(tar_path, 'rb') as raw:
+            mode = 'r|' if is_compressed(tar_path) else 'r:'
+            with contextlib.closing(open_decompressed(tar_path, raw)) as stream, \
+                    tarfile.open(fileobj=stream, mode=mode) as tar:
+                for member in tar:
+                    if member.isfile() and member.name.removeprefix('./') == MANIFEST_NAME:
+                        manifest = json.load(tar.extractfile(member))
+                        break
+    except (tarfile.TarError, EOFError, zlib.error, lzma.LZMAError) as e:
+        raise ValueError(f"Unreadable image archive {tar_path}: {e}") from e
+    if manifest is None:
+        raise ValueError(f"No {MANIFEST_NAME} in {tar_path}")
+    return parse_manifest(manifest, tar_path)
+
+
+def _pax_records(data):
+    """{key: value} of the '<length> <key>=<value>' records of a PAX extended header."""
+    records = {}
+    pos = 0
+    while pos < len(data):
+        length, sep, _ = data[pos:pos + 20].partition(b' ')
+        if not sep or not length.isdigit() or int(length) <= len(length) + 1:
+            break
+        key, _, value = data[pos + len(length) + 1:pos + int(length) - 1].partition(b'=')
+        records[key.decode('utf-8', 'replace')] = value.decode('utf-8', 'surrogateescape')
+        pos += int(length)
+    return records
+
+
+class ManifestTap:
+    """
+    Picks manifest.json out of an uncompressed tar stream while the stream goes elsewhere,
+    e.g. into docker load, so a compressed archive is decompressed only once.
+
+    Only the 512-byte member headers are parsed; member data is passed over by offset,
+    except for manifest.json itself and the PAX / GNU long-name headers that rename or
+    resize the next member. Feeding stops at the manifest or at the end of the archive.
+    """
+    def __init__(self):
+        self.header = bytearray()
+        self.skip = 0  # data and padding bytes of the current member still to pass
+        self.keep = None  # data of the current member, when it is needed
+        self.keep_size = 0
+        self.keep_type = None
+        self.next_member = {}  # 'path' / 'size' overrides for the next member
+        self.manifest = None  # raw manifest.json once seen
+        self.done = False
+
+    def feed(self, chunk):
+        pos, end = 0, len(chunk)
+        while pos < end and not self.done:
+            if self.skip:
+                take = min(self.skip, end - pos)
+                if self.keep is not None and len(self.keep) < self.keep_size:
+                    self.keep += chunk[pos:pos + min(take, self.keep_size - len(self.keep))]
+                pos += take
+                self.skip -= take
+                if not self.skip and self.keep is not None:
+                    self._member_done()
+                continue
+            take = min(TAR_BLOCK - len(self.header), end - pos)
+            self.header += chunk[pos:pos + take]
+            pos += take
+            if len(self.header) == TAR_BLOCK:
+                self._read_header(bytes(self.header))
+                self.header.clear()
+
+    def _read_header(self, block):
+        try:
+            info = tarfile.TarInfo.frombuf(block, 'utf-8', 'surrogateescape')
+        except tarfile.HeaderError:
+            # End-of-archive block, or not a tar we understand; docker load reports the latter.
+            self.done = True
+            return
+        if info.type in (tarfile.XHDTYPE, tarfile.GNUTYPE_LONGNAME):
+            wanted = True
+        else:
+            overrides, self.next_member = self.next_member, {}
+            info.name = overrides.get('path', info.name)
+            info.size = int(overrides.get('size', info.size))
+            wanted = info.isreg() and info.name.removeprefix('./') == MANIFEST_NAME
+        size = 0 if info.type in _NO_DATA_TYPES else info.size
+        self.skip = -(-size // TAR_BLOCK) * TAR_BLOCK
+        if wanted:
+            self.keep, self.keep_size, self.keep_type = bytearray(), size, info.type
+            if not size:
+                self._member_done()
+
+    def _member_done(self):
+        data, self.keep = bytes(self.keep), None
+        if self.keep_type == tarfile.XHDTYPE:
+            self.next_member.update(_pax_records(data))
+        elif self.keep_type == tarfile.GNUTYPE_LONGNAME:
+            self.next_member['path'] = data.rstrip(b'\0').decode('utf-8', 'surrogateescape')
+        else:
+            self.manifest = data
+            self.done = True
+
+    def images(self, tar_path):
+        """
+        The images of the captured manifest.json.
+
+        Raises:
+            ValueError: If no usable manifest went through the stream.
+        """
+        if self.manifest is None:
+            raise ValueError(f"No {MANIFEST_NAME} in {tar_path}")
+        return parse_manifest(json.loads(self.manifest), tar_path)
+
+
+def _archive_signature(tar_path):
+    st = os.stat(tar_path)
+    return {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'inode': st.st_ino}
+
+
+def _read_manifest_index(index_path):
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        return index if isinstance(index, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def cached_archive_manifest(tar_path, scan=True):
+    """
+    Same as read_archive_manifest, memoized in '.manifest-index.json' next to the archives.
+    Entries are validated against the archive's mtime, size and inode, so a compressed
+    archive is only scanned once per version of the file. With scan=False an archive that
+    is not in the index is not read, and None is returned.
+    """
+    index_path = os.path.join(os.path.dirname(tar_path), MANIFEST_INDEX_FILENAME)
+    entry = _read_manifest_index(index_path).get(os.path.basename(tar_path))
+    if entry and entry.get('signature') == _archive_signature(tar_path):
+        return entry['images']
+    if not scan:
+        return None
+
+    images = read_archive_manifest(tar_path)
+    store_archive_manifest(tar_path, images)
+    return images
+
+
+def store_archive_manifest(tar_path, images):
+    """Records the images of an archive in '.manifest-index.json', e.g. after ManifestTap read them."""
+    index_path = os.path.join(os.path.dirname(tar_path), MANIFEST_INDEX_FILENAME)
+    index = _read_manifest_index(index_path)
+    index[os.path.basename(tar_path)] = {'signature': _archive_signature(tar_path), 'images': images}
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, index_path)
+    except OSError as e:
+        logging.debug(f"Could not write archive manifest index {index_path}: {e}")
+
+
+def pick_image(images, target):
+    """Returns the manifest entry tagged as `target`, or the first one if none carries that tag."""
+    for image in images:
+        if target in image['repo_tags']:
+            return image
+    return images[0]
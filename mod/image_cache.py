@@ -0,0 +1,84 @@
+# Copyright (c) 2025 Innodisk Corp.
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+import os
+import json
+import time
+import logging
+import threading
+
+DEFAULT_TTL = 300
+
+
+def default_cache_path():
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'iqs', 'images.json')
+
+
+class IMAGE_CACHE:
+    """
+    Short-lived on-disk cache of image reference (repo:tag) -> image ID.
+
+    Entries expire after `ttl` seconds (IQS_IMAGE_CACHE_TTL, default 300), so
+    repeated launches of the same app within that window skip the full lookup. Callers
+    confirm a hit with the daemon where that is cheap and drop() entries that are gone.
+    """
+    def __init__(self, path=None, ttl=None):
+        self.path = path or default_cache_path()
+        if ttl is None:
+            try:
+                ttl = float(os.environ.get('IQS_IMAGE_CACHE_TTL', DEFAULT_TTL))
+            except ValueError:
+                ttl = DEFAULT_TTL
+        self.ttl = ttl
+        self._entries = None
+        self._lock = threading.RLock()
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+                if not isinstance(self._entries, dict):
+                    self._entries = {}
+            except FileNotFoundError:
+                self._entries = {}
+            except (OSError, ValueError) as e:
+                logging.debug(f"Ignoring unreadable image cache {self.path}: {e}")
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        now = time.time()
+        entries = {ref: entry for ref, entry in self._load().items() if now - entry.get('time', 0) < self.ttl}
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logging.debug(f"Could not write image cache {self.path}: {e}")
+
+    def get(self, ref):
+        """Returns the cached image ID for a reference, or None if unknown or expired."""
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._load().get(ref)
+        if entry and time.time() - entry.get('time', 0) < self.ttl:
+            return entry.get('id')
+        return None
+
+    def put(self, ref, image_id):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._load()[ref] = {'id': image_id, 'time': time.time()}
+            self._save()
+
+    def drop(self, ref):
+        with self._lock:
+            if self._load().pop(ref, None) is not None:
+                self._save()
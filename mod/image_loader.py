@@ -0,0 +1,137 @@
+# Copyright (c) 2025 Innodisk Corp.
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+import os
+import time
+import contextlib
+import subprocess
+import logging
+from mod.image_archive import open_decompressed
+
+CHUNK_SIZE = 1 << 20
+PROGRESS_INTERVAL = 2.0
+MB = 1024 * 1024
+
+
+class _ProgressReader:
+    """File wrapper that counts the bytes read from disk and periodically logs throughput and ETA."""
+    def __init__(self, fileobj, total, label):
+        self.fileobj = fileobj
+        self.total = total
+        self.label = label
+        self.done = 0
+        self.start = time.monotonic()
+        self.last_report = self.start
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        self.done += len(data)
+        now = time.monotonic()
+        if now - self.last_report >= PROGRESS_INTERVAL:
+            self.last_report = now
+            self.report()
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def readable(self):
+        return True
+
+    def close(self):
+        self.fileobj.close()
+
+    def rate(self):
+        elapsed = time.monotonic() - self.start
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def report(self, final=False):
+        rate = self.rate()
+        if final:
+            logging.info(f"Loaded {self.label}: {self.done / MB:.1f} MB in {time.monotonic() - self.start:.1f} s ({rate / MB:.1f} MB/s)")
+            return
+        percent = self.done / self.total * 100 if self.total else 0.0
+        eta = (self.total - self.done) / rate if rate > 0 else float('inf')
+        eta_text = f"{eta:.0f} s" if eta != float('inf') else '?'
+        logging.info(f"Loading {self.label}: {self.done / MB:.1f}/{self.total / MB:.1f} MB ({percent:.0f}%), "
+                     f"{rate / MB:.1f} MB/s, ETA {eta_text}")
+
+
+def _iter_chunks(stream, size=CHUNK_SIZE, tap=None):
+    while (chunk := stream.read(size)):
+        if tap and not tap.done:
+            tap.feed(chunk)
+        yield chunk
+
+
+def parse_loaded(messages):
+    """
+    Extracts what docker load reported, from lines like 'Loaded image: repo:tag' or
+    'Loaded image ID: sha256:...'.
+    """
+    loaded = []
+    for message in messages:
+        for line in message.splitlines():
+            for prefix in ('Loaded image ID:', 'Loaded image:'):
+                if line.startswith(prefix):
+                    loaded.append(line[len(prefix):].strip())
+                    break
+    return loaded
+
+
+def _load_with_cli(chunks):
+    proc = subprocess.Popen(['docker', 'load'], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=False)
+    try:
+        for chunk in chunks:
+            proc.stdin.write(chunk)
+    except BrokenPipeError:
+        pass
+    finally:
+        proc.stdin.close()
+    output = proc.stdout.read().decode('utf-8', errors='replace')
+    if proc.wait() != 0:
+        raise subprocess.CalledProcessError(proc.returncode, ['docker', 'load'], output)
+    return [output]
+
+
+def load_stream(chunks, engine):
+    """
+    Sends an uncompressed image tar, given as an iterable of bytes, to the Docker daemon:
+    to the Engine API load endpoint when the socket is accessible, to 'docker load' otherwise.
+
+    Returns:
+        list: Image references or IDs reported as loaded.
+    """
+    if engine.available():
+        return parse_loaded(engine.load_image(chunks))
+    return parse_loaded(_load_with_cli(chunks))
+
+
+def load_archive(path, engine, tap=None):
+    """
+    Streams an image archive (.tar, .tar.gz/.tgz, .tar.zst or .tar.xz) into the Docker daemon.
+
+    The archive is decompressed on the fly and sent in CHUNK_SIZE pieces, to the Engine API
+    load endpoint when the socket is accessible or to 'docker load' on stdin otherwise, so memory
+    use stays flat whatever the image size. Throughput (MB/s read from disk) and ETA are logged
+    every PROGRESS_INTERVAL seconds. A ManifestTap given as `tap` sees the uncompressed stream
+    on its way to the daemon.
+
+    Raises:
+        OSError: If the archive or the daemon cannot be accessed.
+        ValueError: If the archive format is unsupported.
+        subprocess.CalledProcessError: If 'docker load' fails.
+
+    Returns:
+        list: Image references or IDs reported as loaded.
+    """
+    total = os.path.getsize(path)
+    with open(path, 'rb') as raw:
+        progress = _ProgressReader(raw, total, os.path.basename(path))
+        with contextlib.closing(open_decompressed(path, progress)) as stream:
+            loaded = load_stream(_iter_chunks(stream, tap=tap), engine)
+        progress.report(final=True)
+    return loaded
@@ -3,23 +3,42 @@
 # https://opensource.org/licenses/MIT
 
 import os
+import time
 import subprocess
 import logging
+from mod.opkg_status import OPKG_STATUS
+from mod.utils import compare_versions
 
 class IPK:
     def __init__(self, args, root_path, bsp_version):
         self.args = args
         self.ipk_dir = os.path.normpath(os.path.join(root_path, 'binaries', 'ipk'))
         self.bsp_version = bsp_version
+        self._index = None
+        self.status = OPKG_STATUS()
 
-    def is_installed(self):
+    def is_installed(self, ipk_name=None):
         """
-        Checks if the package is already installed by parsing the output of 'opkg status'.
-        It verifies that the output contains 'Status: install ok installed'.
+        Checks if the package is already installed.
+        The opkg status database is read once into a snapshot shared by all lookups in this run;
+        if no database is found, it falls back to parsing the output of 'opkg status'.
+        Either way it verifies that the package status is 'install ok installed'.
         """
-        ipk_name = self.args.ipk
+        ipk_name = ipk_name or self.args.ipk
         logging.info(f"Checking if package '{ipk_name}' is installed...")
 
+        if self.status.available():
+            try:
+                installed = self.status.is_installed(ipk_name)
+            except OSError as e:
+                logging.warning(f"Could not read opkg status database {self.status.status_file}: {e}")
+            else:
+                if installed:
+                    logging.info(f"Package '{ipk_name}' is already installed.")
+                else:
+                    logging.info(f"Package '{ipk_name}' is not installed or has an invalid status.")
+                return installed
+
         try:
             result = subprocess.run(
                 ['opkg', 'status', ipk_name],
@@ -39,68 +58,94 @@ class IPK:
             logging.error("'opkg' command not found. Unable to check package status.")
             return False
 
-    def find_compatible_path(self):
+    def installed_batch(self, ipk_names):
         """
-        Finds a compatible .ipk file by inspecting its metadata via the 'opkg' command.
-        It checks for a matching package name and a version that corresponds to the system's BSP.
+        Checks several packages against a single snapshot of the opkg status database.
+
+        Returns:
+            dict: {name: bool}, or an empty dict if the database cannot be read, in which case
+                  callers fall back to is_installed() per package.
         """
-        system_bsp = self.bsp_version
+        if not self.status.available():
+            return {}
+        try:
+            installed = self.status.installed(ipk_names)
+        except OSError as e:
+            logging.warning(f"Could not read opkg status database {self.status.status_file}: {e}")
+            return {}
+        for name, ok in installed.items():
+            logging.info(f"Package '{name}' is {'already installed' if ok else 'not installed or has an invalid status'}.")
+        return installed
 
-        search_dir = self.ipk_dir
+    def _is_bsp_compatible(self, version):
+        """A package matches the BSP only if its version equals the BSP version exactly."""
+        return version == self.bsp_version
 
-        if not os.path.isdir(search_dir):
-            logging.error(f"IPK directory does not exist: {search_dir}")
-            return None
+    def _get_index(self):
+        """Builds the IPK metadata index once per run; returns None if the IPK directory is missing."""
+        if self._index is None:
+            if not os.path.isdir(self.ipk_dir):
+                logging.error(f"IPK directory does not exist: {self.ipk_dir}")
+                return None
+            from mod.ipk_index import IPK_INDEX
+            workers = getattr(self.args, 'ipk_workers', 1) or 1
+            self._index = IPK_INDEX(self.ipk_dir, workers=workers)
+            self._index.refresh()
+        return self._index
 
-        for filename in os.listdir(search_dir):
-            if not filename.endswith(".ipk"):
-                continue
+    def _resolve(self, ipk_name):
+        """Returns (full_path, entry) of the compatible archive for a package, or (None, None)."""
+        index = self._get_index()
+        if index is None:
+            return None, None
 
-            full_path = os.path.join(search_dir, filename)
-            logging.info(f"Checking file: {filename}")
+        match = getattr(self.args, 'ipk_match', 'best') or 'best'
+        candidates = [(path, entry) for path, entry in index.lookup(ipk_name)
+                      if self._is_bsp_compatible(entry['version'])]
+        if not candidates:
+            return None, None
 
-            try:
-                # Get Package Name
-                pkg_name_cmd = f"opkg info {full_path} | awk -e '/^Package:/{{print $2}}'"
-                ipk_name_result = subprocess.run(
-                    ['sh', '-c', pkg_name_cmd],
-                    check=True, capture_output=True, text=True, encoding='utf-8'
-                )
-                ipk_name = ipk_name_result.stdout.strip()
-
-                # Get Version (BSP)
-                version_cmd = f"opkg info {full_path} | awk -e '/^Version:/{{print $2}}'"
-                ipk_version_result = subprocess.run(
-                    ['sh', '-c', version_cmd],
-                    check=True, capture_output=True, text=True, encoding='utf-8'
-                )
-                ipk_bsp_version = ipk_version_result.stdout.strip()
-
-                # Compare
-                if ipk_name == self.args.ipk and ipk_bsp_version == system_bsp:
-                    logging.info(f"Found compatible IPK: {filename} (Package: {ipk_name}, BSP: {ipk_bsp_version})")
-                    return full_path
-
-            except (subprocess.CalledProcessError, FileNotFoundError) as e:
-                logging.debug(f"Could not get info from {filename} or it's not a match: {e}")
-                continue
+        full_path, entry = candidates[0]
+        if match == 'best':
+            for path, other in candidates[1:]:
+                if compare_versions(other['version'], entry['version']) > 0:
+                    full_path, entry = path, other
+        return full_path, entry
 
-        logging.error(f"Could not find any package '{self.args.ipk}' compatible with system BSP '{system_bsp}' in {search_dir}")
+    def find_compatible_path(self, ipk_name=None):
+        """
+        Finds a compatible .ipk file by looking up the package in the IPK metadata index.
+        It checks for a matching package name and a version that corresponds to the system's BSP.
+        Only archives that are new or changed since the last run are inspected, using up to
+        '--ipk-workers' threads.
+
+        With '--ipk-match best' the highest compatible version wins (ties keep file name order); with
+        'first' the first compatible archive in file name order is used. Both are independent of scan order.
+        """
+        ipk_name = ipk_name or self.args.ipk
+        full_path, entry = self._resolve(ipk_name)
+        if full_path:
+            match = getattr(self.args, 'ipk_match', 'best') or 'best'
+            logging.info(f"Found compatible IPK: {os.path.basename(full_path)} (Package: {entry['package']}, BSP: {entry['version']}, match: {match})")
+            return full_path
+
+        logging.error(f"Could not find any package '{ipk_name}' compatible with system BSP '{self.bsp_version}' in {self.ipk_dir}")
         return None
 
-    def install(self, file_path):
-        """Installs the .ipk file at the given path."""
-        if not file_path:
+    def install(self, *file_paths):
+        """Installs the .ipk files at the given paths with a single 'opkg install' call."""
+        if not file_paths or not all(file_paths):
             logging.error("No installation archive path provided.")
             return False
-            
-        logging.info(f"Ready to install: {file_path}")
+
+        logging.info(f"Ready to install: {' '.join(file_paths)}")
         try:
             subprocess.run(
-                ['opkg', 'install', file_path],
+                ['opkg', 'install', *file_paths],
                 check=True, capture_output=True, text=True
             )
-            logging.info(f"The package {os.path.basename(file_path)} was installed successfully.")
+            for file_path in file_paths:
+                logging.info(f"The package {os.path.basename(file_path)} was installed successfully.")
             return True
         except FileNotFoundError:
             logging.error("'opkg' directive does not exist.")
@@ -108,4 +153,118 @@ class IPK:
         except subprocess.CalledProcessError as e:
             logging.error(f"Package installation failed. Return code: {e.returncode}")
             logging.error(f"Error message:\n{e.stderr}")
-            return False
\ No newline at end of file
+            return False
+
+    @staticmethod
+    def _install_order(resolved, requested):
+        """
+        Topologically sorts the resolved packages by their 'Depends:' so dependencies come first.
+        Ties keep the requested order; packages caught in a dependency cycle are appended as-is.
+        """
+        names = [name for name in dict.fromkeys(requested) if name in resolved]
+        pending = {name: {dep for group in resolved[name][1]['depends'] for dep in group
+                          if dep in resolved and dep != name}
+                   for name in names}
+        order = []
+        while pending:
+            ready = [name for name in names if name in pending and not pending[name]]
+            if not ready:
+                cycle = [name for name in names if name in pending]
+                logging.warning(f"Dependency cycle between {', '.join(cycle)}; installing in requested order.")
+                order.extend(cycle)
+                break
+            for name in ready:
+                order.append(name)
+                del pending[name]
+            for deps in pending.values():
+                deps.difference_update(ready)
+        return order
+
+    def install_packages(self, ipk_names):
+        """
+        Installs a batch of packages in as few 'opkg install' calls as possible.
+
+        Each package is resolved against the system BSP; missing dependencies that are available
+        as compatible local archives are pulled into the batch. Archives are passed to a single
+        'opkg install' in dependency order. If that transaction fails, packages are retried one by
+        one in the same order so the failing one can be identified.
+
+        Returns:
+            list: The requested packages that are installed at the end, in install order.
+        """
+        timings = {name: {} for name in ipk_names}
+        ready = []
+        resolved = {}
+        order_hint = list(ipk_names)
+
+        # The requested packages are checked in one pass; dependencies added below are checked one by one.
+        start = time.perf_counter()
+        known = self.installed_batch(list(dict.fromkeys(ipk_names)))
+        elapsed = time.perf_counter() - start
+        for name in known:
+            timings[name]['status'] = elapsed / len(known)
+
+        queue = list(ipk_names)
+        while queue:
+            name = queue.pop(0)
+            if name in resolved or name in ready:
+                continue
+            timings.setdefault(name, {})
+
+            if name in known:
+                installed = known[name]
+            else:
+                start = time.perf_counter()
+                installed = self.is_installed(name)
+                timings[name]['status'] = time.perf_counter() - start
+            if installed:
+                ready.append(name)
+                continue
+
+            start = time.perf_counter()
+            full_path, entry = self._resolve(name)
+            timings[name]['resolve'] = time.perf_counter() - start
+            if not full_path:
+                logging.error(f"Could not find any package '{name}' compatible with system BSP '{self.bsp_version}' in {self.ipk_dir}")
+                continue
+            resolved[name] = (full_path, entry)
+
+            for group in entry['depends']:
+                if any(dep in resolved or dep in ready for dep in group):
+                    continue
+                local = [dep for dep in group if self._resolve(dep)[0]]
+                if local and local[0] not in queue:
+                    logging.info(f"Adding dependency '{local[0]}' of '{name}' to the batch.")
+                    queue.append(local[0])
+                    order_hint.append(local[0])
+
+        order = self._install_order(resolved, order_hint)
+        batched = False
+        if order:
+            logging.info(f"Install order: {' -> '.join(order)}")
+            start = time.perf_counter()
+            ok = self.install(*(resolved[name][0] for name in order))
+            elapsed = time.perf_counter() - start
+            if ok:
+                batched = True
+                for name in order:
+                    timings[name]['install'] = elapsed
+                ready.extend(order)
+            else:
+                logging.warning("Batch installation failed; retrying packages one by one.")
+                for name in order:
+                    start = time.perf_counter()
+                    if self.install(resolved[name][0]):
+                        ready.append(name)
+                    timings[name]['install'] = time.perf_counter() - start
+
+        logging.info("--- IPK timing summary (ms) ---")
+        logging.info(f"{'Package':<32} {'status':>8} {'resolve':>8} {'install':>8}  result")
+        for name, phases in timings.items():
+            cells = ' '.join(f"{phases[p] * 1000:>8.1f}" if p in phases else f"{'-':>8}"
+                             for p in ('status', 'resolve', 'install'))
+            logging.info(f"{name:<32} {cells}  {'ok' if name in ready else 'FAILED'}")
+        if batched and len(order) > 1:
+            logging.info(f"(install time is shared by the {len(order)} packages of one opkg transaction)")
+
+        return [name for name in ready if name in ipk_names]
@@ -0,0 +1,122 @@
+# Copyright (c) 2025 Innodisk Corp.
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+import io
+import gzip
+import lzma
+import zlib
+import tarfile
+from mod.utils import zstd_decompress
+
+AR_MAGIC = b'!<arch>\n'
+AR_HEADER_SIZE = 60
+GZIP_MAGIC = b'\x1f\x8b'
+XZ_MAGIC = b'\xfd7zXZ\x00'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+def parse_control_fields(text):
+    """
+    Parses a Debian-style control paragraph into a dict.
+    Continuation lines (starting with whitespace) are appended to the previous field.
+    """
+    fields = {}
+    key = None
+    for line in text.splitlines():
+        if not line.strip():
+            if fields:
+                break
+            continue
+        if line[0] in ' \t' and key:
+            fields[key] += '\n' + line.strip()
+            continue
+        name, sep, value = line.partition(':')
+        if not sep:
+            continue
+        key = name.strip()
+        fields[key] = value.strip()
+    return fields
+
+
+def _decompress(data):
+    """Decompresses a control tarball according to its magic bytes (gzip, xz, zstd or plain tar)."""
+    try:
+        if data.startswith(GZIP_MAGIC):
+            return gzip.decompress(data)
+        if data.startswith(XZ_MAGIC):
+            return lzma.decompress(data)
+        if data.startswith(ZSTD_MAGIC):
+            return zstd_decompress(data)
+    except (OSError, EOFError, zlib.error, lzma.LZMAError) as e:
+        raise ValueError(f"Corrupt control tarball: {e}") from e
+    return data
+
+
+def _control_from_tarball(data):
+    """Extracts the 'control' file from an (optionally compressed) control tarball."""
+    try:
+        with tarfile.open(fileobj=io.BytesIO(_decompress(data)), mode='r:') as tar:
+            for member in tar:
+                if member.isfile() and member.name.removeprefix('./') == 'control':
+                    return tar.extractfile(member).read().decode('utf-8', errors='replace')
+    except tarfile.TarError as e:
+        raise ValueError(f"Corrupt control tarball: {e}") from e
+    raise ValueError("No control file in control tarball")
+
+
+def _control_member_from_ar(f):
+    """Walks the ar members header by header and returns the raw control tarball, skipping the rest."""
+    while True:
+        header = f.read(AR_HEADER_SIZE)
+        if not header:
+            break
+        if len(header) != AR_HEADER_SIZE or header[58:60] != b'`\n':
+            raise ValueError("Malformed ar member header")
+        name = header[0:16].decode('ascii', errors='replace').strip().rstrip('/')
+        size = int(header[48:58].decode('ascii').strip() or 0)
+        if name.startswith('control.tar'):
+            data = f.read(size)
+            if len(data) != size:
+                raise ValueError("Truncated control member")
+            return data
+        f.seek(size + (size & 1), io.SEEK_CUR)
+    raise ValueError("No control tarball in ar archive")
+
+
+def _control_member_from_tar(f):
+    """Handles the legacy opkg layout where the outer container is a gzip'd tar instead of ar."""
+    try:
+        with tarfile.open(fileobj=f, mode='r|*') as tar:
+            for member in tar:
+                if member.isfile() and member.name.removeprefix('./').startswith('control.tar'):
+                    return tar.extractfile(member).read()
+    except (tarfile.TarError, OSError, EOFError, zlib.error) as e:
+        raise ValueError(f"Corrupt ipk archive: {e}") from e
+    raise ValueError("No control tarball in ipk archive")
+
+
+def read_control(path):
+    """
+    Reads the control fields of an .ipk file in-process.
+
+    Only the control member is read and decompressed; the data tarball is
+    skipped without being touched.
+
+    Raises:
+        OSError: If the file cannot be read.
+        ValueError: If the file is not a valid ipk archive.
+
+    Returns:
+        dict: The control fields, e.g. {'Package': ..., 'Version': ..., ...}.
+    """
+    with open(path, 'rb') as f:
+        magic = f.read(len(AR_MAGIC))
+        if magic == AR_MAGIC:
+            data = _control_member_from_ar(f)
+        elif magic.startswith(GZIP_MAGIC):
+            f.seek(0)
+            data = _control_member_from_tar(f)
+        else:
+            raise ValueError("Not an ipk archive")
+    return parse_control_fields(_control_from_tarball(data))
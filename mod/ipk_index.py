@@ -0,0 +1,156 @@
+# Copyright (c) 2025 Innodisk Corp.
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+import os
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from mod.ipk_control import read_control
+
+INDEX_FILENAME = '.ipk-index.json'
+INDEX_FORMAT = 1
+
+
+def parse_depends(value):
+    """
+    Splits a 'Depends:' value into groups of alternatives, dropping version constraints.
+    e.g. "libc6 (>= 2.3), foo | bar" -> [["libc6"], ["foo", "bar"]]
+    """
+    groups = []
+    for group in (value or '').split(','):
+        names = [alt.split('(', 1)[0].strip() for alt in group.split('|')]
+        names = [name for name in names if name]
+        if names:
+            groups.append(names)
+    return groups
+
+
+class IPK_INDEX:
+    """
+    On-disk index of the .ipk archives in a directory.
+
+    Each entry is keyed by file name and validated against the archive's
+    mtime, size and inode, so a refresh only inspects new or changed files.
+    """
+    def __init__(self, ipk_dir, index_path=None, workers=1):
+        self.ipk_dir = ipk_dir
+        self.index_path = index_path or os.path.join(ipk_dir, INDEX_FILENAME)
+        self.workers = max(1, workers)
+        self.entries = {}
+        self.by_package = {}
+        self.timings = {}
+
+    def _load(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable IPK index {self.index_path}: {e}")
+            return {}
+        if not isinstance(data, dict) or data.get('format') != INDEX_FORMAT:
+            return {}
+        return data.get('entries', {})
+
+    def _save(self):
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'format': INDEX_FORMAT, 'entries': self.entries}, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            logging.warning(f"Could not write IPK index {self.index_path}: {e}")
+
+    @staticmethod
+    def _signature(st):
+        return {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'inode': st.st_ino}
+
+    def _inspect(self, full_path):
+        """Reads the control fields of one archive in-process, without spawning opkg."""
+        return read_control(full_path)
+
+    def _make_entry(self, signature, fields):
+        entry = {
+            'package': fields.get('Package', ''),
+            'version': fields.get('Version', ''),
+            'architecture': fields.get('Architecture', ''),
+            'depends': parse_depends(fields.get('Depends')),
+        }
+        entry.update(signature)
+        return entry
+
+    def _timed_inspect(self, full_path):
+        start = time.perf_counter()
+        try:
+            return self._inspect(full_path), None, time.perf_counter() - start
+        except (OSError, ValueError) as e:
+            return None, e, time.perf_counter() - start
+
+    def refresh(self):
+        """
+        Brings the index up to date with the directory contents.
+        Unchanged archives are taken from the on-disk index; only new or modified ones are inspected,
+        using up to `workers` threads. Results are merged in file name order, so the index does not
+        depend on the order in which workers finish.
+        """
+        cached = self._load()
+        entries = {}
+        stale = []
+
+        for filename in sorted(os.listdir(self.ipk_dir)):
+            if not filename.endswith('.ipk'):
+                continue
+            full_path = os.path.join(self.ipk_dir, filename)
+            try:
+                signature = self._signature(os.stat(full_path))
+            except OSError as e:
+                logging.debug(f"Could not stat {filename}: {e}")
+                continue
+
+            entry = cached.get(filename)
+            if entry and all(entry.get(k) == v for k, v in signature.items()):
+                entries[filename] = entry
+            else:
+                stale.append((filename, signature))
+
+        self.timings = {}
+        if stale:
+            logging.info(f"Indexing {len(stale)} IPK archive(s) with {min(self.workers, len(stale))} worker(s)...")
+            paths = [os.path.join(self.ipk_dir, filename) for filename, _ in stale]
+            if self.workers > 1 and len(stale) > 1:
+                with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                    results = list(pool.map(self._timed_inspect, paths))
+            else:
+                results = [self._timed_inspect(path) for path in paths]
+
+            for (filename, signature), (fields, error, elapsed) in zip(stale, results):
+                self.timings[filename] = elapsed
+                logging.info(f"Indexed file: {filename} ({elapsed * 1000:.1f} ms)")
+                if error is not None:
+                    logging.debug(f"Could not get info from {filename}: {error}")
+                    continue
+                entries[filename] = self._make_entry(signature, fields)
+            entries = dict(sorted(entries.items()))
+
+            slowest = max(self.timings, key=self.timings.get)
+            logging.info(f"Indexed {len(stale)} archive(s) in {sum(self.timings.values()):.2f} s of worker time "
+                         f"(slowest: {slowest}, {self.timings[slowest] * 1000:.1f} ms)")
+
+        self.entries = entries
+        if stale or entries.keys() != cached.keys():
+            self._save()
+
+        self.by_package = {}
+        for filename, entry in entries.items():
+            self.by_package.setdefault(entry['package'], []).append(filename)
+        return self.entries
+
+    def path_of(self, filename):
+        return os.path.join(self.ipk_dir, filename)
+
+    def lookup(self, package):
+        """Returns (full_path, entry) pairs for every indexed archive providing the given package."""
+        return [(self.path_of(filename), self.entries[filename]) for filename in self.by_package.get(package, [])]
@@ -0,0 +1,96 @@
+# Copyright (c) 2025 Innodisk Corp.
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+import os
+import glob
+import logging
+from mod.ipk_control import parse_control_fields
+
+DEFAULT_STATUS_FILE = '/var/lib/opkg/status'
+OPKG_CONF_FILES = ['/etc/opkg/opkg.conf', '/etc/opkg.conf']
+OPKG_CONF_GLOB = '/etc/opkg/*.conf'
+
+# status file path -> (mtime_ns, size, {package: fields}); shared by every OPKG_STATUS in the process
+_SNAPSHOTS = {}
+
+
+def find_status_file():
+    """
+    Locates the opkg status database.
+    The IQS_OPKG_STATUS environment variable wins, then an 'option status_file' entry
+    in the opkg configuration, then the default /var/lib/opkg/status.
+    """
+    if os.environ.get('IQS_OPKG_STATUS'):
+        return os.environ['IQS_OPKG_STATUS']
+
+    conf_files = OPKG_CONF_FILES + sorted(glob.glob(OPKG_CONF_GLOB))
+    for conf in dict.fromkeys(conf_files):
+        try:
+            with open(conf, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 3 and parts[0] == 'option' and parts[1] == 'status_file':
+                        return parts[2]
+        except OSError:
+            continue
+    return DEFAULT_STATUS_FILE
+
+
+def parse_status(text):
+    """Parses an opkg status database into {package: fields}."""
+    packages = {}
+    for paragraph in text.split('\n\n'):
+        fields = parse_control_fields(paragraph)
+        if 'Package' in fields:
+            packages[fields['Package']] = fields
+    return packages
+
+
+class OPKG_STATUS:
+    """
+    In-memory snapshot of the opkg status database.
+
+    The database is read once and reused for every lookup; a lookup only costs a
+    stat() to notice that opkg rewrote the file (e.g. after an install), in which
+    case the snapshot is reloaded.
+    """
+    def __init__(self, status_file=None):
+        self.status_file = status_file or find_status_file()
+
+    def available(self):
+        return os.path.isfile(self.status_file)
+
+    def packages(self):
+        """
+        Returns the {package: fields} map, reloading it if the database changed.
+
+        Raises:
+            OSError: If the status database cannot be read.
+        """
+        st = os.stat(self.status_file)
+        snapshot = _SNAPSHOTS.get(self.status_file)
+        if snapshot and snapshot[0] == st.st_mtime_ns and snapshot[1] == st.st_size:
+            return snapshot[2]
+
+        with open(self.status_file, 'r', encoding='utf-8', errors='replace') as f:
+            packages = parse_status(f.read())
+        _SNAPSHOTS[self.status_file] = (st.st_mtime_ns, st.st_size, packages)
+        logging.debug(f"Loaded {len(packages)} package(s) from {self.status_file}")
+        return packages
+
+    @staticmethod
+    def _is_installed_status(status):
+        # e.g. "install ok installed" or "hold ok installed"
+        parts = status.split()
+        return len(parts) == 3 and parts[1] == 'ok' and parts[2] == 'installed'
+
+    def is_installed(self, ipk_name):
+        fields = self.packages().get(ipk_name)
+        return bool(fields) and self._is_installed_status(fields.get('Status', ''))
+
+    def installed(self, ipk_names):
+        """Batch check: returns {name: bool} from a single snapshot."""
+        packages = self.packages()
+        return {name: name in packages and self._is_installed_status(packages[name].get('Status', ''))
+                for name in ipk_names}
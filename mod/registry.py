@@ -0,0 +1,191 @@
+# Copyright (c) 2025 Innodisk Corp.
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+import os
+import json
+import time
+import base64
+import logging
+import subprocess
+from urllib.parse import urlsplit
+from mod.image_loader import MB
+
+DEFAULT_REGISTRY = 'docker.io'
+DOCKER_HUB_AUTH_KEY = 'https://index.docker.io/v1/'
+PROGRESS_INTERVAL = 2.0
+CREDENTIAL_HELPER_TIMEOUT = 30
+
+
+def registry_host(repo):
+    """Registry host of a repository name, e.g. 'myhost:5000' for 'myhost:5000/app' and Docker Hub for 'innodiskorg/app'."""
+    first, sep, _ = repo.partition('/')
+    if sep and ('.' in first or ':' in first or first == 'localhost'):
+        return first
+    return DEFAULT_REGISTRY
+
+
+def mirror_host(mirror):
+    """'myhost:5000' for a mirror given as 'http://myhost:5000/' or 'myhost:5000'."""
+    mirror = mirror.strip().rstrip('/')
+    return urlsplit(mirror).netloc if '://' in mirror else mirror
+
+
+def docker_config_path():
+    config_dir = os.environ.get('DOCKER_CONFIG') or os.path.join(os.path.expanduser('~'), '.docker')
+    return os.path.join(config_dir, 'config.json')
+
+
+def load_credentials(host):
+    """
+    Looks up the login for a registry the way the docker CLI does: a credential helper
+    ('credHelpers' or 'credsStore') first, then the base64 'auths' entry of ~/.docker/config.json.
+
+    Returns:
+        tuple: (username, password, server address), or None if there is no login for the registry.
+    """
+    key = DOCKER_HUB_AUTH_KEY if host == DEFAULT_REGISTRY else host
+    try:
+        with open(docker_config_path(), 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    helper = (config.get('credHelpers') or {}).get(key) or config.get('credsStore')
+    if helper:
+        try:
+            result = subprocess.run([f'docker-credential-{helper}', 'get'], input=key, capture_output=True,
+                                    text=True, check=True, timeout=CREDENTIAL_HELPER_TIMEOUT)
+            data = json.loads(result.stdout)
+            return data['Username'], data['Secret'], key
+        except (OSError, subprocess.SubprocessError, ValueError, KeyError) as e:
+            logging.debug(f"No credentials for {key} from docker-credential-{helper}: {e}")
+
+    entry = (config.get('auths') or {}).get(key) or {}
+    if entry.get('auth'):
+        try:
+            username, _, password = base64.b64decode(entry['auth']).decode('utf-8').partition(':')
+        except ValueError:
+            logging.debug(f"Ignoring malformed credentials for {key} in {docker_config_path()}")
+            return None
+        return username, password, key
+    return None
+
+
+def registry_auth_header(host):
+    """The X-Registry-Auth header value for a registry, or None to pull anonymously."""
+    credentials = load_credentials(host)
+    if not credentials:
+        return None
+    username, password, server = credentials
+    payload = json.dumps({'username': username, 'password': password, 'serveraddress': server})
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+class _PullProgress:
+    """Follows the daemon's per-layer pull messages and logs bytes and throughput per layer and overall."""
+    def __init__(self, label):
+        self.label = label
+        self.layers = {}
+        self.start = time.monotonic()
+        self.last_report = self.start
+
+    def update(self, message):
+        layer_id = message.get('id')
+        status = message.get('status', '')
+        if not layer_id or status.startswith('Pulling from'):
+            return
+        layer = self.layers.setdefault(layer_id, {'current': 0, 'total': 0, 'start': None, 'end': None})
+        detail = message.get('progressDetail') or {}
+        if status == 'Downloading':
+            if layer['start'] is None:
+                layer['start'] = time.monotonic()
+            layer['current'] = detail.get('current', layer['current'])
+            layer['total'] = detail.get('total', layer['total'])
+        elif status == 'Download complete':
+            layer['end'] = time.monotonic()
+            layer['current'] = layer['total'] = max(layer['current'], layer['total'])
+            elapsed = layer['end'] - (layer['start'] or layer['end'])
+            rate = layer['current'] / elapsed if elapsed > 0 else 0.0
+            logging.info(f"Layer {layer_id}: {layer['current'] / MB:.1f} MB in {elapsed:.1f} s ({rate / MB:.1f} MB/s)")
+        elif status == 'Already exists':
+            layer['end'] = time.monotonic()
+            logging.info(f"Layer {layer_id}: already present")
+
+        now = time.monotonic()
+        if now - self.last_report >= PROGRESS_INTERVAL:
+            self.last_report = now
+            self.report(now)
+
+    def report(self, now):
+        done = sum(layer['current'] for layer in self.layers.values())
+        total = sum(layer['total'] for layer in self.layers.values())
+        active = sum(layer['start'] is not None and layer['end'] is None for layer in self.layers.values())
+        rate = done / (now - self.start) if now > self.start else 0.0
+        eta = f"{(total - done) / rate:.0f} s" if rate > 0 else '?'
+        logging.info(f"Pulling {self.label}: {done / MB:.1f}/{total / MB:.1f} MB, "
+                     f"{rate / MB:.1f} MB/s, {active} active layer(s), ETA {eta}")
+
+    def downloaded(self):
+        return sum(layer['current'] for layer in self.layers.values() if layer['start'] is not None)
+
+
+class REGISTRY:
+    """
+    Pulls images into the local daemon.
+
+    The pull goes through the Docker Engine API (POST /images/create), so the daemon's proxy,
+    registry-mirrors, insecure-registries and max-concurrent-downloads settings apply, and it
+    retries and resumes interrupted layer downloads. Logins come from ~/.docker/config.json.
+    Without Engine API access it runs 'docker pull' instead.
+    """
+    def __init__(self, engine, mirror=None):
+        self.engine = engine
+        mirror = mirror or os.environ.get('IQS_REGISTRY_MIRROR')
+        self.mirror = mirror_host(mirror) if mirror else None
+
+    def source(self, repo):
+        """The repository actually pulled: the same name on --registry-mirror, if one is set."""
+        return f"{self.mirror}/{repo}" if self.mirror else repo
+
+    def _pull_with_engine(self, source, tag):
+        progress = _PullProgress(f"{source}:{tag}")
+        for message in self.engine.pull_image(source, tag, auth=registry_auth_header(registry_host(source))):
+            progress.update(message)
+            if not message.get('id') and message.get('status'):
+                logging.info(message['status'])
+        elapsed = time.monotonic() - progress.start
+        downloaded = progress.downloaded()
+        logging.info(f"Pulled {source}:{tag} in {elapsed:.1f} s "
+                     f"({downloaded / MB:.1f} MB, {downloaded / MB / max(elapsed, 1e-6):.1f} MB/s)")
+
+    @staticmethod
+    def _pull_with_cli(source, tag):
+        proc = subprocess.Popen(['docker', 'pull', f"{source}:{tag}"], stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT, text=True)
+        with proc:
+            for line in proc.stdout:
+                if line.strip():
+                    logging.info(line.rstrip())
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, proc.args)
+
+    def pull(self, repo, tag):
+        """
+        Pulls repo:tag, from the mirror if one is configured.
+
+        Raises:
+            OSError: If the daemon cannot be reached or the pull fails.
+            FileNotFoundError: If the Engine API is not accessible and there is no docker CLI.
+            subprocess.CalledProcessError: If 'docker pull' fails.
+
+        Returns:
+            str: The reference that was pulled ('<mirror>/repo:tag' or 'repo:tag').
+        """
+        source = self.source(repo)
+        logging.info(f"Pulling {source}:{tag}...")
+        if self.engine.available():
+            self._pull_with_engine(source, tag)
+        else:
+            self._pull_with_cli(source, tag)
+        return f"{source}:{tag}"
@@ -3,54 +3,221 @@
 # https://opensource.org/licenses/MIT
 
 import os 
+import sys
+import time
+import queue
+import signal
 import subprocess
 import shlex
 import logging
-import json
-import stat
+import threading
+from mod.utils import PHASE_TIMER
+
+SHUTDOWN_GRACE = 10.0
+
+
+def _pump_output(stream, prefix, lock):
+    """Copies a child's output to our stdout line by line, each line tagged with the app name."""
+    out = sys.stdout.buffer
+    for line in iter(stream.readline, b''):
+        if not line.endswith(b'\n'):
+            line += b'\n'
+        with lock:
+            out.write(prefix + line)
+            out.flush()
+    stream.close()
+
+
+def _exit_code(returncode):
+    # Shell convention for children killed by a signal.
+    return 128 - returncode if returncode < 0 else returncode
+
 
 class RUN:
-    def __init__(self, args, root_path):
+    def __init__(self, args, root_path, timer=None):
         self.args = args
         self.root_path = root_path
-        applink_path = os.path.join(root_path, 'tutorials', 'metadata.json')
-        try:
-            with open(applink_path, 'r') as f:
-                self.app_links = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError) as e:
-            logging.error(f"Could not load or parse metadata.json: {e}")
-            self.app_links = {}
+        self.timer = timer or PHASE_TIMER()
+        self._app_index = None
+
+    @property
+    def app_index(self):
+        """The compiled app index is only loaded the first time an app is looked up."""
+        if self._app_index is None:
+            from mod.app_index import APP_INDEX
+            with self.timer.phase('metadata load'):
+                self._app_index = APP_INDEX(self.root_path)
+                try:
+                    self._app_index.load()
+                except (OSError, ValueError) as e:
+                    logging.error(f"Could not load or parse metadata.json: {e}")
+        return self._app_index
+
+    @property
+    def app_links(self):
+        """{app name: compiled entry} for every valid app in metadata.json."""
+        return self.app_index.apps
+
+    def has_component(self, component_name):
+        return component_name in self.app_links
+
+    def get_app(self, component_name):
+        return self.app_links.get(component_name)
 
     def _get_script_path(self, component_name):
-        script_rel_path = self.app_links.get(component_name)
-        if not script_rel_path:
-            raise FileNotFoundError(f"Component '{component_name}' not found in metadata.json")
-        
-        script_path = os.path.normpath(os.path.join(self.root_path, script_rel_path))
-
-        if not os.path.isfile(script_path):
-            raise FileNotFoundError(f"Execution script not found at path: {script_path}")
-        
-        return script_path
-
-    def execute_script(self, component_name, *script_args):
+        # Existence and the execute bit are re-checked against the index with one stat of the script.
+        return self.app_index.script_path(component_name)
+
+    def _build_command(self, component_name, script_args):
+        command = [self._get_script_path(component_name)] + list(script_args)
+        if self.args.other:
+            command.extend(shlex.split(self.args.other))
+        return command
+
+    def execute_script(self, component_name, *script_args, handoff=False):
+        """
+        Runs the app script of a component.
+
+        By default the script runs as a child process and this call waits for it, so further
+        steps (e.g. chained IPK scripts) can follow. With handoff=True the launcher process is
+        replaced by the script via os.execv once everything is resolved: nothing of the Python
+        launcher stays resident and signals reach the script directly. A handoff only returns
+        if exec itself fails, in which case the script is run as a child instead.
+
+        Returns:
+            int: The script's exit code (128 + signal number if it was killed), 1 if it could not be run.
+        """
         if not component_name:
             logging.error("Component name not provided.")
-            return
+            return 1
         try:
-            script_path = self._get_script_path(component_name)
-            
-            # Ensure the script is executable
-            st = os.stat(script_path)
-            if not (st.st_mode & stat.S_IEXEC):
-                logging.info(f"Script at {script_path} is not executable. Adding execute permission.")
-                os.chmod(script_path, st.st_mode | stat.S_IEXEC)
-
-            command = [script_path] + list(script_args)
-            if self.args.other:
-                command.extend(shlex.split(self.args.other))
-
+            # Resolved outside 'exec': the first lookup may load the app index, which has its own phase.
+            command = self._build_command(component_name, script_args)
             logging.info(f"Execute command: {' '.join(command)}")
-            subprocess.run(command, check=True)
-        except (FileNotFoundError, subprocess.CalledProcessError) as e:
+            if handoff:
+                self._handoff(command)
+            with self.timer.phase('exec'):
+                process = subprocess.Popen(command)
+            self.timer.report()
+            with process:
+                if process.wait() != 0:
+                    raise subprocess.CalledProcessError(process.returncode, command)
+        except OSError as e:
             logging.error(f"An error occurred while executing the script for component '{component_name}': {e}")
+            return 1
+        except subprocess.CalledProcessError as e:
+            logging.error(f"An error occurred while executing the script for component '{component_name}': {e}")
+            return _exit_code(e.returncode)
+        return 0
+
+    def _handoff(self, command):
+        """Replaces the current process with the script. Returns only if exec fails."""
+        self.timer.report()
+        logging.info("Handing off to the app script (exec).")
+        for handler in logging.getLogger().handlers:
+            handler.flush()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        try:
+            os.execv(command[0], command)
+        except OSError as e:
+            logging.warning(f"exec handoff failed ({e}); running the script as a child process instead.")
+
+    def execute_many(self, apps):
+        """
+        Runs several app scripts concurrently and waits for all of them.
+
+        Each script's stdout and stderr are forwarded line by line with a '[app]' prefix. Scripts
+        get no terminal input (stdin is /dev/null) and run in their own session, so SIGINT and
+        SIGTERM reach them only through the launcher, which forwards them to every running app. When
+        one app fails, the others are asked to stop (SIGTERM, then SIGKILL after SHUTDOWN_GRACE
+        seconds) so a deployment never keeps running half-broken.
+
+        Args:
+            apps: List of (component_name, script_args) pairs.
+
+        Returns:
+            int: 0 if every app exited cleanly, otherwise the exit code of the first app that failed.
+        """
+        width = max(len(name) for name, _ in apps)
+        lock = threading.Lock()
+        exited = queue.Queue()
+        processes = {}
+        pumps = []
+
+        def stop_all(signum):
+            for proc in processes.values():
+                if proc.poll() is None:
+                    try:
+                        proc.send_signal(signum)
+                    except OSError:
+                        pass
+
+        shutdown = {'since': None, 'killed': False}
+
+        def on_signal(signum, frame):
+            running = sum(proc.poll() is None for proc in processes.values())
+            logging.info(f"Received {signal.Signals(signum).name}, stopping {running} running app(s)...")
+            shutdown['since'] = shutdown['since'] or time.monotonic()
+            stop_all(signum)
+
+        commands = {}
+        for name, script_args in apps:
+            try:
+                commands[name] = self._build_command(name, script_args)
+            except OSError as e:
+                logging.error(f"An error occurred while executing the script for component '{name}': {e}")
+                exited.put((name, None, 127))
+
+        with self.timer.phase('exec'):
+            for name, command in commands.items():
+                try:
+                    logging.info(f"[{name}] Execute command: {' '.join(command)}")
+                    # No terminal: apps would otherwise fight over the shared tty (docker -t puts it into
+                    # raw mode). Own session: terminal signals reach only the launcher, which forwards them once.
+                    proc = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                            stderr=subprocess.STDOUT, start_new_session=True)
+                except OSError as e:
+                    logging.error(f"An error occurred while executing the script for component '{name}': {e}")
+                    exited.put((name, None, 127))
+                    continue
+                processes[name] = proc
+                pump = threading.Thread(target=_pump_output, args=(proc.stdout, f"[{name:<{width}}] ".encode(), lock), daemon=True)
+                pump.start()
+                pumps.append(pump)
+                threading.Thread(target=lambda n=name, p=proc: exited.put((n, p, p.wait())), daemon=True).start()
+        self.timer.report()
+
+        previous = {signum: signal.signal(signum, on_signal) for signum in (signal.SIGINT, signal.SIGTERM)}
+        start = time.monotonic()
+        results = {}
+        failed = None
+        try:
+            while len(results) < len(apps):
+                try:
+                    name, proc, returncode = exited.get(timeout=0.5)
+                except queue.Empty:
+                    if shutdown['since'] and not shutdown['killed'] and time.monotonic() - shutdown['since'] > SHUTDOWN_GRACE:
+                        logging.warning(f"Apps still running after {SHUTDOWN_GRACE:.0f} s, killing them.")
+                        shutdown['killed'] = True
+                        stop_all(signal.SIGKILL)
+                    continue
+                results[name] = (_exit_code(returncode), time.monotonic() - start)
+                if returncode != 0 and failed is None:
+                    failed = name
+                    if not shutdown['since'] and len(results) < len(apps):
+                        logging.error(f"{name} exited with code {_exit_code(returncode)}, stopping the other apps.")
+                        shutdown['since'] = time.monotonic()
+                        stop_all(signal.SIGTERM)
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+            for pump in pumps:
+                pump.join(timeout=1.0)
+
+        logging.info("--- App exit summary ---")
+        logging.info(f"{'App':<24} {'Exit':>4} {'Time (s)':>8}")
+        for name, _ in apps:
+            code, elapsed = results[name]
+            logging.info(f"{name:<24} {code:>4} {elapsed:>8.1f}")
+        return results[failed][0] if failed else 0
@@ -2,7 +2,86 @@
 # This software is released under the MIT License.
 # https://opensource.org/licenses/MIT
 
+import time
 import logging
+import contextlib
+import subprocess
+import threading
+
+class PHASE_TIMER:
+    """
+    Accumulates wall-clock time per named startup phase and logs a breakdown on request.
+    Phases with the same name add up, so lazy imports spread over the run land in one bucket.
+    A phase opened inside another one is only counted in the inner phase, so no time is counted twice.
+    """
+    def __init__(self, enabled=False, start=None):
+        self.enabled = enabled
+        self.start = start if start is not None else time.perf_counter()
+        self.phases = {}
+        self.reported = False
+        self._open = threading.local()
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        # Time spent in nested phases, per open phase of this thread
+        stack = self._open.__dict__.setdefault('nested', [])
+        stack.append(0.0)
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - begin
+            self.add(name, elapsed - stack.pop())
+            if stack:
+                stack[-1] += elapsed
+
+    def report(self):
+        """Logs the breakdown once; later calls (e.g. a second script in the same run) are ignored."""
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        total = time.perf_counter() - self.start
+        logging.info("--- Startup timings (ms) ---")
+        for name, seconds in self.phases.items():
+            logging.info(f"{name:<20} {seconds * 1000:>9.1f}")
+        logging.info(f"{'other':<20} {max(0.0, total - sum(self.phases.values())) * 1000:>9.1f}")
+        logging.info(f"{'total':<20} {total * 1000:>9.1f}")
+
+
+_log_context = threading.local()
+
+
+class _ThreadPrefixFilter(logging.Filter):
+    """Prepends the prefix set by log_prefix() in the emitting thread to the message."""
+    def filter(self, record):
+        prefix = getattr(_log_context, 'prefix', None)
+        if prefix:
+            record.msg = f"{prefix}{record.msg}"
+        return True
+
+
+_prefix_filter = _ThreadPrefixFilter()
+
+
+@contextlib.contextmanager
+def log_prefix(prefix):
+    """
+    Prefixes every root-logger message the current thread logs inside the block, e.g. with
+    '[iqs-vlm] ', so the logs of work running in parallel threads can be told apart.
+    """
+    root = logging.getLogger()
+    if _prefix_filter not in root.filters:
+        root.addFilter(_prefix_filter)
+    previous = getattr(_log_context, 'prefix', None)
+    _log_context.prefix = prefix
+    try:
+        yield
+    finally:
+        _log_context.prefix = previous
+
 
 def get_system_bsp_version():
     """
@@ -36,8 +115,216 @@ def get_system_bsp_version():
     return ""
 
 
+def parse_ipk_list(value: str) -> list[str]:
+    """
+    Parses the --ipk argument into a list of package names.
+
+    Accepts a single name, a comma-separated list ("a,b,c") or a manifest file given
+    as "@path" with one package per line ('#' starts a comment).
+
+    Raises:
+        FileNotFoundError: If the manifest file does not exist.
+    """
+    if value.startswith('@'):
+        with open(value[1:], 'r', encoding='utf-8') as f:
+            text = '\n'.join(line.split('#', 1)[0] for line in f)
+    else:
+        text = value
+    names = [name.strip() for name in text.replace('\n', ',').split(',')]
+    return list(dict.fromkeys(name for name in names if name))
+
+
 def split_autotag(value: str) -> tuple[str, str]:
     name, sep, tag = value.partition(':')
     if not tag:
         tag = 'latest'
-    return name, tag
\ No newline at end of file
+    return name, tag
+
+
+def zstd_decompress(data):
+    """
+    Decompresses a zstd frame.
+
+    Uses the standard library module when available (Python 3.14+), then the
+    optional 'zstandard' package, and finally the 'zstd' command line tool.
+
+    Raises:
+        ValueError: If no zstd implementation is available or the data is corrupt.
+    """
+    try:
+        from compression import zstd
+        return zstd.decompress(data)
+    except ImportError:
+        pass
+    except zstd.ZstdError as e:
+        raise ValueError(f"Corrupt zstd data: {e}") from e
+
+    try:
+        import zstandard
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    except ImportError:
+        pass
+    except zstandard.ZstdError as e:
+        raise ValueError(f"Corrupt zstd data: {e}") from e
+
+    try:
+        result = subprocess.run(['zstd', '-dcq'], input=data, capture_output=True, check=True)
+        return result.stdout
+    except FileNotFoundError as e:
+        raise ValueError("No zstd decompressor available (install 'zstandard' or the 'zstd' tool)") from e
+    except subprocess.CalledProcessError as e:
+        raise ValueError(f"Corrupt zstd data: {e.stderr.decode(errors='replace').strip()}") from e
+
+
+class _ZstdProcessReader:
+    """
+    read(n) over the stdout of a 'zstd -dc' process. Reaching EOF, or closing the reader after
+    the process ended on its own, waits for it and raises ValueError on a non-zero exit, so a
+    truncated or corrupt archive is never passed on as complete. Closing early stops the process.
+    """
+    def __init__(self, proc):
+        self.proc = proc
+        self.finished = False
+
+    def read(self, size=-1):
+        data = self.proc.stdout.read(size)
+        if not data and size != 0 and not self.finished:
+            self._finish()
+        return data
+
+    def readable(self):
+        return True
+
+    def _finish(self):
+        self.finished = True
+        returncode = self.proc.wait()
+        stderr = self.proc.stderr.read().decode(errors='replace').strip()
+        if returncode != 0:
+            raise ValueError(f"Corrupt zstd data: zstd exited with code {returncode}" + (f": {stderr}" if stderr else ''))
+
+    def close(self):
+        try:
+            if not self.finished:
+                if self.proc.poll() is None:
+                    self.finished = True
+                    self.proc.kill()
+                    self.proc.wait()
+                else:
+                    self._finish()
+        finally:
+            self.proc.stdout.close()
+            self.proc.stderr.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_zstd_stream(fileobj):
+    """
+    Wraps a binary file object in a streaming zstd decompressor with a read(n) method.
+
+    Uses the standard library module when available (Python 3.14+), then the optional
+    'zstandard' package, and finally pipes through the 'zstd' command line tool. The caller
+    must close() the returned reader.
+
+    Raises:
+        ValueError: If no zstd implementation is available. The 'zstd' tool reader also raises
+            ValueError from read() or close() if the tool fails, e.g. on a truncated archive.
+    """
+    try:
+        from compression import zstd
+        return zstd.ZstdFile(fileobj, mode='rb')
+    except ImportError:
+        pass
+
+    try:
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(fileobj)
+    except ImportError:
+        pass
+
+    try:
+        proc = subprocess.Popen(['zstd', '-dcq'], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except FileNotFoundError as e:
+        raise ValueError("No zstd decompressor available (install 'zstandard' or the 'zstd' tool)") from e
+
+    def feed():
+        try:
+            while (chunk := fileobj.read(1 << 20)):
+                proc.stdin.write(chunk)
+        except (OSError, ValueError):
+            pass
+        finally:
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+
+    threading.Thread(target=feed, daemon=True).start()
+    return _ZstdProcessReader(proc)
+
+
+def _split_version(version):
+    epoch, sep, rest = version.partition(':')
+    if not sep:
+        epoch, rest = '0', version
+    upstream, sep, revision = rest.rpartition('-')
+    if not sep:
+        upstream, revision = rest, ''
+    return int(epoch) if epoch.isdigit() else 0, upstream, revision
+
+
+def _order(c):
+    if c.isdigit():
+        return 0
+    if c.isalpha():
+        return ord(c)
+    if c == '~':
+        return -1
+    return ord(c) + 256 if c else 0
+
+
+def _verrevcmp(a, b):
+    i = j = 0
+    while i < len(a) or j < len(b):
+        first_diff = 0
+        while (i < len(a) and not a[i].isdigit()) or (j < len(b) and not b[j].isdigit()):
+            ac = _order(a[i]) if i < len(a) else 0
+            bc = _order(b[j]) if j < len(b) else 0
+            if ac != bc:
+                return ac - bc
+            i += 1
+            j += 1
+        while i < len(a) and a[i] == '0':
+            i += 1
+        while j < len(b) and b[j] == '0':
+            j += 1
+        while i < len(a) and a[i].isdigit() and j < len(b) and b[j].isdigit():
+            if not first_diff:
+                first_diff = ord(a[i]) - ord(b[j])
+            i += 1
+            j += 1
+        if i < len(a) and a[i].isdigit():
+            return 1
+        if j < len(b) and b[j].isdigit():
+            return -1
+        if first_diff:
+            return first_diff
+    return 0
+
+
+def compare_versions(a: str, b: str) -> int:
+    """
+    Compares two opkg/dpkg version strings ([epoch:]upstream[-revision]).
+
+    Returns:
+        int: Negative if a < b, zero if equal, positive if a > b.
+    """
+    epoch_a, upstream_a, revision_a = _split_version(a)
+    epoch_b, upstream_b, revision_b = _split_version(b)
+    if epoch_a != epoch_b:
+        return epoch_a - epoch_b
+    return _verrevcmp(upstream_a, upstream_b) or _verrevcmp(revision_a, revision_b)
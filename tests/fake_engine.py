@@ -0,0 +1,102 @@
+# Copyright (c) 2025 Innodisk Corp.
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+"""
+A fake Docker Engine API on a unix socket for the image steps, so the tests run without
+a daemon or network access.
+"""
+import io
+import json
+import tarfile
+import socketserver
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, unquote, urlsplit
+
+IMAGE_ID = 'sha256:' + 'ab' * 32
+
+
+class FakeEngine(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Answers the Engine API calls of the pull and load steps. images/create and images/load
+    add images to `images` ({reference: image ID}); every request is recorded in `requests`.
+    """
+    daemon_threads = True
+
+    def __init__(self, path, pull_messages=()):
+        self.pull_messages = list(pull_messages)
+        self.images = {}
+        self.requests = []
+        super().__init__(path, _Handler)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body=b''):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _image_id(self, ref):
+        """Image ID for a reference or an image ID, or None."""
+        if ref in self.server.images.values():
+            return ref
+        return self.server.images.get(ref)
+
+    def _read_chunked(self):
+        body = bytearray()
+        while True:
+            size = int(self.rfile.readline().split(b';')[0], 16)
+            if not size:
+                self.rfile.readline()
+                return bytes(body)
+            body += self.rfile.read(size)
+            self.rfile.readline()
+
+    def _load(self):
+        """Registers the images of a docker-save tar the way the daemon reports them."""
+        with tarfile.open(fileobj=io.BytesIO(self._read_chunked()), mode='r:') as tar:
+            manifest = json.load(tar.extractfile('manifest.json'))
+        lines = []
+        for entry in manifest:
+            image_id = 'sha256:' + entry['Config'].rsplit('/', 1)[-1].removesuffix('.json')
+            for tag in entry.get('RepoTags') or []:
+                self.server.images[tag] = image_id
+                lines.append(f"Loaded image: {tag}")
+            if not entry.get('RepoTags'):
+                self.server.images[image_id] = image_id
+                lines.append(f"Loaded image ID: {image_id}")
+        self._reply(200, b''.join(json.dumps({'stream': line + '\n'}).encode() + b'\r\n' for line in lines))
+
+    def do_GET(self):
+        self.server.requests.append(('GET', self.path, dict(self.headers)))
+        image_id = self._image_id(unquote(self.path[len('/images/'):-len('/json')]))
+        if image_id:
+            self._reply(200, json.dumps({'Id': image_id}).encode())
+        else:
+            self._reply(404, b'{"message": "No such image"}')
+
+    def do_POST(self):
+        self.server.requests.append(('POST', self.path, dict(self.headers)))
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path == '/images/create':
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            for message in self.server.pull_messages:
+                self.wfile.write(json.dumps(message).encode() + b'\r\n')
+            if not any('error' in message for message in self.server.pull_messages):
+                self.server.images[f"{query['fromImage']}:{query['tag']}"] = IMAGE_ID
+            self.close_connection = True
+        elif url.path == '/images/load':
+            self._load()
+        elif url.path.endswith('/tag'):
+            image = unquote(url.path[len('/images/'):-len('/tag')])
+            self.server.images[f"{query['repo']}:{query['tag']}"] = self._image_id(image)
+            self._reply(201)
+        else:
+            self._reply(404)
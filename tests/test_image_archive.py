@@ -0,0 +1,146 @@
+# Copyright (c) 2025 Innodisk Corp.
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+"""
+Archive step: manifest.json is read from the stream sent to the daemon, so a compressed
+archive without a cached manifest is decompressed only once.
+"""
+import io
+import os
+import sys
+import gzip
+import json
+import hashlib
+import tarfile
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_engine import FakeEngine  # noqa: E402
+import mod.image_archive as image_archive  # noqa: E402
+import mod.image_loader as image_loader  # noqa: E402
+from mod.autotag import AUTOTAG  # noqa: E402
+from mod.docker_engine import DOCKER_ENGINE  # noqa: E402
+from mod.image_archive import ManifestTap, read_archive_manifest  # noqa: E402
+from mod.image_cache import IMAGE_CACHE  # noqa: E402
+
+TARGET = 'innodiskorg/iqs-demo:1.0'
+
+
+def _add(tar, name, data, **pax_headers):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.pax_headers = pax_headers
+    tar.addfile(info, io.BytesIO(data))
+
+
+def docker_save(tags=(TARGET,), format=tarfile.GNU_FORMAT, layer_name='layer.tar'):
+    """A minimal 'docker save' tar: a layer and the config blob, and manifest.json last as docker writes it."""
+    config = json.dumps({'architecture': 'arm64'}).encode()
+    digest = hashlib.sha256(config).hexdigest()
+    layer = os.urandom(70000)
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode='w', format=format) as tar:
+        _add(tar, f'blobs/sha256/{digest}', config)
+        _add(tar, layer_name, layer)
+        manifest = [{'Config': f'blobs/sha256/{digest}', 'RepoTags': list(tags), 'Layers': [layer_name]}]
+        _add(tar, 'manifest.json', json.dumps(manifest).encode())
+    return buf.getvalue(), f'sha256:{digest}'
+
+
+def tap_images(data, chunk_size):
+    tap = ManifestTap()
+    for pos in range(0, len(data), chunk_size):
+        tap.feed(data[pos:pos + chunk_size])
+    return tap.images('test.tar')
+
+
+@pytest.mark.parametrize('format, layer_name', [
+    (tarfile.GNU_FORMAT, 'layer.tar'),
+    (tarfile.GNU_FORMAT, 'l' * 150 + '/layer.tar'),
+    (tarfile.PAX_FORMAT, 'l' * 150 + '/layer.tar'),
+])
+@pytest.mark.parametrize('chunk_size', [1, 511, 4096, 1 << 20])
+def test_tap_matches_manifest_read(tmp_path, format, layer_name, chunk_size):
+    data, image_id = docker_save(format=format, layer_name=layer_name)
+    (tmp_path / 'demo.tar').write_bytes(data)
+
+    images = tap_images(data, chunk_size)
+    assert images == read_archive_manifest(str(tmp_path / 'demo.tar'))
+    assert images[0]['id'] == image_id
+    assert images[0]['repo_tags'] == [TARGET]
+
+
+def test_tap_follows_pax_path():
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode='w', format=tarfile.PAX_FORMAT) as tar:
+        _add(tar, 'manifest.json', b'["decoy"]', path='other.json')
+        _add(tar, 'renamed', json.dumps([{'Config': 'ab' * 32 + '.json', 'RepoTags': [TARGET]}]).encode(),
+             path='manifest.json')
+    assert tap_images(buf.getvalue(), 100)[0]['id'] == 'sha256:' + 'ab' * 32
+
+
+def test_tap_without_manifest():
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode='w') as tar:
+        _add(tar, 'layer.tar', b'x' * 1000)
+    with pytest.raises(ValueError, match='No manifest.json'):
+        tap_images(buf.getvalue(), 4096)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    socket_path = str(tmp_path / 'docker.sock')
+    server = FakeEngine(socket_path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, DOCKER_ENGINE(socket_path)
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def decompressions(monkeypatch):
+    """Counts the archives opened through a decompressor."""
+    opened = []
+    open_decompressed = image_archive.open_decompressed
+
+    def counting(path, fileobj):
+        opened.append(path)
+        return open_decompressed(path, fileobj)
+
+    monkeypatch.setattr(image_archive, 'open_decompressed', counting)
+    monkeypatch.setattr(image_loader, 'open_decompressed', counting)
+    return opened
+
+
+def make_autotag(tmp_path, client):
+    autotag = AUTOTAG(SimpleNamespace(autotag='iqs-demo:1.0'), str(tmp_path),
+                      image_cache=IMAGE_CACHE(path=str(tmp_path / 'images.json')))
+    autotag._engine = client
+    return autotag
+
+
+def test_compressed_archive_is_decompressed_once(engine, tmp_path, decompressions):
+    server, client = engine
+    archive_dir = tmp_path / 'binaries' / 'docker-images'
+    archive_dir.mkdir(parents=True)
+    data, image_id = docker_save()
+    (archive_dir / 'iqs-demo.tar.gz').write_bytes(gzip.compress(data))
+
+    assert make_autotag(tmp_path, client)._check_tar_archive() == TARGET
+    assert len(decompressions) == 1
+    assert server.images[TARGET] == image_id
+    index = json.loads((archive_dir / '.manifest-index.json').read_text())
+    assert index['iqs-demo.tar.gz']['images'][0]['id'] == image_id
+
+    # Next time the cached manifest finds the image in the daemon, without opening the archive.
+    server.images = {'innodiskorg/iqs-demo:old': image_id}
+    assert make_autotag(tmp_path, client)._check_tar_archive() == TARGET
+    assert len(decompressions) == 1
+    assert server.images[TARGET] == image_id
+    assert sum(path.startswith('/images/load') for _, path, _ in server.requests) == 1
@@ -0,0 +1,117 @@
+# Copyright (c) 2025 Innodisk Corp.
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+"""
+Image pull step against a fake Docker Engine API on a unix socket, so it runs without
+a daemon or network access.
+"""
+import os
+import sys
+import json
+import base64
+import logging
+import threading
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_engine import IMAGE_ID, FakeEngine  # noqa: E402
+from mod.autotag import AUTOTAG  # noqa: E402
+from mod.docker_engine import DOCKER_ENGINE  # noqa: E402
+from mod.image_cache import IMAGE_CACHE  # noqa: E402
+from mod.registry import REGISTRY  # noqa: E402
+
+PULL_MESSAGES = [
+    {'status': 'Pulling from innodiskorg/iqs-demo', 'id': '1.0'},
+    {'status': 'Pulling fs layer', 'progressDetail': {}, 'id': 'aaaaaaaaaaaa'},
+    {'status': 'Already exists', 'progressDetail': {}, 'id': 'bbbbbbbbbbbb'},
+    {'status': 'Downloading', 'progressDetail': {'current': 1048576, 'total': 3145728}, 'id': 'aaaaaaaaaaaa'},
+    {'status': 'Downloading', 'progressDetail': {'current': 3145728, 'total': 3145728}, 'id': 'aaaaaaaaaaaa'},
+    {'status': 'Download complete', 'progressDetail': {}, 'id': 'aaaaaaaaaaaa'},
+    {'status': 'Pull complete', 'progressDetail': {}, 'id': 'aaaaaaaaaaaa'},
+    {'status': 'Digest: sha256:' + 'cd' * 32},
+    {'status': 'Status: Downloaded newer image for innodiskorg/iqs-demo:1.0'},
+]
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.setenv('DOCKER_CONFIG', str(tmp_path / 'docker-config'))
+    monkeypatch.delenv('IQS_REGISTRY_MIRROR', raising=False)
+    socket_path = str(tmp_path / 'docker.sock')
+    server = FakeEngine(socket_path, PULL_MESSAGES)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, DOCKER_ENGINE(socket_path)
+    server.shutdown()
+    server.server_close()
+
+
+def make_autotag(tmp_path, engine, mirror=None, defer_pull=True):
+    args = SimpleNamespace(autotag='iqs-demo:1.0', registry_mirror=mirror)
+    autotag = AUTOTAG(args, str(tmp_path), image_cache=IMAGE_CACHE(path=str(tmp_path / 'images.json')), defer_pull=defer_pull)
+    autotag._engine = engine
+    return autotag
+
+
+def pull_requests(server):
+    return [(urlsplit(path).path, parse_qs(urlsplit(path).query), headers)
+            for method, path, headers in server.requests if method == 'POST' and path.startswith('/images/create')]
+
+
+def test_pull_reports_layers(engine, caplog):
+    server, client = engine
+    caplog.set_level(logging.INFO)
+    assert REGISTRY(client).pull('innodiskorg/iqs-demo', '1.0') == 'innodiskorg/iqs-demo:1.0'
+
+    (_, query, headers), = pull_requests(server)
+    assert query == {'fromImage': ['innodiskorg/iqs-demo'], 'tag': ['1.0']}
+    assert 'X-Registry-Auth' not in headers
+    assert 'Layer aaaaaaaaaaaa: 3.0 MB in' in caplog.text
+    assert 'Layer bbbbbbbbbbbb: already present' in caplog.text
+    assert 'Pulled innodiskorg/iqs-demo:1.0' in caplog.text
+
+
+def test_pull_sends_docker_login(engine, tmp_path):
+    server, client = engine
+    config_dir = tmp_path / 'docker-config'
+    config_dir.mkdir()
+    auth = base64.b64encode(b'ci-user:secret').decode()
+    (config_dir / 'config.json').write_text(json.dumps({'auths': {'https://index.docker.io/v1/': {'auth': auth}}}))
+
+    REGISTRY(client).pull('innodiskorg/iqs-demo', '1.0')
+
+    (_, _, headers), = pull_requests(server)
+    sent = json.loads(base64.urlsafe_b64decode(headers['X-Registry-Auth']))
+    assert sent == {'username': 'ci-user', 'password': 'secret', 'serveraddress': 'https://index.docker.io/v1/'}
+
+
+def test_pull_error_raises(engine):
+    server, client = engine
+    server.pull_messages = PULL_MESSAGES[:2] + [{'error': 'manifest unknown', 'errorDetail': {'message': 'manifest unknown'}}]
+    with pytest.raises(OSError, match='manifest unknown'):
+        REGISTRY(client).pull('innodiskorg/iqs-demo', '1.0')
+
+
+def test_mirror_image_is_tagged_as_target(engine, tmp_path):
+    server, client = engine
+    autotag = make_autotag(tmp_path, client, mirror='http://127.0.0.1:5000/')
+
+    assert autotag._pull_from_hub() == 'innodiskorg/iqs-demo:1.0'
+
+    (_, query, _), = pull_requests(server)
+    assert query['fromImage'] == ['127.0.0.1:5000/innodiskorg/iqs-demo']
+    assert server.images['innodiskorg/iqs-demo:1.0'] == IMAGE_ID
+    assert autotag.image_cache.get('innodiskorg/iqs-demo:1.0') == IMAGE_ID
+
+
+def test_failed_pull_is_left_to_docker_run(engine, tmp_path):
+    server, client = engine
+    server.pull_messages = [{'error': 'connection refused'}]
+
+    assert make_autotag(tmp_path, client)._pull_from_hub() == 'innodiskorg/iqs-demo:1.0'
+    assert make_autotag(tmp_path, client, defer_pull=False)._pull_from_hub() is None
@@ -0,0 +1,66 @@
+# Copyright (c) 2025 Innodisk Corp.
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+"""
+Saturation search of the streampipe channel sweep, against a stub measure that passes up to
+a fixed channel count, so it runs without the app.
+"""
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'benchmarks', 'iqs-streampipe', 'scripts'))
+
+from sweep import passes, search  # noqa: E402
+
+
+def run_search(capacity, start, limit):
+    """Returns (result, probed channel counts) for a platform that handles `capacity` channels."""
+    probes = []
+
+    def measure(channels):
+        probes.append(channels)
+        return channels <= capacity
+
+    return search(measure, start, limit), probes
+
+
+@pytest.mark.parametrize('capacity, start, limit, result, probes', [
+    (9, 1, 64, 9, [1, 2, 4, 8, 16, 12, 10, 9]),
+    (18, 1, 20, 18, [1, 2, 4, 8, 16, 18, 19]),
+    (3, 16, 64, 3, [16, 8, 4, 2, 3]),
+    # lo == 0: even one channel fails
+    (0, 1, 64, 0, [1]),
+    (0, 8, 64, 0, [8, 4, 2, 1]),
+    # max_channels: the search stops at the cap instead of probing past it
+    (100, 1, 32, 32, [1, 2, 4, 8, 16, 32]),
+    (100, 5, 20, 20, [5, 10, 20]),
+    (100, 40, 32, 32, [32]),
+    (1, 1, 1, 1, [1]),
+])
+def test_search_probes(capacity, start, limit, result, probes):
+    assert run_search(capacity, start, limit) == (result, probes)
+
+
+@pytest.mark.parametrize('start', [1, 3, 5, 16, 40])
+def test_search_finds_capacity(start):
+    limit = 32
+    for capacity in range(40):
+        result, probes = run_search(capacity, start, limit)
+        assert result == min(capacity, limit)
+        assert len(probes) == len(set(probes))
+        assert all(1 <= channels <= limit for channels in probes)
+
+
+def test_passes_uses_container_cpu():
+    args = SimpleNamespace(target_fps=29, cpu_ceiling=90)
+    row = {'fps_p25': 29.5, 'cpu_avg': 95.0, 'cgroup_cpu_avg': 80.0}
+    assert passes(row, args)
+    assert not passes({**row, 'cgroup_cpu_avg': 92.0}, args)
+    assert not passes({**row, 'cgroup_cpu_avg': None}, args)
+    assert not passes({**row, 'fps_p25': 28.0}, args)
+    assert passes({**row, 'cpu_avg': None, 'cgroup_cpu_avg': None}, args)
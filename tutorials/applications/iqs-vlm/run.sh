@@ -23,7 +23,13 @@ if grep -qi "ubuntu" /etc/os-release; then
     OS_TYPE="ubuntu"
 fi
 
-docker run --rm -it \
+# Allocate a TTY only when there is a terminal, e.g. not when iqs-launcher runs several apps at once.
+TTY_FLAG=""
+if [ -t 0 ]; then
+    TTY_FLAG="-t"
+fi
+
+exec docker run --rm -i $TTY_FLAG \
     --net host \
     --privileged \
     --shm-size=2g \
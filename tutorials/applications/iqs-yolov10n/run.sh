@@ -18,7 +18,14 @@ shift
 echo "Executing docker run on image: $IMAGE_TO_RUN with args: $@"
 
 mkdir -p ./output
-docker run --rm -it \
+
+# Allocate a TTY only when there is a terminal, e.g. not when iqs-launcher runs several apps at once.
+TTY_FLAG=""
+if [ -t 0 ]; then
+    TTY_FLAG="-t"
+fi
+
+exec docker run --rm -i $TTY_FLAG \
     --net host \
     --privileged \
     --shm-size=3g \